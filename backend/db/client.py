@@ -1,63 +1,239 @@
 ﻿import logging
-from datetime import datetime
-from typing import Optional, List, Dict
+import math
+import os
 import uuid
+from array import array
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
 
 log = logging.getLogger(__name__)
 
+# Channel name -> (section, key) in the agent's telemetry payload.
+# Names match the typed columns of the Postgres telemetry table.
+NUMERIC_CHANNELS: Dict[str, Tuple[str, str]] = {
+    "gripper_position": ("gripper", "position_mm"),
+    "gripper_force": ("gripper", "force_n"),
+    "gripper_contact": ("gripper", "contact_detected"),
+    "task_progress": ("task", "phase_progress"),
+    "model_confidence": ("model", "action_confidence"),
+    "model_uncertainty": ("model", "uncertainty"),
+    "model_inference_ms": ("model", "inference_time_ms"),
+    "cpu_percent": ("system", "cpu_percent"),
+    "memory_mb": ("system", "memory_mb"),
+    "battery_percent": ("system", "battery_percent"),
+}
+
+TEXT_CHANNELS: Dict[str, Tuple[str, str]] = {
+    "task_name": ("task", "current_task"),
+    "task_phase": ("task", "phase"),
+    "model_action": ("model", "predicted_action"),
+}
+
+# Per-joint array channels, stored one column per joint index
+JOINT_CHANNELS: Dict[str, str] = {
+    "joint_positions": "positions_rad",
+    "joint_velocities": "velocities_rad_s",
+    "joint_torques": "torques_nm",
+    "joint_temps": "temperatures_c",
+}
+
+BOOLEAN_CHANNELS = {"gripper_contact"}
+
+DEFAULT_CHANNELS = ("model_confidence", "task_phase", "battery_percent")
+
+
+def channel_value(data: dict, channel: str):
+    """Read one scalar or text channel out of a telemetry payload"""
+    section, key = NUMERIC_CHANNELS.get(channel) or TEXT_CHANNELS[channel]
+    return (data.get(section) or {}).get(key)
+
+
+def joint_values(data: dict, channel: str) -> Optional[list]:
+    return (data.get("joints") or {}).get(JOINT_CHANNELS[channel])
+
+
+def to_epoch(timestamp) -> float:
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+    return datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp()
+
+
+def from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+TELEMETRY_CAPACITY = int(os.getenv("MEMORY_TELEMETRY_CAPACITY", "1000"))
+FAILURE_CAPACITY = int(os.getenv("MEMORY_FAILURE_CAPACITY", "10000"))
+
+NAN = float("nan")
+
+
+def _column(capacity: int) -> array:
+    return array("d", [NAN]) * capacity
+
+
+class TelemetryRing:
+    """
+    Fixed-capacity ring buffer holding one session's telemetry column by column.
+
+    Every channel is a preallocated float array (text channels are plain lists),
+    so an append writes one slot per channel and never copies the buffer.
+    Joint columns are allocated the first time a joint index shows up.
+    """
+
+    def __init__(self, capacity: int = TELEMETRY_CAPACITY):
+        self.capacity = capacity
+        self.head = 0
+        self.count = 0
+        self.times = _column(capacity)
+        self.numeric: Dict[str, array] = {name: _column(capacity) for name in NUMERIC_CHANNELS}
+        self.text: Dict[str, list] = {name: [None] * capacity for name in TEXT_CHANNELS}
+        self.joints: Dict[str, List[array]] = {name: [] for name in JOINT_CHANNELS}
+
+    def append(self, timestamp: float, data: dict):
+        i = self.head
+        self.times[i] = timestamp
+
+        for name, column in self.numeric.items():
+            value = channel_value(data, name)
+            column[i] = NAN if value is None else float(value)
+
+        for name, column in self.text.items():
+            column[i] = channel_value(data, name)
+
+        for name, columns in self.joints.items():
+            values = joint_values(data, name) or ()
+            while len(columns) < len(values):
+                columns.append(_column(self.capacity))
+            for j, column in enumerate(columns):
+                value = values[j] if j < len(values) else None
+                column[i] = NAN if value is None else float(value)
+
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def slots(self) -> Iterable[int]:
+        """Physical slot indices from oldest to newest"""
+        start = (self.head - self.count) % self.capacity
+        return ((start + k) % self.capacity for k in range(self.count))
+
+    def value(self, channel: str, i: int):
+        if channel in self.numeric:
+            value = self.numeric[channel][i]
+            if math.isnan(value):
+                return None
+            return bool(value) if channel in BOOLEAN_CHANNELS else value
+        if channel in self.text:
+            return self.text[channel][i]
+        if channel in self.joints:
+            values = [column[i] for column in self.joints[channel]]
+            return [None if math.isnan(v) else v for v in values] or None
+        raise KeyError(channel)
+
+    def rows(self, channels=DEFAULT_CHANNELS, limit: Optional[int] = None) -> List[dict]:
+        rows = []
+        for n, i in enumerate(self.slots()):
+            if limit is not None and n >= limit:
+                break
+            row = {"time": from_epoch(self.times[i]).isoformat()}
+            for channel in channels:
+                row[channel] = self.value(channel, i)
+            rows.append(row)
+        return rows
+
+
 class Database:
-    def __init__(self):
-        self.sessions = {}
-        self.telemetry = {}
-        self.failures = []
-    
+    """
+    Storage backend that keeps everything in process memory.
+
+    Telemetry lives in per-session TelemetryRing buffers. Failures are kept
+    newest-last in one bounded ordered dict with per-robot and per-session
+    id indexes, and failure counts per session are maintained on insert and
+    eviction.
+    """
+
+    def __init__(self, telemetry_capacity: int = TELEMETRY_CAPACITY,
+                 failure_capacity: int = FAILURE_CAPACITY):
+        self.telemetry_capacity = telemetry_capacity
+        self.failure_capacity = failure_capacity
+        self.sessions: Dict[str, dict] = {}
+        self.sessions_by_robot: Dict[str, List[str]] = {}
+        self.telemetry: Dict[str, TelemetryRing] = {}
+        self.failures: "OrderedDict[str, dict]" = OrderedDict()
+        self.failures_by_robot: Dict[str, Deque[str]] = {}
+        self.failures_by_session: Dict[str, Deque[str]] = {}
+        self.failure_counts: Dict[str, int] = {}
+
     async def connect(self):
         log.info("Using in-memory database")
-    
+
     async def disconnect(self):
         pass
-    
+
     async def create_session(self, session_id: str, robot_id: str, metadata: dict) -> dict:
         s = {"id": session_id, "robot_id": robot_id, "started_at": datetime.utcnow().isoformat(), "metadata": metadata}
+        if session_id not in self.sessions:
+            self.sessions_by_robot.setdefault(robot_id, []).append(session_id)
         self.sessions[session_id] = s
         return s
-    
+
     async def end_session(self, session_id: str):
         if session_id in self.sessions:
             self.sessions[session_id]["ended_at"] = datetime.utcnow().isoformat()
-    
+
     async def get_sessions(self, robot_id: Optional[str] = None, limit: int = 50) -> List[dict]:
-        sessions = list(self.sessions.values())
         if robot_id:
-            sessions = [s for s in sessions if s.get("robot_id") == robot_id]
-        for s in sessions:
-            s["failure_count"] = len([f for f in self.failures if f.get("session_id") == s["id"]])
-        return sessions[:limit]
-    
+            ids = reversed(self.sessions_by_robot.get(robot_id, []))
+        else:
+            ids = reversed(self.sessions.keys())
+
+        sessions = []
+        for session_id in ids:
+            if len(sessions) >= limit:
+                break
+            sessions.append({**self.sessions[session_id], "failure_count": self.failure_counts.get(session_id, 0)})
+        return sessions
+
     async def insert_telemetry(self, session_id: str, robot_id: str, timestamp, data: dict):
-        if session_id not in self.telemetry:
-            self.telemetry[session_id] = []
-        self.telemetry[session_id].append({
-            "time": timestamp.isoformat() if hasattr(timestamp, "isoformat") else str(timestamp),
-            "model_confidence": data.get("model", {}).get("action_confidence"),
-            "task_phase": data.get("task", {}).get("phase"),
-            "battery_percent": data.get("system", {}).get("battery_percent"),
-        })
-        self.telemetry[session_id] = self.telemetry[session_id][-1000:]
-    
+        ring = self.telemetry.get(session_id)
+        if ring is None:
+            ring = self.telemetry[session_id] = TelemetryRing(self.telemetry_capacity)
+        ring.append(to_epoch(timestamp), data)
+
     async def get_session_telemetry(self, session_id: str, limit: int = 10000) -> List[dict]:
-        return self.telemetry.get(session_id, [])[:limit]
-    
+        ring = self.telemetry.get(session_id)
+        return ring.rows(limit=limit) if ring else []
+
     async def insert_failure(self, failure: dict) -> dict:
         failure["id"] = str(uuid.uuid4())
-        self.failures.insert(0, failure)
-        self.failures = self.failures[:100]
+        session_id = failure.get("session_id")
+        robot_id = failure.get("robot_id")
+
+        self.failures[failure["id"]] = failure
+        self.failures_by_robot.setdefault(robot_id, deque()).append(failure["id"])
+        self.failures_by_session.setdefault(session_id, deque()).append(failure["id"])
+        self.failure_counts[session_id] = self.failure_counts.get(session_id, 0) + 1
+
+        while len(self.failures) > self.failure_capacity:
+            _, oldest = self.failures.popitem(last=False)
+            self.failures_by_robot[oldest.get("robot_id")].popleft()
+            self.failures_by_session[oldest.get("session_id")].popleft()
+            # Counts cover the failures still held, as get_failures returns them
+            self.failure_counts[oldest.get("session_id")] -= 1
+
         return failure
-    
+
     async def get_failures(self, robot_id: Optional[str] = None, limit: int = 100) -> List[dict]:
-        failures = self.failures
-        if robot_id:
-            failures = [f for f in failures if f.get("robot_id") == robot_id]
-        return failures[:limit]
+        ids = reversed(self.failures_by_robot.get(robot_id, ())) if robot_id else reversed(self.failures.keys())
+        failures = []
+        for failure_id in ids:
+            if len(failures) >= limit:
+                break
+            failures.append(self.failures[failure_id])
+        return failures
+
 
 db = Database()
@@ -0,0 +1,60 @@
+"""Benchmark: per-frame FailureClassifier against classify_batch
+
+Run from server/backend:  python -m benchmarks.bench_classify_batch
+Each tick is one frame from every robot, classified as a single batch.
+"""
+
+import random
+import time
+
+from classifier.classifier import FailureClassifier
+
+JOINTS = 6
+TICKS = 10
+FLEETS = (100, 1_000, 5_000)
+
+
+def make_frame(rng: random.Random) -> dict:
+    torques = [abs(rng.gauss(5.0, 2.0)) for _ in range(JOINTS)]
+    if rng.random() < 0.01:
+        torques[rng.randrange(JOINTS)] += 80.0
+    return {
+        "joints": {
+            "positions_rad": [rng.uniform(-1, 1) for _ in range(JOINTS)],
+            "torques_nm": torques,
+        },
+        "model": {"action_confidence": rng.uniform(0.3, 0.99)},
+        "system": {"battery_percent": rng.uniform(10, 100)},
+    }
+
+
+def frames_per_second(classify_tick, ticks) -> float:
+    start = time.perf_counter()
+    for robot_ids, frames in ticks:
+        classify_tick(robot_ids, frames)
+    return sum(len(frames) for _, frames in ticks) / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'robots':>8} {'scalar':>10} {'batch':>10} {'adaptive':>10}  (frames/s)")
+    for robots in FLEETS:
+        robot_ids = [f"robot_{i}" for i in range(robots)]
+        ticks = [(robot_ids, [make_frame(rng) for _ in robot_ids]) for _ in range(TICKS)]
+
+        def sequential(classifier):
+            return lambda ids, frames: [classifier.classify(r, d) for r, d in zip(ids, frames)]
+
+        def batched(classifier):
+            return lambda ids, frames: classifier.classify_batch(list(zip(ids, frames)))
+
+        print(
+            f"{robots:>8} "
+            f"{frames_per_second(sequential(FailureClassifier()), ticks):>10.0f} "
+            f"{frames_per_second(batched(FailureClassifier()), ticks):>10.0f} "
+            f"{frames_per_second(sequential(FailureClassifier(mode='adaptive')), ticks):>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
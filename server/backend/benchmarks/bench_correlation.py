@@ -0,0 +1,92 @@
+"""Benchmark: incremental windowed moments against recomputing the window's covariance on every sample
+
+Run from server/backend:  python -m benchmarks.bench_correlation
+Per-frame cost for one robot with the default pairs (torque~velocity and
+temperature~torque per joint, inference time~confidence), one frame in ten
+missing a joint's velocity.
+"""
+
+import random
+import time
+
+import numpy as np
+
+from classifier.correlation import CorrelationDetector, WindowedMoments
+
+FRAMES = 20_000
+JOINTS = (6, 12)
+
+
+def make_frames(rng: random.Random, joints: int):
+    frames = []
+    for _ in range(FRAMES):
+        velocities = [rng.gauss(0, 0.5) for _ in range(joints)]
+        if rng.random() < 0.1:
+            velocities[rng.randrange(joints)] = None
+        frames.append({
+            "joints": {
+                "torques_nm": [5.0 + 2.0 * (v or 0.0) + rng.gauss(0, 0.2) for v in velocities],
+                "velocities_rad_s": velocities,
+                "temperatures_c": [40.0 + rng.gauss(0, 0.5) for _ in range(joints)],
+            },
+            "model": {"inference_time_ms": 20.0 + rng.gauss(0, 2), "action_confidence": rng.uniform(0.6, 1.0)},
+        })
+    return frames
+
+
+def per_frame_us(step, frames) -> float:
+    start = time.perf_counter()
+    for frame in frames:
+        step(frame)
+    return (time.perf_counter() - start) / len(frames) * 1e6
+
+
+def recompute_every_sample(detector: CorrelationDetector, frames):
+    """The straightforward version: keep the window, take masked moments of it on each frame"""
+    state = detector._resolve(frames[0])
+    xs = np.full((detector.window, len(state.labels)), np.nan)
+    ys = np.full_like(xs, np.nan)
+
+    def step(frame):
+        x, y = detector._values(state, frame)
+        xs[:-1], ys[:-1] = xs[1:], ys[1:]
+        xs[-1], ys[-1] = x, y
+        valid = ~(np.isnan(xs) | np.isnan(ys))
+        n = np.maximum(valid.sum(axis=0), 1)
+        wx, wy = np.where(valid, xs, 0.0), np.where(valid, ys, 0.0)
+        mx, my = wx.sum(axis=0) / n, wy.sum(axis=0) / n
+        vx, vy = (wx * wx).sum(axis=0) / n - mx * mx, (wy * wy).sum(axis=0) / n - my * my
+        return mx, my, vx, vy, (wx * wy).sum(axis=0) / n - mx * my
+
+    return step
+
+
+def incremental(detector: CorrelationDetector, frames):
+    state = detector._resolve(frames[0])
+    moments = WindowedMoments(len(state.labels), detector.window)
+
+    def step(frame):
+        moments.push(*detector._values(state, frame))
+        return moments.moments()
+
+    return step
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'joints':>7} {'pairs':>6} {'recompute/frame':>16} {'moments/frame':>14} {'detector':>9}  "
+          f"(us per frame, window {CorrelationDetector().window})")
+    for joints in JOINTS:
+        frames = make_frames(rng, joints)
+        detector = CorrelationDetector()
+        pairs = len(detector._resolve(frames[0]).labels)
+        print(
+            f"{joints:>7} {pairs:>6} "
+            f"{per_frame_us(recompute_every_sample(CorrelationDetector(), frames), frames):>16.1f} "
+            f"{per_frame_us(incremental(CorrelationDetector(), frames), frames):>14.1f} "
+            f"{per_frame_us(lambda frame, detector=detector: detector.update('robot', frame), frames):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Micro-benchmark: per-sample cost of the classifier's streaming statistics
+
+Run from server/backend:  python -m benchmarks.bench_rolling_stats
+Update + is_anomaly cost should stay flat as the window grows.
+"""
+
+import random
+import statistics
+import time
+from collections import deque
+
+from classifier.stats import EwmaStats, RollingQuantile, RollingStats
+
+SAMPLES = 100_000
+WINDOWS = (50, 100, 1_000, 10_000)
+
+
+class NaiveRollingStats:
+    """The previous implementation: re-sums the window on every read"""
+
+    def __init__(self, window: int = 50):
+        self.values: deque = deque(maxlen=window)
+
+    def update(self, value: float):
+        if value is not None:
+            self.values.append(value)
+
+    @property
+    def mean(self):
+        return sum(self.values) / len(self.values) if self.values else None
+
+    @property
+    def std(self):
+        if len(self.values) < 2:
+            return None
+        m = self.mean
+        return (sum((x - m) ** 2 for x in self.values) / len(self.values)) ** 0.5
+
+    def is_anomaly(self, value: float, sigma: float = 3.0) -> bool:
+        if self.std is None or self.std == 0:
+            return False
+        return abs(value - self.mean) > (sigma * self.std)
+
+
+def per_sample_ns(stats, values) -> float:
+    start = time.perf_counter()
+    for value in values:
+        stats.update(value)
+        stats.is_anomaly(value)
+    return (time.perf_counter() - start) / len(values) * 1e9
+
+
+def check_accuracy(window: int, values):
+    stats = RollingStats(window)
+    for value in values:
+        stats.update(value)
+    tail = values[-window:]
+    assert abs(stats.mean - statistics.fmean(tail)) < 1e-9
+    assert abs(stats.std - statistics.pstdev(tail)) < 1e-9
+
+
+def main():
+    rng = random.Random(0)
+    values = [rng.gauss(20.0, 5.0) for _ in range(SAMPLES)]
+
+    print(f"{'window':>8} {'rolling':>10} {'ewma':>10} {'quantile':>10} {'naive':>12}  (ns/sample)")
+    for window in WINDOWS:
+        check_accuracy(window, values)
+        # The naive version is O(window) per check; keep its run short
+        naive_values = values[: max(2_000, SAMPLES // window)]
+        print(
+            f"{window:>8} "
+            f"{per_sample_ns(RollingStats(window), values):>10.0f} "
+            f"{per_sample_ns(EwmaStats.with_span(window), values):>10.0f} "
+            f"{per_sample_ns(RollingQuantile(window), values):>10.0f} "
+            f"{per_sample_ns(NaiveRollingStats(window), naive_values):>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
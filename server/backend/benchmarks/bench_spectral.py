@@ -0,0 +1,75 @@
+"""Benchmark: sliding DFT band power against an FFT of the window on every sample
+
+Run from server/backend:  python -m benchmarks.bench_spectral
+Per-frame cost for one robot with torques and velocities on every joint.
+"""
+
+import random
+import time
+
+import numpy as np
+
+from classifier.spectral import SlidingSpectrum, SpectralDetector
+
+FRAMES = 20_000
+JOINTS = (6, 12)
+
+
+def make_frames(rng: random.Random, joints: int):
+    return [
+        {"joints": {
+            "torques_nm": [5.0 + rng.gauss(0, 0.5) for _ in range(joints)],
+            "velocities_rad_s": [rng.gauss(0, 0.05) for _ in range(joints)],
+        }}
+        for _ in range(FRAMES)
+    ]
+
+
+def per_frame_us(step, frames) -> float:
+    start = time.perf_counter()
+    for frame in frames:
+        step(frame)
+    return (time.perf_counter() - start) / len(frames) * 1e6
+
+
+def fft_every_sample(detector: SpectralDetector, joints: int):
+    """The straightforward version: keep the window, FFT it on each frame"""
+    window = np.zeros((2 * joints, detector.window))
+
+    def step(frame):
+        nonlocal window
+        values = np.array([frame["joints"]["torques_nm"], frame["joints"]["velocities_rad_s"]]).ravel()
+        window = np.roll(window, -1, axis=1)
+        window[:, -1] = values
+        spectrum = np.fft.rfft(window, axis=1)[:, detector.bins]
+        return np.abs(spectrum) ** 2 @ detector.band_matrix
+
+    return step
+
+
+def sliding(detector: SpectralDetector, joints: int):
+    spectrum = SlidingSpectrum(2 * joints, detector.window, detector.bins)
+
+    def step(frame):
+        spectrum.push(np.array([frame["joints"]["torques_nm"], frame["joints"]["velocities_rad_s"]]).ravel())
+        return spectrum.power() @ detector.band_matrix
+
+    return step
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'joints':>7} {'fft/frame':>10} {'sdft/frame':>11} {'detector':>9}  (us per frame, window 64)")
+    for joints in JOINTS:
+        frames = make_frames(rng, joints)
+        detector = SpectralDetector()
+        print(
+            f"{joints:>7} "
+            f"{per_frame_us(fft_every_sample(SpectralDetector(), joints), frames):>10.1f} "
+            f"{per_frame_us(sliding(SpectralDetector(), joints), frames):>11.1f} "
+            f"{per_frame_us(lambda frame, detector=detector: detector.update('robot', frame), frames):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
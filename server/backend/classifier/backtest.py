@@ -0,0 +1,269 @@
+"""Offline backtest - replay stored sessions through the classifier and score it against recorded failures
+
+Run from server/backend, against the backend STORAGE_BACKEND points at:
+    python -m classifier.backtest --since 2026-09-01 --rules rules.json --workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from classifier.classifier import FailureClassifier
+from classifier.episodes import EpisodeTracker
+from classifier.rules import RuleBook
+from db.channels import STORED_CHANNELS, payload_of, to_epoch
+from db.failures import FailureQuery
+
+log = logging.getLogger(__name__)
+
+# A detection and a recorded failure of the same type match if they overlap within this slack
+BACKTEST_MATCH_S = float(os.getenv("BACKTEST_MATCH_S", "2.0"))
+BACKTEST_CHUNK = int(os.getenv("BACKTEST_CHUNK", "5000"))
+BACKTEST_MAX_SESSIONS = int(os.getenv("BACKTEST_MAX_SESSIONS", "100000"))
+
+
+@dataclass
+class Interval:
+    failure_type: str
+    start: float
+    end: float
+
+
+@dataclass
+class BacktestReport:
+    """
+    Detections are episodes, as the live path stores them, counted under the
+    rule that opened them; frames_by_rule counts every failing frame. Labels
+    are the recorded failures an operator acknowledged.
+    """
+
+    sessions: int = 0
+    frames: int = 0
+    classify_s: float = 0.0
+    detections: Dict[str, int] = field(default_factory=dict)
+    frames_by_rule: Dict[str, int] = field(default_factory=dict)
+    # failure_type -> {"detected", "recorded", "labels", "detected_matched", "recorded_matched", "labels_matched"}
+    by_type: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def count(self, failure_type: str, key: str, n: int = 1):
+        counts = self.by_type.setdefault(failure_type, dict.fromkeys(
+            ("detected", "recorded", "labels", "detected_matched", "recorded_matched", "labels_matched"), 0
+        ))
+        counts[key] += n
+
+    def merge(self, other: "BacktestReport"):
+        self.sessions += other.sessions
+        self.frames += other.frames
+        self.classify_s += other.classify_s
+        for mine, theirs in ((self.detections, other.detections), (self.frames_by_rule, other.frames_by_rule)):
+            for rule, n in theirs.items():
+                mine[rule] = mine.get(rule, 0) + n
+        for failure_type, counts in other.by_type.items():
+            for key, n in counts.items():
+                self.count(failure_type, key, n)
+
+    def to_dict(self, wall_s: Optional[float] = None) -> dict:
+        def ratio(a: int, b: int) -> Optional[float]:
+            return round(a / b, 4) if b else None
+
+        totals = {key: sum(c[key] for c in self.by_type.values()) for key in (
+            "detected", "recorded", "labels", "detected_matched", "recorded_matched", "labels_matched"
+        )}
+        report = {
+            "sessions": self.sessions,
+            "frames": self.frames,
+            "classify_fps": round(self.frames / self.classify_s) if self.classify_s else None,
+            "detections": dict(sorted(self.detections.items())),
+            "frames_by_rule": dict(sorted(self.frames_by_rule.items())),
+            "by_type": {
+                failure_type: {
+                    **counts,
+                    "precision": ratio(counts["detected_matched"], counts["detected"]),
+                    "recall": ratio(counts["recorded_matched"], counts["recorded"]),
+                    "label_recall": ratio(counts["labels_matched"], counts["labels"]),
+                }
+                for failure_type, counts in sorted(self.by_type.items())
+            },
+            **totals,
+            "precision": ratio(totals["detected_matched"], totals["detected"]),
+            "recall": ratio(totals["recorded_matched"], totals["recorded"]),
+            "label_recall": ratio(totals["labels_matched"], totals["labels"]),
+        }
+        if wall_s is not None:
+            report["wall_s"] = round(wall_s, 3)
+            report["fps"] = round(self.frames / wall_s) if wall_s else None
+        return report
+
+
+def _overlaps(a: Interval, b: Interval, slack: float) -> bool:
+    return a.failure_type == b.failure_type and a.start - slack <= b.end and b.start - slack <= a.end
+
+
+def _match(report: BacktestReport, detected: List[Interval], recorded: List[Interval],
+           labels: List[Interval], slack: float):
+    """Per-session overlap counts; sessions hold few episodes, so pairwise is cheap"""
+    for d in detected:
+        report.count(d.failure_type, "detected")
+        if any(_overlaps(d, r, slack) for r in recorded):
+            report.count(d.failure_type, "detected_matched")
+    for key, intervals in (("recorded", recorded), ("labels", labels)):
+        for r in intervals:
+            report.count(r.failure_type, key)
+            if any(_overlaps(r, d, slack) for d in detected):
+                report.count(r.failure_type, f"{key}_matched")
+
+
+async def _recorded_failures(database, session_id: str) -> List[dict]:
+    failures, cursor = [], None
+    while True:
+        page, cursor = await database.search_failures(FailureQuery(session_id=session_id), cursor=cursor, limit=1000)
+        failures.extend(page)
+        if cursor is None:
+            return failures
+
+
+async def backtest_session(database, rulebook: RuleBook, session: dict,
+                           slack: float = BACKTEST_MATCH_S) -> BacktestReport:
+    """Replay one session through a fresh classifier, as if it were being ingested in bulk"""
+    report = BacktestReport(sessions=1)
+    session_id, robot_id = str(session["id"]), session["robot_id"]
+    classifier = FailureClassifier(rulebook)
+    classifier.assign_model(session_id, (session.get("metadata") or {}).get("robot_model") or rulebook.model_of(robot_id))
+    tracker = EpisodeTracker()
+    detected: List[Interval] = []
+
+    def finish(episode):
+        detected.append(Interval(episode.failure_type, episode.started_at, episode.last_seen))
+
+    async for rows in database.iter_session_telemetry(session_id, channels=STORED_CHANNELS, chunk_size=BACKTEST_CHUNK):
+        frames = [(session_id, payload_of(row)) for row in rows]
+        started = time.perf_counter()
+        results = classifier.classify_batch(frames)
+        report.classify_s += time.perf_counter() - started
+        report.frames += len(frames)
+        for row, result in zip(rows, results):
+            if result.is_failure:
+                report.frames_by_rule[result.rule] = report.frames_by_rule.get(result.rule, 0) + 1
+            opened, closed = tracker.step(session_id, session_id, to_epoch(row["time"]), result)
+            for episode in closed:
+                finish(episode)
+            for episode in opened:
+                # No row is written; any id marks the episode open
+                episode.failure_id = "backtest"
+                report.detections[result.rule] = report.detections.get(result.rule, 0) + 1
+    for episode in tracker.close_all(session_id):
+        finish(episode)
+
+    recorded, labels = [], []
+    for failure in await _recorded_failures(database, session_id):
+        start = to_epoch(failure["detected_at"])
+        end = to_epoch(failure["ended_at"]) if failure.get("ended_at") else start
+        interval = Interval(failure["failure_type"], start, end)
+        recorded.append(interval)
+        if failure.get("acknowledged"):
+            labels.append(interval)
+    _match(report, detected, recorded, labels, slack)
+    return report
+
+
+async def select_sessions(database, robot_id: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None, limit: int = BACKTEST_MAX_SESSIONS) -> List[dict]:
+    sessions = await database.get_sessions(robot_id, limit=limit)
+    lo = to_epoch(since) if since is not None else float("-inf")
+    hi = to_epoch(until) if until is not None else float("inf")
+    return [s for s in sessions if lo <= to_epoch(s["started_at"]) < hi]
+
+
+async def backtest(database, rulebook: RuleBook, sessions: Sequence[dict],
+                   slack: float = BACKTEST_MATCH_S) -> BacktestReport:
+    """Backtest sessions one after another on an already connected database"""
+    report = BacktestReport()
+    for session in sessions:
+        report.merge(await backtest_session(database, rulebook, session, slack))
+    return report
+
+
+def load_rulebook(path: Optional[str]) -> RuleBook:
+    """The rule book to evaluate; a file that does not load is an error, not a run of the built-in rules"""
+    rulebook = RuleBook(FailureClassifier, path=path)
+    if rulebook.error:
+        raise ValueError(f"Rules file {path} not loaded: {rulebook.error}")
+    return rulebook
+
+
+def _worker(sessions: List[dict], rules_path: Optional[str], slack: float) -> BacktestReport:
+    """Runs in a pool process: its own database connection and rule book"""
+    from db.client import create_database
+
+    async def run():
+        database = create_database()
+        await database.connect()
+        try:
+            return await backtest(database, load_rulebook(rules_path), sessions, slack)
+        finally:
+            await database.disconnect()
+
+    return asyncio.run(run())
+
+
+def backtest_parallel(sessions: Sequence[dict], rules_path: Optional[str], workers: int,
+                      slack: float = BACKTEST_MATCH_S) -> BacktestReport:
+    """
+    Spread sessions over worker processes, each reading the storage backend
+    itself. Sessions are dealt out largest first in small groups so one long
+    session does not leave the other workers idle at the end.
+    """
+    ordered = sorted(sessions, key=lambda s: -((s.get("summary") or {}).get("samples") or 0))
+    group = max(1, len(ordered) // (workers * 8))
+    groups = [ordered[i:i + group] for i in range(0, len(ordered), group)]
+    report = BacktestReport()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_worker, chunk, rules_path, slack) for chunk in groups]
+        for future in as_completed(futures):
+            report.merge(future.result())
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored sessions through the failure classifier")
+    parser.add_argument("--rules", default=os.getenv("CLASSIFIER_RULES_PATH"), help="rules file to evaluate")
+    parser.add_argument("--robot-id")
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--until", type=datetime.fromisoformat)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--match-s", type=float, default=BACKTEST_MATCH_S)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        rulebook = load_rulebook(args.rules)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from db.client import STORAGE_BACKEND, db
+
+    async def run():
+        await db.connect()
+        try:
+            sessions = await select_sessions(db, args.robot_id, args.since, args.until)
+            log.info(f"Backtesting {len(sessions)} sessions from {STORAGE_BACKEND}")
+            # The memory backend only exists inside this process
+            if args.workers <= 1 or STORAGE_BACKEND == "memory":
+                return await backtest(db, rulebook, sessions, args.match_s)
+        finally:
+            await db.disconnect()
+        return backtest_parallel(sessions, args.rules, args.workers, args.match_s)
+
+    started = time.perf_counter()
+    report = asyncio.run(run())
+    print(json.dumps(report.to_dict(time.perf_counter() - started), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,34 @@
 """Failure Classifier - detects robot failures from telemetry"""
 
 import logging
-from collections import deque
+import math
+import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from classifier.rules import RuleBook, RuleSet
+from classifier.state import ClassifierState
+from classifier.stats import RollingQuantile, RollingStats, make_stats
 
 log = logging.getLogger(__name__)
 
+# Below this many frames the array setup costs more than it saves
+BATCH_MIN_FRAMES = 16
+
+# "compat" runs the rule chain only; "adaptive" also flags per-joint torque off that joint's own baseline
+CLASSIFIER_MODES = ("compat", "adaptive")
+CLASSIFIER_MODE = os.getenv("CLASSIFIER_MODE", "compat")
+# Per-joint torque baseline: "rolling" mean/std, "ewma" mean/std or "quantile" (median and IQR)
+CLASSIFIER_TORQUE_STATS = os.getenv("CLASSIFIER_TORQUE_STATS", "rolling")
+TORQUE_WINDOW = int(os.getenv("CLASSIFIER_TORQUE_WINDOW", "100"))
+# Standard deviations off the mean, or IQRs outside the quartiles for "quantile"
+TORQUE_SIGMA = float(os.getenv("CLASSIFIER_TORQUE_SIGMA", "4.0"))
+TORQUE_MIN_SAMPLES = int(os.getenv("CLASSIFIER_TORQUE_MIN_SAMPLES", "30"))
+# Torque deviations below this are never anomalous, however flat the baseline
+TORQUE_MIN_DEVIATION_NM = float(os.getenv("CLASSIFIER_TORQUE_MIN_DEVIATION_NM", "2.0"))
+
 
 @dataclass
 class FailureResult:
@@ -18,31 +40,8 @@ class FailureResult:
     detail: str
     affected_components: Dict
     classifier_data: Dict
-
-
-class RollingStats:
-    def __init__(self, window: int = 50):
-        self.values: deque = deque(maxlen=window)
-    
-    def update(self, value: float):
-        if value is not None:
-            self.values.append(value)
-    
-    @property
-    def mean(self) -> Optional[float]:
-        return sum(self.values) / len(self.values) if self.values else None
-    
-    @property
-    def std(self) -> Optional[float]:
-        if len(self.values) < 2:
-            return None
-        m = self.mean
-        return (sum((x - m) ** 2 for x in self.values) / len(self.values)) ** 0.5
-    
-    def is_anomaly(self, value: float, sigma: float = 3.0) -> bool:
-        if self.std is None or self.std == 0:
-            return False
-        return abs(value - self.mean) > (sigma * self.std)
+    # Name of the rule (or detector) that fired, for backtests and tuning
+    rule: str = ""
 
 
 class FailureClassifier:
@@ -52,67 +51,174 @@ class FailureClassifier:
     TEMP_WARNING_C = 60.0
     BATTERY_LOW = 15.0
     
-    def __init__(self):
+    def __init__(self, rulebook: Optional[RuleBook] = None, mode: str = CLASSIFIER_MODE,
+                 torque_stats: str = CLASSIFIER_TORQUE_STATS):
+        if mode not in CLASSIFIER_MODES:
+            raise ValueError(f"mode must be one of {', '.join(CLASSIFIER_MODES)}")
+        # Fails here, not on the first frame, when the kind is unknown
+        make_stats(torque_stats, TORQUE_WINDOW)
+        self.rulebook = rulebook or RuleBook(type(self), path=None)
+        self.mode = mode
+        self.torque_stats = torque_stats
         self._confidence_stats: Dict[str, RollingStats] = {}
-        self._torque_stats: Dict[str, List[RollingStats]] = {}
+        self._torque_stats: Dict[str, list] = {}
         self._consecutive: Dict[str, int] = {}
+        self._models: Dict[str, str] = {}
+        self._rule_runs: Dict[str, Dict[str, int]] = {}
+        # Resolved rule set per robot, dropped whenever the rule book reloads
+        self._rulesets: Dict[str, RuleSet] = {}
+        self._rules_version = self.rulebook.version
+        # Which robots hold state here, evicting idle ones past the budget
+        self.state = ClassifierState(self)
+    
+    def assign_model(self, robot_id: str, model: Optional[str]):
+        """Pin a robot to a rule set, e.g. from its session metadata; None reverts to the rule file's mapping"""
+        # Rehydrate first, so a cold record's older pin does not overwrite this one on the next frame
+        self.state.touch(robot_id)
+        if model:
+            self._models[robot_id] = model
+        else:
+            self._models.pop(robot_id, None)
+        self._rulesets.pop(robot_id, None)
+    
+    def rules_for(self, robot_id: str) -> RuleSet:
+        if self._rules_version != self.rulebook.version:
+            self._rulesets.clear()
+            self._rules_version = self.rulebook.version
+        ruleset = self._rulesets.get(robot_id)
+        if ruleset is None:
+            model = self._models.get(robot_id) or self.rulebook.model_of(robot_id)
+            ruleset = self._rulesets[robot_id] = self.rulebook.rules_for(model)
+        return ruleset
     
     def classify(self, robot_id: str, data: dict) -> FailureResult:
-        joints = data.get("joints", {})
-        model = data.get("model", {})
-        system = data.get("system", {})
-        
+        self.state.touch(robot_id)
+        return self._classify(robot_id, data)
+    
+    def _classify(self, robot_id: str, data: dict) -> FailureResult:
         # Update stats
-        confidence = model.get("action_confidence")
+        confidence = data.get("model", {}).get("action_confidence")
         if confidence is not None:
             if robot_id not in self._confidence_stats:
                 self._confidence_stats[robot_id] = RollingStats(100)
             self._confidence_stats[robot_id].update(confidence)
         
-        # Rule 1: Sensor dropout
-        positions = joints.get("positions_rad", [])
-        null_joints = [i for i, p in enumerate(positions) if p is None]
-        if null_joints:
-            return self._result(robot_id, True, "sensor", "high", 0.95,
-                f"Sensor dropout on joint(s) {null_joints}",
-                f"Joint encoder(s) {null_joints} returned null. Check connections.",
-                {"joints": null_joints}, {"null_joints": null_joints})
+        ruleset = self.rules_for(robot_id)
+        runs = self._rule_runs.setdefault(robot_id, {}) if ruleset.windowed else None
+        hit = ruleset.evaluate(data, runs)
+        drift = self._torque_drift(robot_id, data) if self.mode == "adaptive" else None
+        if hit is None:
+            if drift is not None:
+                self._consecutive[robot_id] = self._consecutive.get(robot_id, 0) + 1
+                return drift
+            self._consecutive[robot_id] = 0
+            return FailureResult(False, "none", "none", 1.0, "OK", "", {}, {})
         
-        # Rule 2: Motor overload
-        torques = joints.get("torques_nm", [])
-        overloaded = [i for i, t in enumerate(torques) if t and t > self.TORQUE_OVERLOAD_NM]
-        if overloaded:
-            return self._result(robot_id, True, "motor", "high", 0.90,
-                f"Motor overload on joint(s) {overloaded}",
-                "Abnormal torque detected. Check for obstructions.",
-                {"joints": overloaded}, {"torques": torques})
+        rule, matched, raw = hit
+        summary, detail, affected, data = rule.render(matched, raw)
+        spec = rule.spec
+        return self._result(robot_id, True, spec.failure_type, spec.severity, spec.confidence,
+                            summary, detail, affected, data, spec.name)
+    
+    def _torque_drift(self, robot_id: str, data: dict) -> Optional[FailureResult]:
+        """
+        Check each joint's torque against that joint's own baseline, then let
+        the healthy ones update it. Joints that are overloaded or anomalous
+        are not learned from, so a fault does not become the new normal.
+        """
+        torques = (data.get("joints") or {}).get("torques_nm")
+        if not isinstance(torques, list):
+            return None
+        baselines = self._torque_stats.get(robot_id)
+        if baselines is None:
+            baselines = self._torque_stats[robot_id] = []
+        while len(baselines) < len(torques):
+            baselines.append(make_stats(self.torque_stats, TORQUE_WINDOW))
+        overload = self.rulebook.limits.TORQUE_OVERLOAD_NM
+        anomalous = []
+        for joint, (stats, torque) in enumerate(zip(baselines, torques)):
+            # Matches the `t and ...` test of the rules: 0 and missing readings are skipped
+            if not torque or not isinstance(torque, (int, float)) or torque > overload:
+                continue
+            if _departs(stats, torque):
+                anomalous.append(joint)
+            else:
+                stats.update(torque)
+        if not anomalous:
+            return None
+        data = {"torques": torques}
+        if isinstance(baselines[0], RollingQuantile):
+            data["baseline_median"] = [baselines[j].median for j in anomalous]
+            data["baseline_iqr"] = [baselines[j].quantile(0.75) - baselines[j].quantile(0.25) for j in anomalous]
+        else:
+            data["baseline_mean"] = [baselines[j].mean for j in anomalous]
+            data["baseline_std"] = [baselines[j].std for j in anomalous]
+        return FailureResult(True, "motor", "medium", 0.70,
+            f"Torque anomaly on joint(s) {anomalous}",
+            "Torque departs from this joint's recent baseline. Check for wear or obstructions.",
+            {"joints": anomalous}, data, "torque_anomaly")
+    
+    def classify_batch(self, frames: Sequence[Tuple[str, dict]]) -> List[FailureResult]:
+        """
+        Classify (robot_id, data) frames, from one robot or many, in order.
+        Results and state match calling classify() on each frame in turn. With
+        the built-in rules the chain is evaluated over the whole batch with
+        NumPy, leaving only per-robot bookkeeping and building failure results
+        in Python; custom rule sets and adaptive mode are evaluated frame by frame.
+        """
+        robot_ids = {robot_id for robot_id, _ in frames}
+        for robot_id in robot_ids:
+            # Trimmed once the batch is done, so no robot in it loses state midway
+            self.state.touch(robot_id, trim=False)
+        if (len(frames) < BATCH_MIN_FRAMES or self.mode == "adaptive"
+                or not all(self.rules_for(robot_id).builtin for robot_id in robot_ids)):
+            # Only the built-in chain has a vectorized form; adaptive baselines are per-object
+            results = [self._classify(robot_id, data) for robot_id, data in frames]
+            self.state.trim()
+            return results
+        # vectorized builds on this module, so it is imported on first use
+        from classifier.vectorized import OK, FleetFrames, RuleMasks
         
-        # Rule 3: Model uncertainty
-        if confidence is not None:
-            if confidence < self.CONFIDENCE_CRITICAL:
-                return self._result(robot_id, True, "model", "critical", 0.88,
-                    f"AI model critically uncertain ({confidence:.0%})",
-                    "Model in unfamiliar situation. Consider stopping robot.",
-                    {"confidence": confidence}, {})
-            if confidence < self.CONFIDENCE_LOW:
-                return self._result(robot_id, True, "model", "medium", 0.80,
-                    f"AI model low confidence ({confidence:.0%})",
-                    "Model uncertain. Monitor closely.",
-                    {"confidence": confidence}, {})
+        batch = FleetFrames([data for _, data in frames])
+        masks = RuleMasks(batch, np.arange(len(frames)), self.rulebook.limits)
         
-        # Rule 4: Low battery
-        battery = system.get("battery_percent")
-        if battery is not None and battery < self.BATTERY_LOW:
-            return self._result(robot_id, True, "system", "medium", 1.0,
-                f"Low battery ({battery:.0f}%)", "Return to charging station.",
-                {"battery": battery}, {})
+        # State bookkeeping in frame order, as classify() would do it
+        confidence_stats, consecutive = self._confidence_stats, self._consecutive
+        for (robot_id, _), ok, confidence in zip(frames, masks.ok.tolist(), batch.confidence.tolist()):
+            if not math.isnan(confidence):
+                stats = confidence_stats.get(robot_id)
+                if stats is None:
+                    stats = confidence_stats[robot_id] = RollingStats(100)
+                stats.update(confidence)
+            consecutive[robot_id] = 0 if ok else consecutive.get(robot_id, 0) + 1
         
-        self._consecutive[robot_id] = 0
-        return FailureResult(False, "none", "none", 1.0, "OK", "", {}, {})
+        results = [OK] * len(frames)
+        for row in np.flatnonzero(~masks.ok).tolist():
+            results[row] = masks.result(row)
+        self.state.trim()
+        return results
     
-    def _result(self, robot_id, is_failure, ftype, severity, conf, summary, detail, affected, data):
+    def _result(self, robot_id, is_failure, ftype, severity, conf, summary, detail, affected, data, rule=""):
         self._consecutive[robot_id] = self._consecutive.get(robot_id, 0) + 1
-        return FailureResult(is_failure, ftype, severity, conf, summary, detail, affected, data)
+        return FailureResult(is_failure, ftype, severity, conf, summary, detail, affected, data, rule)
+
+
+def _departs(stats, value: float) -> bool:
+    """
+    Whether value is more than TORQUE_SIGMA off a joint's baseline (standard
+    deviations, or IQRs past the quartiles) and TORQUE_MIN_DEVIATION_NM from
+    its centre. A flat baseline has no spread, so only the floor applies.
+    """
+    if stats.count < TORQUE_MIN_SAMPLES:
+        return False
+    if isinstance(stats, RollingQuantile):
+        q1, q3 = stats.quantile(0.25), stats.quantile(0.75)
+        spread = TORQUE_SIGMA * (q3 - q1)
+        return (value < q1 - spread or value > q3 + spread) and abs(value - stats.median) > TORQUE_MIN_DEVIATION_NM
+    deviation = abs(value - stats.mean)
+    return deviation > TORQUE_SIGMA * (stats.std or 0.0) and deviation > TORQUE_MIN_DEVIATION_NM
 
 
-classifier = FailureClassifier()
+# Shared by every classifier in the server, so one reload updates them all
+rulebook = RuleBook(FailureClassifier)
+classifier = FailureClassifier(rulebook)
@@ -0,0 +1,279 @@
+"""Cross-channel correlation detector - windowed covariance between channel pairs against a learned relationship"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from classifier.classifier import FailureResult
+from classifier.detectors import CHEAP, Detector
+from classifier.rules import FIELD_PATH
+
+# "x~y" pairs of dotted frame paths; two per-joint lists pair up joint by joint
+CORRELATION_PAIRS = os.getenv(
+    "CORRELATION_PAIRS",
+    "joints.torques_nm~joints.velocities_rad_s,"
+    "model.inference_time_ms~model.action_confidence,"
+    "joints.temperatures_c~joints.torques_nm",
+)
+CORRELATION_WINDOW = int(os.getenv("CORRELATION_WINDOW", "50"))
+CORRELATION_HOP = int(os.getenv("CORRELATION_HOP", "5"))
+# Learned relationships only count once this strong (|r|)
+CORRELATION_MIN_STRENGTH = float(os.getenv("CORRELATION_MIN_STRENGTH", "0.6"))
+# Flag when the window's correlation moves this far from the learned one...
+CORRELATION_MAX_DRIFT = float(os.getenv("CORRELATION_MAX_DRIFT", "0.8"))
+# ...or the window's mean sits this many residual deviations off the learned regression line
+CORRELATION_SIGMA = float(os.getenv("CORRELATION_SIGMA", "4.0"))
+CORRELATION_BASELINE_ALPHA = float(os.getenv("CORRELATION_BASELINE_ALPHA", "0.02"))
+CORRELATION_WARMUP = int(os.getenv("CORRELATION_WARMUP", "40"))
+
+# Variances below this are a channel standing still; no relationship is learned from it
+VARIANCE_FLOOR = 1e-9
+# A pair is judged and learned from only when this share of its window has readings
+MIN_COVERAGE = 0.5
+
+
+def parse_pairs(spec: str) -> List[Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+    pairs = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        x, sep, y = part.partition("~")
+        if not sep or not FIELD_PATH.match(x) or not FIELD_PATH.match(y):
+            raise ValueError(f"Correlation pair {part!r} must be two dotted paths joined by ~")
+        pairs.append((tuple(x.split(".")), tuple(y.split("."))))
+    return pairs
+
+
+def _lookup(data: dict, path: Tuple[str, ...]):
+    value = data
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _number(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def _padded(values, count: int) -> list:
+    """A per-joint list cut or padded with None to count joints"""
+    if not isinstance(values, list):
+        return [None] * count
+    return values[:count] + [None] * (count - len(values))
+
+
+class WindowedMoments:
+    """
+    Sums of x, y, x^2, y^2 and xy over the last `window` samples of many
+    (x, y) pairs at once. Each sample adds its terms and removes those of the
+    sample it replaces, so every update is a fixed number of array
+    operations; the sums are recomputed from the window every `resync`
+    samples to clear rounding drift. A NaN in either channel leaves that
+    pair out of the sample, and each pair keeps its own count of readings.
+    """
+
+    __slots__ = ("window", "terms", "sums", "pos", "count", "resync")
+
+    def __init__(self, pairs: int, window: int, resync: Optional[int] = None):
+        self.window = window
+        # x, y, x^2, y^2, xy and whether the pair had a reading
+        self.terms = np.zeros((window, 6, pairs))
+        self.sums = np.zeros((6, pairs))
+        self.pos = 0
+        self.count = 0
+        self.resync = resync or window * 20
+
+    def push(self, x: np.ndarray, y: np.ndarray):
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+        slot = self.terms[self.pos]
+        self.sums -= slot
+        np.stack((x, y, x * x, y * y, x * y, valid), out=slot)
+        self.sums += slot
+        self.pos = (self.pos + 1) % self.window
+        self.count += 1
+        if self.count % self.resync == 0:
+            self.sums = self.terms.sum(axis=0)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.window
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Readings per pair in the window"""
+        return self.sums[5]
+
+    def moments(self) -> Tuple[np.ndarray, ...]:
+        """Means, (population) variances and covariance of each pair's readings in the window"""
+        sx, sy, sxx, syy, sxy = self.sums[:5] / np.maximum(self.sums[5], 1.0)
+        return sx, sy, np.maximum(sxx - sx * sx, 0.0), np.maximum(syy - sy * sy, 0.0), sxy - sx * sy
+
+
+class _RobotPairs:
+    """One robot's resolved pairs, window and learned (EWMA) moments"""
+
+    __slots__ = ("layout", "labels", "joints", "moments", "learned", "evaluations", "frames")
+
+    def __init__(self, layout, labels: List[str], joints: List[Optional[int]], window: int):
+        self.layout = layout
+        self.labels = labels
+        self.joints = joints
+        self.moments = WindowedMoments(len(labels), window)
+        # mean x, mean y, var x, var y, cov
+        self.learned = np.zeros((5, len(labels)))
+        # Per pair, as a pair with gaps sits out some evaluations
+        self.evaluations = np.zeros(len(labels), dtype=int)
+        self.frames = 0
+
+
+class CorrelationDetector(Detector):
+    """
+    Flags channel pairs whose relationship breaks: torque up while velocity
+    falls (an obstruction), inference time up while confidence drops
+    (compute starvation), temperature climbing with torque. For each pair the
+    window's moments are kept incrementally; a slow EWMA of them is the
+    learned relationship (correlation and regression line). Once a pair's
+    learned |r| is strong, a window whose correlation moves more than
+    max_drift away, or whose mean is more than sigma residual deviations off
+    the learned line, is flagged. Learning pauses on flagged pairs.
+    """
+
+    name = "channel_correlation"
+    cost = CHEAP
+
+    def __init__(self, pairs: str = CORRELATION_PAIRS, window: int = CORRELATION_WINDOW,
+                 hop: int = CORRELATION_HOP, min_strength: float = CORRELATION_MIN_STRENGTH,
+                 max_drift: float = CORRELATION_MAX_DRIFT, sigma: float = CORRELATION_SIGMA,
+                 alpha: float = CORRELATION_BASELINE_ALPHA, warmup: int = CORRELATION_WARMUP):
+        self.pairs = parse_pairs(pairs)
+        self.window = window
+        self.hop = hop
+        self.min_strength = min_strength
+        self.max_drift = max_drift
+        self.sigma = sigma
+        self.alpha = alpha
+        self.warmup = warmup
+        self._paths = list(dict.fromkeys(path for pair in self.pairs for path in pair))
+        self._robots: Dict[str, _RobotPairs] = {}
+
+    def _resolve(self, data: dict) -> Optional[_RobotPairs]:
+        """Expand the configured pairs against a robot's first frame"""
+        layout, labels, joints = [], [], []
+        for x_path, y_path in self.pairs:
+            x, y = _lookup(data, x_path), _lookup(data, y_path)
+            if isinstance(x, list) and isinstance(y, list):
+                count = min(len(x), len(y))
+                layout.append((x_path, y_path, count))
+                labels.extend(f"{x_path[-1]}~{y_path[-1]}[{j}]" for j in range(count))
+                joints.extend(range(count))
+            elif isinstance(x, (int, float)) and isinstance(y, (int, float)):
+                layout.append((x_path, y_path, None))
+                labels.append(f"{x_path[-1]}~{y_path[-1]}")
+                joints.append(None)
+        if not labels:
+            return None
+        return _RobotPairs(layout, labels, joints, self.window)
+
+    def _values(self, state: _RobotPairs, data: dict) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """The frame's (x, y) per pair, NaN where a reading is missing; None when there are none"""
+        # Each path is read once even when several pairs share it
+        read = {path: _lookup(data, path) for path in self._paths}
+        xs, ys = [], []
+        for x_path, y_path, count in state.layout:
+            x, y = read[x_path], read[y_path]
+            if count is None:
+                xs.append(x)
+                ys.append(y)
+            else:
+                xs.extend(_padded(x, count))
+                ys.extend(_padded(y, count))
+        try:
+            x, y = np.array(xs, dtype=float), np.array(ys, dtype=float)
+        except (TypeError, ValueError):
+            x, y = np.array([_number(v) for v in xs]), np.array([_number(v) for v in ys])
+        # Gaps only sit out their own pairs; the rest of the frame still counts
+        if np.isnan(x + y).all():
+            return None
+        return x, y
+
+    def update(self, robot_id: str, data: dict) -> Optional[FailureResult]:
+        state = self._robots.get(robot_id)
+        if state is None:
+            state = self._resolve(data)
+            if state is None:
+                return None
+            self._robots[robot_id] = state
+        values = self._values(state, data)
+        if values is None:
+            return None
+        state.moments.push(*values)
+        state.frames += 1
+        if not state.moments.full or state.frames % self.hop:
+            return None
+        return self._evaluate(state)
+
+    def _evaluate(self, state: _RobotPairs) -> Optional[FailureResult]:
+        window = np.array(state.moments.moments())
+        learned = state.learned
+        # Pairs with too many gaps in this window are neither judged nor learned from
+        covered = state.moments.counts >= self.window * MIN_COVERAGE
+        state.evaluations += covered
+        seed = covered & (state.evaluations == 1)
+        learned[:, seed] = window[:, seed]
+        judged = covered & ~seed & (state.evaluations > self.warmup)
+
+        flagged = np.zeros(len(state.labels), dtype=bool)
+        if judged.any():
+            mx, my, vx, vy, cov = learned
+            live = (vx > VARIANCE_FLOOR) & (vy > VARIANCE_FLOOR)
+            r = np.where(live, cov / np.sqrt(np.where(live, vx * vy, 1.0)), 0.0)
+            strong = judged & live & (np.abs(r) >= self.min_strength)
+            if strong.any():
+                wx, wy, wvx, wvy, wcov = window
+                varying = (wvx > VARIANCE_FLOOR) & (wvy > VARIANCE_FLOOR)
+                window_r = np.where(varying, wcov / np.sqrt(np.where(varying, wvx * wvy, 1.0)), r)
+                slope = np.where(live, cov / np.where(live, vx, 1.0), 0.0)
+                residual = wy - (my + slope * (wx - mx))
+                residual_std = np.sqrt(np.maximum(vy * (1.0 - r * r), VARIANCE_FLOOR))
+                drift = np.abs(window_r - r) > self.max_drift
+                off_line = np.abs(residual) > self.sigma * residual_std
+                flagged = strong & (drift | off_line)
+
+        # Learning continues on the pairs that still hold
+        learn = covered & ~seed & ~flagged
+        learned[:, learn] += self.alpha * (window[:, learn] - learned[:, learn])
+        if flagged.any():
+            return self._flagged(state, flagged, r, window_r, residual / residual_std)
+        return None
+
+    def _flagged(self, state: _RobotPairs, flagged: np.ndarray, r: np.ndarray,
+                 window_r: np.ndarray, deviations: np.ndarray) -> FailureResult:
+        broken = np.flatnonzero(flagged).tolist()
+        labels = [state.labels[i] for i in broken]
+        joints = sorted({state.joints[i] for i in broken if state.joints[i] is not None})
+        pairs = sorted({label.split("[")[0] for label in labels})
+        affected: dict = {"channels": pairs}
+        if joints:
+            affected["joints"] = joints
+        where = f" on joint(s) {joints}" if joints else ""
+        return FailureResult(
+            True, "correlation", "medium", 0.70,
+            f"Channel relationship broken: {', '.join(pairs)}{where}",
+            "Channels that normally move together have diverged. "
+            "Check for obstructions, compute starvation or thermal load.",
+            affected,
+            {
+                label: {
+                    "learned_r": round(float(r[i]), 3),
+                    "window_r": round(float(window_r[i]), 3),
+                    "residual_sigma": round(float(deviations[i]), 2),
+                }
+                for label, i in zip(labels, broken)
+            },
+            self.name,
+        )
+
+    def forget(self, robot_id: str):
+        self._robots.pop(robot_id, None)
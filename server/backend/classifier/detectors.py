@@ -0,0 +1,262 @@
+"""Detector plug-ins - cheap ones run inline, expensive ones in a process pool off the event loop"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from classifier.classifier import FailureResult
+
+log = logging.getLogger(__name__)
+
+# Comma-separated "module:Class" detectors registered at startup
+CLASSIFIER_DETECTORS = os.getenv("CLASSIFIER_DETECTORS", "")
+# Worker processes for expensive detectors; 0 runs them on a thread instead
+DETECTOR_WORKERS = int(os.getenv("DETECTOR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# How workers start: fork would copy the event loop, open sockets and the database pool threads
+DETECTOR_START_METHOD = os.getenv("DETECTOR_START_METHOD", "spawn")
+# How often expensive detectors are handed the latest windows
+DETECTOR_INTERVAL_S = float(os.getenv("DETECTOR_INTERVAL_S", "0.5"))
+# A result applies to frames at most this long after the window it was computed on
+DETECTOR_MAX_STALENESS_S = float(os.getenv("DETECTOR_MAX_STALENESS_S", "2.0"))
+
+CHEAP = "cheap"
+EXPENSIVE = "expensive"
+
+
+class Detector:
+    """
+    Base class for detectors beyond the rule chain.
+
+    A cheap detector implements update(), called inline for every frame with
+    whatever per-robot state it keeps, and must cost microseconds.
+
+    An expensive detector declares the `width` values it takes from each
+    frame via features() and implements analyze() over `window` frames at a
+    time. analyze() gets an array shaped (robots, window, width), oldest
+    frame first, NaN where a value was missing, and runs in a worker process:
+    it has to be stateless and the detector picklable.
+    """
+
+    name = "detector"
+    cost = CHEAP
+    window = 0
+    width = 0
+
+    def update(self, robot_id: str, data: dict) -> Optional[FailureResult]:
+        return None
+
+    def forget(self, robot_id: str):
+        pass
+
+    def features(self, data: dict) -> Optional[Sequence[float]]:
+        return None
+
+    def analyze(self, windows: np.ndarray) -> List[Optional[FailureResult]]:
+        return [None] * len(windows)
+
+
+class _Ring:
+    """The last `window` feature rows of one robot for one detector"""
+
+    __slots__ = ("rows", "pos", "count", "last_epoch", "submitted")
+
+    def __init__(self, window: int, width: int):
+        self.rows = np.full((window, width), np.nan)
+        self.pos = 0
+        self.count = 0
+        self.last_epoch = 0.0
+        # count at the last submission; nothing new means nothing to analyze
+        self.submitted = 0
+
+    def push(self, epoch: float, values: Sequence[float]):
+        row = self.rows[self.pos]
+        row[:] = np.nan
+        n = min(len(values), len(row))
+        row[:n] = [np.nan if v is None else v for v in values[:n]]
+        self.pos = (self.pos + 1) % len(self.rows)
+        self.count += 1
+        self.last_epoch = epoch
+
+    def ordered(self, out: np.ndarray):
+        split = len(self.rows) - self.pos
+        out[:split] = self.rows[self.pos:]
+        out[split:] = self.rows[:self.pos]
+
+
+def _analyze_shared(detector: Detector, name: str, shape: Tuple[int, ...]) -> List[Optional[FailureResult]]:
+    """Worker side: view the windows in shared memory, no copy through the pipe"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return detector.analyze(np.ndarray(shape, dtype=np.float64, buffer=block.buf))
+    finally:
+        block.close()
+
+
+class DetectorHub:
+    """
+    Runs registered detectors next to the classifier. observe() is the inline
+    part: cheap detectors, feature rows for expensive ones, and whatever the
+    expensive ones found since. run() hands each expensive detector the
+    windows of robots with new frames every `interval`, at most one batch per
+    detector in flight, with the windows in one shared memory block. Results
+    keep applying to a robot's frames until they are max_staleness older
+    than the window they came from or the next batch replaces them.
+    """
+
+    def __init__(self, workers: int = DETECTOR_WORKERS, interval: float = DETECTOR_INTERVAL_S,
+                 max_staleness: float = DETECTOR_MAX_STALENESS_S):
+        self.workers = workers
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.cheap: List[Detector] = []
+        self.expensive: List[Detector] = []
+        self._rings: Dict[str, Dict[str, _Ring]] = {}
+        # robot -> detector -> (window end epoch, result)
+        self._found: Dict[str, Dict[str, Tuple[float, FailureResult]]] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.batches = 0
+        self.dropped_stale = 0
+
+    def register(self, detector: Detector):
+        if detector.cost == EXPENSIVE:
+            if detector.window < 1 or detector.width < 1:
+                raise ValueError(f"Expensive detector {detector.name} needs a window and width")
+            self.expensive.append(detector)
+        elif detector.cost == CHEAP:
+            self.cheap.append(detector)
+        else:
+            raise ValueError(f"Detector {detector.name} has unknown cost {detector.cost!r}")
+
+    def load(self, spec: str = CLASSIFIER_DETECTORS):
+        for entry in filter(None, (part.strip() for part in spec.split(","))):
+            module, _, cls = entry.partition(":")
+            self.register(getattr(importlib.import_module(module), cls)())
+            log.info(f"Registered detector {entry}")
+
+    def observe(self, robot_id: str, epoch: float, data: dict) -> List[FailureResult]:
+        results = []
+        for detector in self.cheap:
+            result = detector.update(robot_id, data)
+            if result is not None and result.is_failure:
+                results.append(result)
+        if not self.expensive:
+            return results
+
+        rings = self._rings.get(robot_id)
+        if rings is None:
+            rings = self._rings[robot_id] = {d.name: _Ring(d.window, d.width) for d in self.expensive}
+        for detector in self.expensive:
+            values = detector.features(data)
+            if values is not None:
+                rings[detector.name].push(epoch, values)
+
+        found = self._found.get(robot_id)
+        if found:
+            for name, (window_end, result) in list(found.items()):
+                if epoch - window_end > self.max_staleness:
+                    del found[name]
+                    self.dropped_stale += 1
+                else:
+                    results.append(result)
+        return results
+
+    def forget(self, robot_id: str):
+        for detector in self.cheap:
+            detector.forget(robot_id)
+        self._rings.pop(robot_id, None)
+        self._found.pop(robot_id, None)
+
+    async def run(self):
+        tasks: Dict[str, asyncio.Task] = {}
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                for detector in self.expensive:
+                    task = tasks.get(detector.name)
+                    if task is None or task.done():
+                        tasks[detector.name] = asyncio.create_task(self._run_batch(detector))
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            self.close()
+
+    async def _run_batch(self, detector: Detector):
+        batch = [
+            (robot_id, rings[detector.name]) for robot_id, rings in self._rings.items()
+            if rings[detector.name].count >= detector.window
+            and rings[detector.name].count > rings[detector.name].submitted
+        ]
+        if not batch:
+            return
+        # Window ends as submitted; frames keep arriving while the batch runs
+        window_ends = [ring.last_epoch for _, ring in batch]
+        shape = (len(batch), detector.window, detector.width)
+        started = time.perf_counter()
+        try:
+            if self.workers:
+                results = await self._in_pool(detector, batch, shape)
+            else:
+                windows = np.empty(shape)
+                for i, (_, ring) in enumerate(batch):
+                    ring.ordered(windows[i])
+                    ring.submitted = ring.count
+                results = await asyncio.get_running_loop().run_in_executor(None, detector.analyze, windows)
+        except Exception as e:
+            log.error(f"Detector {detector.name} failed on {len(batch)} windows: {e}")
+            return
+
+        self.batches += 1
+        for (robot_id, _), window_end, result in zip(batch, window_ends, results):
+            if robot_id not in self._rings:
+                # Disconnected while the batch ran
+                continue
+            found = self._found.setdefault(robot_id, {})
+            if result is not None and result.is_failure:
+                found[detector.name] = (window_end, result)
+            else:
+                found.pop(detector.name, None)
+        log.debug(f"Detector {detector.name}: {len(batch)} windows in {time.perf_counter() - started:.3f}s")
+
+    async def _in_pool(self, detector: Detector, batch, shape) -> List[Optional[FailureResult]]:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(DETECTOR_START_METHOD)
+            )
+        block = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+        try:
+            windows = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+            for i, (_, ring) in enumerate(batch):
+                ring.ordered(windows[i])
+                ring.submitted = ring.count
+            del windows
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool, _analyze_shared, detector, block.name, shape
+            )
+        finally:
+            block.close()
+            block.unlink()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "cheap": [d.name for d in self.cheap],
+            "expensive": [d.name for d in self.expensive],
+            "robots": len(self._rings),
+            "batches": self.batches,
+            "dropped_stale": self.dropped_stale,
+        }
+
+
+detectors = DetectorHub()
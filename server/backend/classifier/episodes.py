@@ -0,0 +1,184 @@
+"""Failure episodes - consecutive failing frames collapsed into one open/update/close record"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from classifier.classifier import FailureResult
+from db.channels import from_epoch
+
+# Hysteresis: an episode closes once its failure type has been clear this long
+EPISODE_CLOSE_AFTER_S = float(os.getenv("EPISODE_CLOSE_AFTER_S", "1.0"))
+# Failures must persist this long before an episode opens; shorter blips are dropped
+EPISODE_MIN_DURATION_S = float(os.getenv("EPISODE_MIN_DURATION_S", "0"))
+
+SEVERITY_RANK = {"none": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
+
+
+@dataclass
+class Episode:
+    robot_id: str
+    session_id: str
+    result: FailureResult
+    started_at: float
+    last_seen: float
+    frames: int = 1
+    severity: str = "low"
+    confidence: float = 0.0
+    joints: Set[int] = field(default_factory=set)
+    peaks: Dict[str, dict] = field(default_factory=dict)
+    failure_id: Optional[str] = None
+
+    @classmethod
+    def start(cls, robot_id: str, session_id: str, epoch: float, result: FailureResult) -> "Episode":
+        episode = cls(robot_id, session_id, result, epoch, epoch, 0, result.severity, result.confidence)
+        episode.add(epoch, result)
+        return episode
+
+    @property
+    def failure_type(self) -> str:
+        return self.result.failure_type
+
+    @property
+    def opened(self) -> bool:
+        return self.failure_id is not None
+
+    @property
+    def duration_s(self) -> float:
+        return self.last_seen - self.started_at
+
+    def add(self, epoch: float, result: FailureResult):
+        self.frames += 1
+        self.last_seen = epoch
+        if SEVERITY_RANK.get(result.severity, 0) > SEVERITY_RANK.get(self.severity, 0):
+            self.severity = result.severity
+        self.confidence = max(self.confidence, result.confidence)
+        components = result.affected_components or {}
+        self.joints.update(j for j in components.get("joints") or () if isinstance(j, int))
+        # Scalar components (confidence, battery...) keep their range over the episode
+        for name, value in components.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                peak = self.peaks.get(name)
+                if peak is None:
+                    self.peaks[name] = {"min": value, "max": value}
+                else:
+                    peak["min"] = min(peak["min"], value)
+                    peak["max"] = max(peak["max"], value)
+        # Per-joint readings (torques...) keep their per-joint maximum
+        for name, values in (result.classifier_data or {}).items():
+            if not isinstance(values, list) or not all(isinstance(v, (int, float)) or v is None for v in values):
+                continue
+            peak = self.peaks.get(name)
+            if peak is None:
+                self.peaks[name] = {"max": list(values)}
+                continue
+            current = peak["max"]
+            current.extend([None] * (len(values) - len(current)))
+            for i, v in enumerate(values):
+                if v is not None and (current[i] is None or v > current[i]):
+                    current[i] = v
+
+    def record(self) -> dict:
+        """The failure row written when the episode opens"""
+        result = self.result
+        return {
+            "session_id": self.session_id,
+            "robot_id": self.robot_id,
+            "detected_at": from_epoch(self.started_at),
+            "failure_type": result.failure_type,
+            "severity": self.severity,
+            "confidence": self.confidence,
+            "summary": result.summary,
+            "detail": result.detail,
+            "affected_components": result.affected_components,
+            "classifier_data": result.classifier_data,
+        }
+
+    def closing(self) -> dict:
+        """Fields updated on the failure row when the episode closes"""
+        affected = dict(self.result.affected_components or {})
+        if self.joints:
+            affected["joints"] = sorted(self.joints)
+        return {
+            "ended_at": from_epoch(self.last_seen),
+            "duration_s": round(self.duration_s, 3),
+            "frames": self.frames,
+            "severity": self.severity,
+            "confidence": self.confidence,
+            "affected_components": affected,
+            "classifier_data": {**(self.result.classifier_data or {}), "peak": self.peaks},
+        }
+
+    def alert(self) -> dict:
+        return {
+            "id": self.failure_id,
+            "failure_type": self.failure_type,
+            "severity": self.severity,
+            "summary": self.result.summary,
+            "timestamp": from_epoch(self.started_at).isoformat(),
+        }
+
+
+class EpisodeTracker:
+    """
+    One open episode per (robot, failure type). A failing frame opens or
+    extends the episode for its type; once that type has been clear for
+    close_after seconds the episode closes. Episodes only open (get a
+    failure row and an alert) after lasting min_duration seconds, so brief
+    blips never reach storage.
+
+    step() returns the episodes opened and closed by a frame; the caller
+    does the writes and broadcasts and sets failure_id on opened ones.
+    """
+
+    def __init__(self, close_after: float = EPISODE_CLOSE_AFTER_S, min_duration: float = EPISODE_MIN_DURATION_S):
+        self.close_after = close_after
+        self.min_duration = min_duration
+        self._active: Dict[str, Dict[str, Episode]] = {}
+
+    def step(self, robot_id: str, session_id: str, epoch: float,
+             result: FailureResult) -> Tuple[List[Episode], List[Episode]]:
+        active = self._active.get(robot_id)
+        if active is None:
+            if not result.is_failure:
+                return [], []
+            active = self._active[robot_id] = {}
+
+        opened: List[Episode] = []
+        closed: List[Episode] = []
+        for failure_type, episode in list(active.items()):
+            if failure_type != result.failure_type and epoch - episode.last_seen >= self.close_after:
+                del active[failure_type]
+                if episode.opened:
+                    closed.append(episode)
+
+        if result.is_failure:
+            episode = active.get(result.failure_type)
+            if episode is None:
+                episode = active[result.failure_type] = Episode.start(robot_id, session_id, epoch, result)
+            else:
+                episode.add(epoch, result)
+            if not episode.opened and episode.duration_s >= self.min_duration:
+                opened.append(episode)
+
+        if not active:
+            del self._active[robot_id]
+        return opened, closed
+
+    def current(self, robot_id: str) -> Optional[Episode]:
+        """The most severe open episode for the robot"""
+        episodes = [e for e in self._active.get(robot_id, {}).values() if e.opened]
+        if not episodes:
+            return None
+        return max(episodes, key=lambda e: SEVERITY_RANK.get(e.severity, 0))
+
+    def close_all(self, robot_id: str) -> List[Episode]:
+        """End every episode of the robot, e.g. when its session ends"""
+        active = self._active.pop(robot_id, {})
+        return [episode for episode in active.values() if episode.opened]
+
+    def __len__(self) -> int:
+        return sum(len(active) for active in self._active.values())
+
+
+episodes = EpisodeTracker()
@@ -0,0 +1,394 @@
+"""Declarative classifier rules - compiled per robot model, reloadable at runtime"""
+
+import asyncio
+import json
+import logging
+import math
+import operator
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field, fields
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+CLASSIFIER_RULES_PATH = os.getenv("CLASSIFIER_RULES_PATH")
+CLASSIFIER_RULES_RELOAD_S = float(os.getenv("CLASSIFIER_RULES_RELOAD_S", "5"))
+
+DEFAULT_MODEL = "default"
+FIELD_PATH = re.compile(r"^[A-Za-z_][\w-]*(\.[A-Za-z_][\w-]*)*$")
+SEVERITIES = ("low", "medium", "high", "critical")
+EVIDENCE = ("indexes", "values", "value")
+COMPARATORS: Dict[str, Optional[Callable[[Any, Any], bool]]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "is_null": None,
+}
+
+
+@dataclass(frozen=True)
+class RuleSpec:
+    """
+    One rule. `field` is a dotted path into the telemetry frame. On a list
+    field (per-joint values) the comparison is made per element and the rule
+    fires with the indexes that matched; on a scalar it fires with the value.
+
+    summary/detail are str.format templates over {joints} (matched indexes),
+    {value} (the scalar), {values} (the whole list), {threshold} and {name}.
+    The rule only fires once its condition has held for `window` frames of
+    the robot in a row. `component` names the affected_components key, and
+    `evidence` maps classifier_data keys to "indexes", "values" or "value".
+    """
+
+    name: str
+    field: str
+    op: str
+    threshold: Optional[Any] = None
+    failure_type: str = "system"
+    severity: str = "medium"
+    confidence: float = 0.8
+    summary: str = "{name}"
+    detail: str = ""
+    window: int = 1
+    component: str = "joints"
+    evidence: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "RuleSpec":
+        known = {f.name for f in fields(cls)}
+        unknown = set(raw) - known
+        if unknown:
+            raise ValueError(f"Rule {raw.get('name')!r}: unknown key(s) {', '.join(sorted(unknown))}")
+        try:
+            spec = cls(**raw)
+        except TypeError as e:
+            raise ValueError(f"Rule {raw.get('name')!r}: {e}")
+        spec.validate()
+        return spec
+
+    def validate(self):
+        for name in ("name", "field", "op", "failure_type", "severity", "summary", "detail", "component"):
+            if not isinstance(getattr(self, name), str):
+                raise ValueError(f"Rule {self.name!r}: {name} must be a string")
+        if self.op not in COMPARATORS:
+            raise ValueError(f"Rule {self.name!r}: op must be one of {', '.join(COMPARATORS)}")
+        if self.op != "is_null" and not isinstance(self.threshold, (int, float, str)):
+            raise ValueError(f"Rule {self.name!r}: {self.op} needs a number or string threshold")
+        # json reads Infinity and NaN, which have no literal in the generated code
+        if isinstance(self.threshold, float) and not math.isfinite(self.threshold):
+            raise ValueError(f"Rule {self.name!r}: threshold must be finite")
+        if not FIELD_PATH.match(self.field):
+            raise ValueError(f"Rule {self.name!r}: field must be a dotted path like model.action_confidence")
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"Rule {self.name!r}: severity must be one of {', '.join(SEVERITIES)}")
+        if not isinstance(self.confidence, (int, float)) or isinstance(self.confidence, bool):
+            raise ValueError(f"Rule {self.name!r}: confidence must be a number")
+        if not isinstance(self.window, int) or isinstance(self.window, bool) or self.window < 1:
+            raise ValueError(f"Rule {self.name!r}: window must be an integer of at least 1")
+        if not isinstance(self.evidence, dict):
+            raise ValueError(f"Rule {self.name!r}: evidence must be an object")
+        for key, source in self.evidence.items():
+            if source not in EVIDENCE:
+                raise ValueError(f"Rule {self.name!r}: evidence {key!r} must be one of {', '.join(EVIDENCE)}")
+        # Catch template typos at load time rather than on the first failure
+        for template in (self.summary, self.detail):
+            try:
+                template.format(joints=[0], value=0.0, values=[0.0], threshold=self.threshold, name=self.name)
+            except (KeyError, IndexError, ValueError) as e:
+                raise ValueError(f"Rule {self.name!r}: bad template {template!r} ({e})")
+
+
+def builtin_rules(limits) -> List[RuleSpec]:
+    """The original rule chain, thresholds taken from FailureClassifier's class attributes"""
+    return [
+        RuleSpec("sensor_dropout", "joints.positions_rad", "is_null",
+                 failure_type="sensor", severity="high", confidence=0.95,
+                 summary="Sensor dropout on joint(s) {joints}",
+                 detail="Joint encoder(s) {joints} returned null. Check connections.",
+                 evidence={"null_joints": "indexes"}),
+        RuleSpec("motor_overload", "joints.torques_nm", ">", limits.TORQUE_OVERLOAD_NM,
+                 failure_type="motor", severity="high", confidence=0.90,
+                 summary="Motor overload on joint(s) {joints}",
+                 detail="Abnormal torque detected. Check for obstructions.",
+                 evidence={"torques": "values"}),
+        RuleSpec("model_critical", "model.action_confidence", "<", limits.CONFIDENCE_CRITICAL,
+                 failure_type="model", severity="critical", confidence=0.88,
+                 summary="AI model critically uncertain ({value:.0%})",
+                 detail="Model in unfamiliar situation. Consider stopping robot.",
+                 component="confidence"),
+        RuleSpec("model_low_confidence", "model.action_confidence", "<", limits.CONFIDENCE_LOW,
+                 failure_type="model", severity="medium", confidence=0.80,
+                 summary="AI model low confidence ({value:.0%})",
+                 detail="Model uncertain. Monitor closely.",
+                 component="confidence"),
+        RuleSpec("low_battery", "system.battery_percent", "<", limits.BATTERY_LOW,
+                 failure_type="system", severity="medium", confidence=1.0,
+                 summary="Low battery ({value:.0f}%)",
+                 detail="Return to charging station.",
+                 component="battery"),
+    ]
+
+
+def _compile_chain(rules: Tuple["CompiledRule", ...]) -> Callable[[dict, Optional[Dict[str, int]]], Any]:
+    """
+    Generate one straight-line Python function for a rule chain, the way the
+    rules used to be written by hand: each field is looked up once, thresholds
+    are literals, and evaluation stops at the first rule that fires. Only
+    validated paths, comparators from COMPARATORS and repr() of numbers and
+    strings reach the source.
+    """
+    lines = ["def evaluate(data, runs):"]
+    namespace: Dict[str, Any] = {}
+    names: Dict[str, str] = {}
+
+    def lookup(path: str) -> str:
+        parts = path.split(".")
+        parent = "data"
+        for depth in range(1, len(parts) + 1):
+            prefix = ".".join(parts[:depth])
+            if prefix not in names:
+                names[prefix] = f"v{len(names)}"
+                key = repr(parts[depth - 1])
+                default = "" if depth == len(parts) else ", {}"
+                lines.append(f"    {names[prefix]} = {parent}.get({key}{default})")
+            parent = names[prefix]
+        return parent
+
+    for k, rule in enumerate(rules):
+        spec = rule.spec
+        namespace[f"rule{k}"] = rule
+        value = lookup(spec.field)
+        if spec.op == "is_null":
+            # A field that is absent altogether is not a null reading
+            parent = names[spec.field.rpartition(".")[0]] if "." in spec.field else "data"
+            element, scalar = "x is None", f"{value} is None and {spec.field.split('.')[-1]!r} in {parent}"
+            hit = "True"
+        else:
+            threshold = repr(spec.threshold)
+            element = f"x is not None and x {spec.op} {threshold}"
+            scalar = f"{value} is not None and {value} {spec.op} {threshold}"
+            hit = value
+        lines += [
+            f"    if {value}.__class__ is list:",
+            f"        m = [i for i, x in enumerate({value}) if {element}] or None",
+            "    else:",
+            f"        m = {hit} if {scalar} else None",
+        ]
+        if rule.window > 1:
+            name = repr(rule.name)
+            lines += [
+                "    if m is not None:",
+                f"        runs[{name}] = run = runs.get({name}, 0) + 1",
+                f"        if run >= {rule.window}:",
+                f"            return rule{k}, m, {value}",
+                "    else:",
+                f"        runs[{name}] = 0",
+            ]
+        else:
+            lines += [
+                "    if m is not None:",
+                f"        return rule{k}, m, {value}",
+            ]
+    lines.append("    return None")
+    exec("\n".join(lines), namespace)
+    return namespace["evaluate"]
+
+
+class CompiledRule:
+    __slots__ = ("spec", "name", "window")
+
+    def __init__(self, spec: RuleSpec):
+        self.spec = spec
+        self.name = spec.name
+        self.window = int(spec.window)
+
+    def render(self, matched, raw) -> Tuple[str, str, dict, dict]:
+        """summary, detail, affected_components and classifier_data for a firing"""
+        spec = self.spec
+        joints = matched if isinstance(raw, list) else []
+        value = None if isinstance(raw, list) else raw
+        params = {"joints": joints, "value": value, "values": raw, "threshold": spec.threshold, "name": spec.name}
+        affected = {spec.component: joints if isinstance(raw, list) else value}
+        evidence = {"indexes": joints, "values": raw, "value": value}
+        data = {key: evidence[source] for key, source in spec.evidence.items()}
+        return spec.summary.format(**params), spec.detail.format(**params), affected, data
+
+
+class RuleSet:
+    """
+    A robot model's rules in priority order; the first to fire wins.
+
+    evaluate(data, runs) returns (rule, matched, raw value) for that rule, or
+    None. `runs` holds the robot's in-a-row counts for windowed rules, which
+    count the frames they were evaluated and matched on.
+    """
+
+    def __init__(self, model: str, specs: List[RuleSpec], builtin: bool = False):
+        self.model = model
+        self.specs = specs
+        self.rules = tuple(CompiledRule(spec) for spec in specs)
+        self.windowed = any(rule.window > 1 for rule in self.rules)
+        # True when these are exactly the built-in rules, which classify_batch can vectorize
+        self.builtin = builtin
+        self.evaluate = _compile_chain(self.rules)
+
+
+def _merge(base: List[RuleSpec], overrides: List[dict], model: str) -> List[RuleSpec]:
+    """Rules named like a base rule update it in place (partial dicts allowed); others append"""
+    merged = {spec.name: spec for spec in base}
+    order = [spec.name for spec in base]
+    for raw in overrides:
+        if not isinstance(raw, dict) or not raw.get("name"):
+            raise ValueError(f"Model {model!r}: every rule needs a name")
+        raw = dict(raw)
+        name = raw["name"]
+        if raw.pop("disabled", False):
+            merged.pop(name, None)
+            continue
+        if name in merged:
+            merged[name] = RuleSpec.from_dict({**asdict(merged[name]), **raw})
+        else:
+            merged[name] = RuleSpec.from_dict(raw)
+            if name not in order:
+                order.append(name)
+    return [merged[name] for name in order if name in merged]
+
+
+class RuleBook:
+    """
+    Rule sets per robot model, compiled once per load. A robot's model comes
+    from its session metadata ("robot_model") or from the file's robot id
+    patterns, falling back to "default".
+
+    The JSON file looks like:
+        {"models": {"default": {"rules": [...]},
+                    "ur5": {"extends": "default", "rules": [{"name": "motor_overload", "threshold": 80}]}},
+         "robots": {"arm_*": "ur5"}}
+    A model that extends another starts from its rules; rules given by name
+    override fields of the inherited rule, "disabled": true drops it, and new
+    names are appended. Without a file (or a "default" model in it) the
+    built-in rules apply.
+
+    reload() compiles the whole file before swapping it in, so a bad edit
+    keeps the previous rules, and classifier state is never touched.
+    """
+
+    def __init__(self, limits, path: Optional[str] = CLASSIFIER_RULES_PATH):
+        self.limits = limits
+        self.path = path
+        self.models: Dict[str, RuleSet] = {DEFAULT_MODEL: RuleSet(DEFAULT_MODEL, builtin_rules(limits), builtin=True)}
+        self.robots: Dict[str, str] = {}
+        # Bumped on every successful reload so classifiers drop cached rule sets
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self.mtime: Optional[float] = None
+        self.error: Optional[str] = None
+        if path:
+            self.reload()
+
+    def compile(self, config: dict) -> Dict[str, RuleSet]:
+        if not isinstance(config, dict):
+            raise ValueError("rules file must hold an object")
+        raw_models = config.get("models") or {}
+        if not isinstance(raw_models, dict):
+            raise ValueError("models must be an object")
+        builtin = builtin_rules(self.limits)
+        compiled: Dict[str, RuleSet] = {}
+
+        def build(name: str, seen: Tuple[str, ...] = ()) -> RuleSet:
+            if name in compiled:
+                return compiled[name]
+            if name in seen:
+                raise ValueError(f"Model {name!r} extends itself")
+            raw = raw_models.get(name)
+            if raw is None:
+                if name != DEFAULT_MODEL:
+                    raise ValueError(f"Unknown model {name!r}")
+                compiled[name] = RuleSet(name, builtin, builtin=True)
+                return compiled[name]
+            if not isinstance(raw, dict):
+                raise ValueError(f"Model {name!r} must be an object")
+            parent = raw.get("extends")
+            if parent is not None and not isinstance(parent, str):
+                raise ValueError(f"Model {name!r}: extends must name a model")
+            rules = raw.get("rules") or []
+            if not isinstance(rules, list):
+                raise ValueError(f"Model {name!r}: rules must be a list")
+            base = build(parent, seen + (name,)).specs if parent else []
+            specs = _merge(base, rules, name)
+            compiled[name] = RuleSet(name, specs, builtin=specs == builtin)
+            return compiled[name]
+
+        build(DEFAULT_MODEL)
+        for name in raw_models:
+            build(name)
+        return compiled
+
+    def reload(self) -> bool:
+        """Load and compile the file; returns False (keeping the current rules) if it is invalid"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path) as f:
+                config = json.load(f)
+            models = self.compile(config)
+            robots = config.get("robots") or {}
+            if not isinstance(robots, dict):
+                raise ValueError("robots must be an object of id pattern to model")
+            for pattern, model in robots.items():
+                if not isinstance(model, str) or model not in models:
+                    raise ValueError(f"Robot pattern {pattern!r} maps to unknown model {model!r}")
+        except Exception as e:
+            # Whatever is wrong with the file, the current rules stay and the watcher keeps running
+            self.error = str(e) or type(e).__name__
+            log.error(f"Classifier rules not loaded from {self.path}: {self.error}")
+            return False
+        self.models, self.robots = models, dict(robots)
+        self.version += 1
+        self.mtime, self.loaded_at, self.error = mtime, time.time(), None
+        log.info(f"Classifier rules loaded from {self.path}: {', '.join(sorted(models))}")
+        return True
+
+    def changed(self) -> bool:
+        try:
+            return os.path.getmtime(self.path) != self.mtime
+        except OSError:
+            return False
+
+    def model_of(self, robot_id: str) -> str:
+        if not self.robots:
+            return DEFAULT_MODEL
+        if robot_id in self.robots:
+            return self.robots[robot_id]
+        for pattern, model in self.robots.items():
+            if fnmatchcase(robot_id, pattern):
+                return model
+        return DEFAULT_MODEL
+
+    def rules_for(self, model: str) -> RuleSet:
+        return self.models.get(model) or self.models[DEFAULT_MODEL]
+
+    def describe(self) -> dict:
+        return {
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+            "robots": self.robots,
+            "models": {name: [asdict(spec) for spec in ruleset.specs] for name, ruleset in self.models.items()},
+        }
+
+
+async def watch_rules(book: RuleBook, interval: float = CLASSIFIER_RULES_RELOAD_S):
+    """Reload the rule file whenever it changes on disk"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if book.path and book.changed():
+                book.reload()
+        except Exception as e:
+            log.error(f"Classifier rules watch failed: {e}")
@@ -0,0 +1,251 @@
+"""Streaming spectral detector - per-joint band power by sliding DFT, for oscillation and vibration"""
+
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from classifier.classifier import FailureResult
+from classifier.detectors import CHEAP, Detector
+
+SPECTRAL_WINDOW = int(os.getenv("SPECTRAL_WINDOW", "64"))
+# Bands in cycles per sample (0 - 0.5, Nyquist); the sample rate is whatever the agent sends
+SPECTRAL_BANDS = os.getenv("SPECTRAL_BANDS", "0.05-0.15,0.15-0.3,0.3-0.5")
+SPECTRAL_CHANNELS = tuple(os.getenv("SPECTRAL_CHANNELS", "torques_nm,velocities_rad_s").split(","))
+# Band power is compared with its baseline every this many frames
+SPECTRAL_HOP = int(os.getenv("SPECTRAL_HOP", "4"))
+SPECTRAL_SIGMA = float(os.getenv("SPECTRAL_SIGMA", "4.0"))
+# ...and must also be this many times the baseline power
+SPECTRAL_MIN_RATIO = float(os.getenv("SPECTRAL_MIN_RATIO", "4.0"))
+SPECTRAL_BASELINE_ALPHA = float(os.getenv("SPECTRAL_BASELINE_ALPHA", "0.02"))
+# Baseline evaluations before anything is flagged
+SPECTRAL_WARMUP = int(os.getenv("SPECTRAL_WARMUP", "32"))
+
+# Floors: log10 power of a silent channel, and the smallest baseline spread
+POWER_FLOOR = 1e-12
+LOG_STD_FLOOR = 0.05
+
+
+def parse_bands(spec: str) -> List[Tuple[float, float]]:
+    bands = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        lo, hi = (float(x) for x in part.split("-"))
+        if not 0 <= lo < hi <= 0.5:
+            raise ValueError(f"Spectral band {part} is outside 0-0.5 cycles per sample")
+        bands.append((lo, hi))
+    return bands
+
+
+class SlidingSpectrum:
+    """
+    DFT bins of the last `window` samples of several channels at once, kept
+    with the sliding DFT recurrence X_k <- (X_k + x_newest - x_oldest) * w_k,
+    w_k = e^(2*pi*i*k/N), rather than an FFT per sample.
+
+    push() only records each sample's delta against the value it replaces;
+    spectrum() folds the pending deltas in with one product,
+    X_k <- X_k * w_k^m + sum_j delta_j * w_k^(m-j), so callers that read
+    every few samples pay one matrix product per read instead of several
+    array operations per sample. Rounding drift is cleared by recomputing
+    the bins with an FFT every `resync` samples.
+    """
+
+    __slots__ = ("window", "bins", "powers", "samples", "pos", "count", "pending", "deltas", "_spectrum",
+                 "resync", "_since_resync")
+
+    def __init__(self, channels: int, window: int, bins: np.ndarray, resync: Optional[int] = None):
+        self.window = window
+        self.bins = bins
+        # powers[j] = w^j for every bin, j = 0..window
+        self.powers = np.exp(2j * np.pi * np.outer(np.arange(window + 1), bins) / window)
+        self.samples = np.zeros((channels, window))
+        self.pos = 0
+        self.count = 0
+        self.deltas = np.zeros((channels, window))
+        self.pending = 0
+        self._spectrum = np.zeros((channels, len(bins)), dtype=complex)
+        self.resync = resync or window * 16
+        self._since_resync = 0
+
+    def push(self, values: np.ndarray):
+        if self.pending == self.window:
+            self._fold()
+        pos = self.pos
+        self.deltas[:, self.pending] = values - self.samples[:, pos]
+        self.samples[:, pos] = values
+        self.pos = (pos + 1) % self.window
+        self.pending += 1
+        self.count += 1
+
+    def _fold(self):
+        m = self.pending
+        if not m:
+            return
+        self._since_resync += m
+        self.pending = 0
+        if self._since_resync >= self.resync:
+            self._since_resync = 0
+            ordered = np.roll(self.samples, -self.pos, axis=1)
+            self._spectrum = np.fft.fft(ordered, axis=1)[:, self.bins]
+            return
+        self._spectrum *= self.powers[m]
+        self._spectrum += self.deltas[:, :m] @ self.powers[m:0:-1]
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.window
+
+    def spectrum(self) -> np.ndarray:
+        self._fold()
+        return self._spectrum
+
+    def power(self) -> np.ndarray:
+        spectrum = self.spectrum()
+        return spectrum.real ** 2 + spectrum.imag ** 2
+
+
+class _RobotSpectra:
+    """One robot's spectrum and per (channel, joint, band) log-power baseline"""
+
+    __slots__ = ("spectrum", "joints", "last", "mean", "var", "evaluations", "frames")
+
+    def __init__(self, spectrum: SlidingSpectrum, joints: int, bands: int):
+        self.spectrum = spectrum
+        self.joints = joints
+        self.last = np.zeros(spectrum.samples.shape[0])
+        self.mean = np.zeros((spectrum.samples.shape[0], bands))
+        self.var = np.zeros((spectrum.samples.shape[0], bands))
+        self.evaluations = 0
+        self.frames = 0
+
+
+class SpectralDetector(Detector):
+    """
+    Flags joints whose band power (e.g. torque chatter at a quarter of the
+    sample rate) jumps above that joint's own baseline for the band. Every
+    configured channel of every joint is one row of a SlidingSpectrum, so a
+    frame costs a handful of NumPy operations per robot whatever the joint
+    count. Baselines are EWMA mean/variance of log10 band power, frozen while
+    a band is flagged so an oscillation does not become the new normal.
+    Missing values repeat the joint's previous sample.
+    """
+
+    name = "spectral_oscillation"
+    cost = CHEAP
+
+    def __init__(self, window: int = SPECTRAL_WINDOW, bands: str = SPECTRAL_BANDS,
+                 channels: Sequence[str] = SPECTRAL_CHANNELS, hop: int = SPECTRAL_HOP,
+                 sigma: float = SPECTRAL_SIGMA, min_ratio: float = SPECTRAL_MIN_RATIO,
+                 alpha: float = SPECTRAL_BASELINE_ALPHA, warmup: int = SPECTRAL_WARMUP):
+        self.window = window
+        self.bands = parse_bands(bands)
+        self.channels = tuple(channels)
+        self.hop = hop
+        self.sigma = sigma
+        self.log_min_ratio = float(np.log10(min_ratio))
+        self.alpha = alpha
+        self.warmup = warmup
+        # Bins 1..N/2, each assigned to the band its frequency k/N falls in
+        self.bins = np.arange(1, window // 2 + 1)
+        frequencies = self.bins / window
+        self.band_matrix = np.array([
+            [1.0 if lo <= f < hi or (hi == 0.5 and f == 0.5) else 0.0 for lo, hi in self.bands]
+            for f in frequencies
+        ])
+        self._robots: Dict[str, _RobotSpectra] = {}
+
+    def _values(self, data: dict) -> Optional[np.ndarray]:
+        """One row per (channel, joint), channel by channel; None when no channel is present"""
+        joints = data.get("joints") or {}
+        lists = [joints.get(channel) or () for channel in self.channels]
+        width = max(len(values) for values in lists)
+        if not width:
+            return None
+        if all(len(values) == width for values in lists):
+            try:
+                # None becomes NaN here; anything non-numeric takes the slow path
+                return np.array(lists, dtype=float).ravel()
+            except (TypeError, ValueError):
+                pass
+        rows = np.full((len(self.channels), width), np.nan)
+        for row, values in zip(rows, lists):
+            row[:len(values)] = [v if isinstance(v, (int, float)) else np.nan for v in values]
+        return rows.ravel()
+
+    def update(self, robot_id: str, data: dict) -> Optional[FailureResult]:
+        values = self._values(data)
+        if values is None:
+            return None
+        state = self._robots.get(robot_id)
+        if state is None or len(values) != len(state.last):
+            # New robot, or its joint count changed: start over
+            spectrum = SlidingSpectrum(len(values), self.window, self.bins)
+            state = self._robots[robot_id] = _RobotSpectra(spectrum, len(values) // len(self.channels), len(self.bands))
+        if np.isnan(values.sum()):
+            missing = np.isnan(values)
+            values[missing] = state.last[missing]
+        state.last = values
+        state.spectrum.push(values)
+        state.frames += 1
+        if not state.spectrum.full or state.frames % self.hop:
+            return None
+        return self._evaluate(state)
+
+    def _evaluate(self, state: _RobotSpectra) -> Optional[FailureResult]:
+        log_power = np.log10(state.spectrum.power() @ self.band_matrix + POWER_FLOOR)
+        state.evaluations += 1
+        if state.evaluations == 1:
+            state.mean[:] = log_power
+            return None
+
+        excess = log_power - state.mean
+        increment = self.alpha * excess
+        flagged = None
+        if state.evaluations > self.warmup:
+            # The power ratio test is the cheap one and rarely passes; sigma is checked on what does
+            flagged = excess > self.log_min_ratio
+            if flagged.any():
+                flagged &= excess > self.sigma * np.sqrt(np.maximum(state.var, LOG_STD_FLOOR ** 2))
+            if not flagged.any():
+                flagged = None
+
+        if flagged is None:
+            state.mean += increment
+            state.var += excess * increment
+            state.var *= 1.0 - self.alpha
+            return None
+        # EWMA baseline, only where the band is not flagged
+        update = ~flagged
+        state.mean[update] += increment[update]
+        state.var[update] = (1.0 - self.alpha) * (state.var[update] + excess[update] * increment[update])
+        return self._result(state, log_power, flagged, excess)
+
+    def _result(self, state: _RobotSpectra, log_power: np.ndarray, flagged: np.ndarray,
+                excess: np.ndarray) -> FailureResult:
+        rows = np.nonzero(flagged)[0]
+        joints = sorted({int(row) % state.joints for row in rows})
+        worst = np.unravel_index(np.argmax(np.where(flagged, excess, -np.inf)), excess.shape)
+        channel = self.channels[worst[0] // state.joints]
+        lo, hi = self.bands[worst[1]]
+        ratio = float(10 ** excess[worst])
+        return FailureResult(
+            True, "vibration", "medium", 0.75,
+            f"Oscillation on joint(s) {joints}",
+            f"{channel} band {lo:g}-{hi:g} cycles/sample at {ratio:.0f}x its baseline power. "
+            "Check for chatter, resonance or a loose coupling.",
+            {"joints": joints},
+            {
+                "channel": channel,
+                "band": [lo, hi],
+                "power_ratio": round(ratio, 2),
+                "bands": {
+                    f"{self.channels[row // state.joints]}[{row % state.joints}]":
+                        [round(float(10 ** excess[row, b]), 2) for b in range(len(self.bands))]
+                    for row in sorted(set(rows.tolist()))
+                },
+            },
+            self.name,
+        )
+
+    def forget(self, robot_id: str):
+        self._robots.pop(robot_id, None)
@@ -0,0 +1,248 @@
+"""Classifier state lifecycle - idle robots evicted under a budget, snapshots kept across restarts"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from classifier.stats import stats_from_dict
+
+log = logging.getLogger(__name__)
+
+CLASSIFIER_STATE_PATH = os.getenv("CLASSIFIER_STATE_PATH")
+# Robots whose rolling state is held live; the least recently seen beyond this are evicted
+CLASSIFIER_STATE_MAX_ROBOTS = int(os.getenv("CLASSIFIER_STATE_MAX_ROBOTS", "10000"))
+# Evicted and restored state is kept compact (serialized) up to this many bytes
+CLASSIFIER_STATE_MAX_COLD_BYTES = int(os.getenv("CLASSIFIER_STATE_MAX_COLD_MB", "64")) * 1024 * 1024
+CLASSIFIER_STATE_IDLE_S = float(os.getenv("CLASSIFIER_STATE_IDLE_S", "3600"))
+# How often idle robots are looked for, snapshots or not
+CLASSIFIER_EVICT_S = float(os.getenv("CLASSIFIER_EVICT_S", "60"))
+# Robots silent this long are forgotten entirely, e.g. once retired
+CLASSIFIER_STATE_TTL_S = float(os.getenv("CLASSIFIER_STATE_TTL_S", str(30 * 86400)))
+CLASSIFIER_SNAPSHOT_S = float(os.getenv("CLASSIFIER_SNAPSHOT_S", "300"))
+
+SNAPSHOT_FORMAT = "robotblackbox-classifier-state"
+SNAPSHOT_VERSION = 1
+
+
+class ClassifierState:
+    """
+    Tracks which robots a FailureClassifier holds state for, in least recently
+    seen order. Past max_robots the oldest robot's state (rolling windows,
+    run counters, model pin) is serialized into a compact cold record and
+    dropped from the classifier; a robot with a cold record is rehydrated on
+    its next frame. Cold records are what snapshots write to disk, alongside
+    the live robots, as gzip-compressed JSON lines behind a versioned header.
+    """
+
+    def __init__(self, classifier, max_robots: int = CLASSIFIER_STATE_MAX_ROBOTS,
+                 max_cold_bytes: int = CLASSIFIER_STATE_MAX_COLD_BYTES, ttl: float = CLASSIFIER_STATE_TTL_S):
+        self.classifier = classifier
+        self.max_robots = max_robots
+        self.max_cold_bytes = max_cold_bytes
+        self.ttl = ttl
+        self._live: "OrderedDict[str, float]" = OrderedDict()
+        self._cold: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cold_seen: Dict[str, float] = {}
+        self._cold_bytes = 0
+        self.evictions = 0
+        self.rehydrations = 0
+
+    def touch(self, robot_id: str, now: Optional[float] = None, trim: bool = True):
+        """Mark the robot seen, bringing its state back from a cold record first"""
+        live = self._live
+        if robot_id in live:
+            live.move_to_end(robot_id)
+            live[robot_id] = now or time.time()
+            return
+        record = self._pop_cold(robot_id)
+        if record is not None:
+            self._load(robot_id, json.loads(record))
+            self.rehydrations += 1
+        live[robot_id] = now or time.time()
+        if trim and len(live) > self.max_robots:
+            self.trim()
+
+    def trim(self):
+        """Evict the least recently seen robots down to max_robots"""
+        while len(self._live) > self.max_robots:
+            self.evict(next(iter(self._live)))
+
+    def evict(self, robot_id: str):
+        seen = self._live.pop(robot_id, None)
+        if seen is None:
+            return
+        record = self._dump(robot_id, seen)
+        self._forget(robot_id)
+        self._put_cold(robot_id, seen, json.dumps(record, separators=(",", ":")).encode())
+        self.evictions += 1
+
+    def evict_idle(self, idle_s: float = CLASSIFIER_STATE_IDLE_S, now: Optional[float] = None) -> int:
+        """Move robots idle for idle_s to cold records and drop cold records past the TTL"""
+        now = now or time.time()
+        idle = [robot_id for robot_id, seen in self._live.items() if now - seen >= idle_s]
+        for robot_id in idle:
+            self.evict(robot_id)
+        for robot_id in [r for r, seen in self._cold_seen.items() if now - seen >= self.ttl]:
+            self._pop_cold(robot_id)
+        return len(idle)
+
+    def _dump(self, robot_id: str, seen: float) -> dict:
+        c = self.classifier
+        record: dict = {"robot_id": robot_id, "seen": seen}
+        stats = c._confidence_stats.get(robot_id)
+        if stats is not None:
+            record["confidence"] = stats.to_dict()
+        torque = c._torque_stats.get(robot_id)
+        if torque:
+            record["torque"] = [s.to_dict() for s in torque]
+        if c._consecutive.get(robot_id):
+            record["consecutive"] = c._consecutive[robot_id]
+        if c._rule_runs.get(robot_id):
+            record["runs"] = c._rule_runs[robot_id]
+        if robot_id in c._models:
+            record["model"] = c._models[robot_id]
+        return record
+
+    def _load(self, robot_id: str, record: dict):
+        c = self.classifier
+        if "confidence" in record:
+            c._confidence_stats[robot_id] = stats_from_dict(record["confidence"])
+        if "torque" in record:
+            c._torque_stats[robot_id] = [stats_from_dict(s) for s in record["torque"]]
+        if "consecutive" in record:
+            c._consecutive[robot_id] = record["consecutive"]
+        if "runs" in record:
+            c._rule_runs[robot_id] = dict(record["runs"])
+        if "model" in record:
+            c._models[robot_id] = record["model"]
+
+    def forget(self, robot_id: str):
+        """Drop a robot's state, live or cold"""
+        self._live.pop(robot_id, None)
+        self._pop_cold(robot_id)
+        self._forget(robot_id)
+
+    def _forget(self, robot_id: str):
+        c = self.classifier
+        for per_robot in (c._confidence_stats, c._torque_stats, c._consecutive, c._models, c._rule_runs, c._rulesets):
+            per_robot.pop(robot_id, None)
+
+    def _put_cold(self, robot_id: str, seen: float, record: bytes):
+        self._pop_cold(robot_id)
+        self._cold[robot_id] = record
+        self._cold_seen[robot_id] = seen
+        self._cold_bytes += len(record)
+        while self._cold_bytes > self.max_cold_bytes and self._cold:
+            # Oldest evictions go first; they are the robots least likely to return
+            self._pop_cold(next(iter(self._cold)))
+
+    def _pop_cold(self, robot_id: str) -> Optional[bytes]:
+        record = self._cold.pop(robot_id, None)
+        if record is not None:
+            self._cold_bytes -= len(record)
+            del self._cold_seen[robot_id]
+        return record
+
+    def snapshot(self) -> bytes:
+        """Every robot's state, live and cold, as one compressed snapshot"""
+        lines = [json.dumps({
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "robots": len(self._live) + len(self._cold),
+        }).encode()]
+        for robot_id, seen in self._live.items():
+            lines.append(json.dumps(self._dump(robot_id, seen), separators=(",", ":")).encode())
+        lines.extend(self._cold.values())
+        return gzip.compress(b"\n".join(lines), compresslevel=6)
+
+    def restore(self, snapshot: bytes, eager: bool = False) -> int:
+        """
+        Load a snapshot as cold records, so each robot rehydrates on its
+        first frame; eager brings them all live now. Snapshots from another
+        format version are ignored rather than misread.
+        """
+        lines = gzip.decompress(snapshot).split(b"\n")
+        header = json.loads(lines[0])
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != SNAPSHOT_VERSION:
+            log.warning(f"Ignoring classifier snapshot with format {header.get('format')} v{header.get('version')}")
+            return 0
+        now = time.time()
+        restored = 0
+        for line in lines[1:]:
+            record = json.loads(line)
+            robot_id, seen = record["robot_id"], record["seen"]
+            if now - seen >= self.ttl or robot_id in self._live:
+                continue
+            self._put_cold(robot_id, seen, line)
+            restored += 1
+        if eager:
+            for robot_id in list(self._cold):
+                self.touch(robot_id, self._cold_seen[robot_id], trim=False)
+            self.trim()
+        return restored
+
+    def save(self, path: str):
+        write_snapshot(path, self.snapshot())
+
+    def load(self, path: str, eager: bool = False) -> int:
+        try:
+            with open(path, "rb") as f:
+                snapshot = f.read()
+        except FileNotFoundError:
+            return 0
+        try:
+            return self.restore(snapshot, eager)
+        except (OSError, ValueError, KeyError) as e:
+            log.error(f"Classifier snapshot {path} unreadable, starting cold: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        return {
+            "live_robots": len(self._live),
+            "cold_robots": len(self._cold),
+            "cold_bytes": self._cold_bytes,
+            "max_robots": self.max_robots,
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations,
+        }
+
+
+def write_snapshot(path: str, snapshot: bytes):
+    """Write via a temporary file and rename, so a crash never leaves half a snapshot"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(snapshot)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+async def run_eviction(state: ClassifierState, interval: float = CLASSIFIER_EVICT_S,
+                       idle_s: float = CLASSIFIER_STATE_IDLE_S):
+    """Move idle robots to cold records; a fleet under max_robots would otherwise keep them live forever"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            evicted = state.evict_idle(idle_s)
+            if evicted:
+                log.debug(f"Classifier state: {evicted} idle robots evicted, {state.stats()}")
+        except Exception as e:
+            log.error(f"Classifier idle eviction failed: {e}")
+
+
+async def run_snapshots(state: ClassifierState, path: str, interval: float = CLASSIFIER_SNAPSHOT_S):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Serialized on the loop, where the state is mutated; only the write is offloaded
+            snapshot = state.snapshot()
+            await asyncio.get_running_loop().run_in_executor(None, write_snapshot, path, snapshot)
+            log.debug(f"Classifier snapshot: {state.stats()}")
+        except Exception as e:
+            log.error(f"Classifier snapshot failed: {e}")
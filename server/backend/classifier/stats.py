@@ -0,0 +1,241 @@
+"""Streaming statistics for the classifier - constant time per sample"""
+
+import bisect
+import math
+from collections import deque
+from typing import Optional
+
+# Recompute once the sum of squared deviations falls below this fraction of its peak:
+# the add/remove pairs' rounding is relative to the peak, so by then it dominates
+CANCELLATION_RATIO = 1e-6
+
+
+class RollingStats:
+    """
+    Mean and (population) standard deviation over the last `window` values.
+
+    Kept with windowed Welford updates: adding a value while the window fills,
+    or swapping the oldest value for the newest once it is full, is O(1).
+    Rounding error from the add/remove pairs is cleared by recomputing from
+    the window every `resync` evictions, and as soon as the variance has
+    collapsed far below its peak, e.g. a noisy signal going flat: otherwise
+    the residual is a tiny nonzero deviation against which every small change
+    looks like an anomaly.
+    """
+
+    __slots__ = ("values", "window", "resync", "_mean", "_m2", "_peak", "_evictions")
+
+    def __init__(self, window: int = 50, resync: Optional[int] = None):
+        self.values: deque = deque(maxlen=window)
+        self.window = window
+        self.resync = resync or window * 20
+        self._mean = 0.0
+        self._m2 = 0.0
+        # Largest _m2 since the last recompute
+        self._peak = 0.0
+        self._evictions = 0
+
+    @classmethod
+    def from_values(cls, window: int, values) -> "RollingStats":
+        """Rebuild from a saved window, oldest value first"""
+        stats = cls(window)
+        stats.values.extend(values)
+        stats._recompute()
+        return stats
+
+    def to_dict(self) -> dict:
+        return {"kind": "rolling", "window": self.window, "values": list(self.values)}
+
+    @classmethod
+    def from_dict(cls, saved: dict) -> "RollingStats":
+        return cls.from_values(saved["window"], saved["values"])
+
+    def update(self, value: float):
+        if value is None:
+            return
+        values = self.values
+        n = len(values)
+        if n < self.window:
+            values.append(value)
+            delta = value - self._mean
+            self._mean += delta / (n + 1)
+            self._m2 += delta * (value - self._mean)
+            self._peak = max(self._peak, self._m2)
+            return
+
+        oldest = values[0]
+        values.append(value)
+        old_mean = self._mean
+        self._mean += (value - oldest) / n
+        self._m2 += (value - oldest) * (value - self._mean + oldest - old_mean)
+        self._evictions += 1
+        if self._m2 > self._peak:
+            self._peak = self._m2
+        elif self._evictions >= self.resync or self._m2 < self._peak * CANCELLATION_RATIO:
+            self._recompute()
+
+    def _recompute(self):
+        n = len(self.values)
+        self._mean = math.fsum(self.values) / n if n else 0.0
+        self._m2 = math.fsum((x - self._mean) ** 2 for x in self.values)
+        self._peak = self._m2
+        self._evictions = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._mean if self.values else None
+
+    @property
+    def variance(self) -> Optional[float]:
+        n = len(self.values)
+        if n < 2:
+            return None
+        return max(self._m2, 0.0) / n
+
+    @property
+    def std(self) -> Optional[float]:
+        variance = self.variance
+        return None if variance is None else variance ** 0.5
+
+    def is_anomaly(self, value: float, sigma: float = 3.0) -> bool:
+        std = self.std
+        if not std:
+            return False
+        return abs(value - self._mean) > (sigma * std)
+
+
+class EwmaStats:
+    """
+    Exponentially weighted mean and standard deviation, O(1) memory. `alpha`
+    is the weight of the newest value; span-style windows use 2 / (N + 1).
+    """
+
+    __slots__ = ("alpha", "count", "_mean", "_var")
+
+    def __init__(self, alpha: float = 0.05):
+        self.alpha = alpha
+        self.count = 0
+        self._mean = 0.0
+        self._var = 0.0
+
+    @classmethod
+    def with_span(cls, span: int) -> "EwmaStats":
+        return cls(2.0 / (span + 1))
+
+    def to_dict(self) -> dict:
+        return {"kind": "ewma", "alpha": self.alpha, "count": self.count, "mean": self._mean, "var": self._var}
+
+    @classmethod
+    def from_dict(cls, saved: dict) -> "EwmaStats":
+        stats = cls(saved["alpha"])
+        stats.count, stats._mean, stats._var = saved["count"], saved["mean"], saved["var"]
+        return stats
+
+    def update(self, value: float):
+        if value is None:
+            return
+        self.count += 1
+        if self.count == 1:
+            self._mean = value
+            return
+        delta = value - self._mean
+        increment = self.alpha * delta
+        self._mean += increment
+        self._var = (1.0 - self.alpha) * (self._var + delta * increment)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._mean if self.count else None
+
+    @property
+    def std(self) -> Optional[float]:
+        return self._var ** 0.5 if self.count >= 2 else None
+
+    def is_anomaly(self, value: float, sigma: float = 3.0) -> bool:
+        std = self.std
+        if not std:
+            return False
+        return abs(value - self._mean) > (sigma * std)
+
+
+class RollingQuantile:
+    """
+    Quantiles over the last `window` values from a sorted copy of the window.
+    Updates are a bisect plus a list shift (O(log n) compares, memmove for the
+    shift), reads are O(1). Robust to the outliers that skew mean/std.
+    """
+
+    __slots__ = ("values", "window", "_sorted")
+
+    def __init__(self, window: int = 50):
+        self.values: deque = deque(maxlen=window)
+        self.window = window
+        self._sorted: list = []
+
+    def to_dict(self) -> dict:
+        return {"kind": "quantile", "window": self.window, "values": list(self.values)}
+
+    @classmethod
+    def from_dict(cls, saved: dict) -> "RollingQuantile":
+        stats = cls(saved["window"])
+        stats.values.extend(saved["values"])
+        stats._sorted = sorted(stats.values)
+        return stats
+
+    def update(self, value: float):
+        if value is None:
+            return
+        if len(self.values) == self.window:
+            oldest = self.values[0]
+            del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+        self.values.append(value)
+        bisect.insort(self._sorted, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Linear interpolation between closest ranks, as numpy's default"""
+        ordered = self._sorted
+        if not ordered:
+            return None
+        position = q * (len(ordered) - 1)
+        low = int(position)
+        high = min(low + 1, len(ordered) - 1)
+        return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    @property
+    def median(self) -> Optional[float]:
+        return self.quantile(0.5)
+
+    def is_anomaly(self, value: float, k: float = 3.0) -> bool:
+        """Tukey fence: outside [q1 - k*IQR, q3 + k*IQR]"""
+        if len(self._sorted) < 4:
+            return False
+        q1, q3 = self.quantile(0.25), self.quantile(0.75)
+        iqr = q3 - q1
+        if iqr == 0:
+            return False
+        return value < q1 - k * iqr or value > q3 + k * iqr
+
+
+STATS_KINDS = {"rolling": RollingStats, "ewma": EwmaStats, "quantile": RollingQuantile}
+
+
+def make_stats(kind: str, window: int):
+    """A fresh statistic of the given kind over `window` values (the span, for EWMA)"""
+    if kind not in STATS_KINDS:
+        raise ValueError(f"Statistics kind must be one of {', '.join(STATS_KINDS)}")
+    if kind == "ewma":
+        return EwmaStats.with_span(window)
+    return STATS_KINDS[kind](window)
+
+
+def stats_from_dict(saved: dict):
+    # Records saved before there were kinds hold rolling windows
+    return STATS_KINDS[saved.get("kind", "rolling")].from_dict(saved)
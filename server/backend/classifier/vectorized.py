@@ -0,0 +1,114 @@
+"""The built-in rule chain over a batch of frames, as NumPy arrays"""
+
+from itertools import chain
+from typing import List, Sequence
+
+import numpy as np
+
+from classifier.classifier import FailureClassifier, FailureResult
+
+OK = FailureResult(False, "none", "none", 1.0, "OK", "", {}, {})
+
+
+class FleetFrames:
+    """Channels the rules read, pulled out of a batch of frames into arrays"""
+
+    def __init__(self, frames: Sequence[dict]):
+        joints = [data.get("joints", {}) for data in frames]
+        positions = [j.get("positions_rad", []) for j in joints]
+        # positions_rad sent as null is a dropout of the whole reading, not of any one joint
+        self.null_reading = np.array([p is None for p in positions], dtype=bool)
+        positions = [p or [] for p in positions]
+        self.torques_raw: List[list] = [j.get("torques_nm") or [] for j in joints]
+        self.joints = max(max(map(len, positions), default=0), max(map(len, self.torques_raw), default=0))
+        self.confidence = np.array([data.get("model", {}).get("action_confidence") for data in frames], dtype=float)
+        self.battery = np.array([data.get("system", {}).get("battery_percent") for data in frames], dtype=float)
+        self.null_positions = np.zeros((len(frames), self.joints), dtype=bool)
+        for row, values in enumerate(positions):
+            if None in values:
+                self.null_positions[row, [i for i, p in enumerate(values) if p is None]] = True
+        # Shorter rows are padded with NaN, which no rule reacts to
+        self.torques = _padded(self.torques_raw, self.joints)
+        # Matches the `t and ...` test of the scalar rules: 0 never overloads
+        self.torques[self.torques == 0] = np.nan
+
+    def widen(self, joints: int):
+        if joints > self.joints:
+            extra = joints - self.joints
+            self.null_positions = np.pad(self.null_positions, ((0, 0), (0, extra)))
+            self.torques = np.pad(self.torques, ((0, 0), (0, extra)), constant_values=np.nan)
+            self.joints = joints
+
+
+def _padded(rows: List[list], width: int) -> np.ndarray:
+    if all(len(row) == width for row in rows):
+        try:
+            return np.fromiter(chain.from_iterable(rows), float, len(rows) * width).reshape(len(rows), width)
+        except TypeError:
+            # A None somewhere; np.array turns those into NaN
+            pass
+    return np.array([row + [None] * (width - len(row)) for row in rows], dtype=float).reshape(len(rows), width)
+
+
+def _indexes(row: np.ndarray) -> List[int]:
+    return [i for i, flag in enumerate(row.tolist()) if flag]
+
+
+class RuleMasks:
+    """
+    The fixed rule chain over a batch: for each row, at most one of sensor,
+    motor, critical, low and battery is set (the first rule that fires), and
+    ok marks rows no rule fired for. The rules are stateless, so rows may
+    come from any mix of robots.
+    """
+
+    def __init__(self, batch: FleetFrames, rows: np.ndarray, rules=FailureClassifier):
+        self.batch = batch
+        self.rows = rows
+        self.null_positions = batch.null_positions[rows]
+        self.confidence = batch.confidence[rows]
+        with np.errstate(invalid="ignore"):
+            self.overloaded = batch.torques[rows] > rules.TORQUE_OVERLOAD_NM
+
+            self.sensor = self.null_positions.any(axis=1) | batch.null_reading[rows]
+            self.motor = ~self.sensor & self.overloaded.any(axis=1)
+            ok = ~(self.sensor | self.motor)
+            self.critical = ok & (self.confidence < rules.CONFIDENCE_CRITICAL)
+            self.low = ok & ~self.critical & (self.confidence < rules.CONFIDENCE_LOW)
+            ok &= ~(self.critical | self.low)
+            self.battery = ok & (batch.battery[rows] < rules.BATTERY_LOW)
+        self.ok = ok & ~self.battery
+
+    def result(self, k: int) -> FailureResult:
+        """The FailureResult for position k of rows, which must have failed a rule"""
+        row = int(self.rows[k])
+        if self.sensor[k]:
+            null_joints = _indexes(self.null_positions[k])
+            # As the rule chain reports it, with no joint list to point into
+            joints = None if self.batch.null_reading[row] else null_joints
+            return FailureResult(True, "sensor", "high", 0.95,
+                f"Sensor dropout on joint(s) {null_joints}",
+                f"Joint encoder(s) {null_joints} returned null. Check connections.",
+                {"joints": joints}, {"null_joints": null_joints}, "sensor_dropout")
+        if self.motor[k]:
+            joints = _indexes(self.overloaded[k])
+            return FailureResult(True, "motor", "high", 0.90,
+                f"Motor overload on joint(s) {joints}",
+                "Abnormal torque detected. Check for obstructions.",
+                {"joints": joints}, {"torques": self.batch.torques_raw[row]}, "motor_overload")
+        if self.critical[k]:
+            value = float(self.confidence[k])
+            return FailureResult(True, "model", "critical", 0.88,
+                f"AI model critically uncertain ({value:.0%})",
+                "Model in unfamiliar situation. Consider stopping robot.",
+                {"confidence": value}, {}, "model_critical")
+        if self.low[k]:
+            value = float(self.confidence[k])
+            return FailureResult(True, "model", "medium", 0.80,
+                f"AI model low confidence ({value:.0%})",
+                "Model uncertain. Monitor closely.",
+                {"confidence": value}, {}, "model_low_confidence")
+        value = float(self.batch.battery[row])
+        return FailureResult(True, "system", "medium", 1.0,
+            f"Low battery ({value:.0f}%)", "Return to charging station.",
+            {"battery": value}, {}, "low_battery")
@@ -0,0 +1,239 @@
+"""Cold storage - finished sessions exported to compressed per-channel column files"""
+
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+from db.channels import (
+    BOOLEAN_CHANNELS, DEFAULT_CHANNELS, JOINT_CHANNELS, NUMERIC_CHANNELS, TEXT_CHANNELS,
+    from_epoch, to_epoch,
+)
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR")
+ARCHIVE_AFTER_HOURS = float(os.getenv("ARCHIVE_AFTER_HOURS", "168"))
+ARCHIVE_INTERVAL_S = float(os.getenv("ARCHIVE_INTERVAL_S", "3600"))
+
+ARCHIVE_VERSION = 1
+INDEX_FILE = "index.json"
+NAN = float("nan")
+
+
+def joint_column(channel: str, joint: int) -> str:
+    return f"{channel}[{joint}]"
+
+
+class ColumnBuilder:
+    """Accumulates telemetry rows (dicts keyed by column name) into columns"""
+
+    def __init__(self):
+        self.rows = 0
+        self.numeric: Dict[str, array] = {"time": array("d")}
+        self.numeric.update({name: array("d") for name in NUMERIC_CHANNELS})
+        self.text: Dict[str, list] = {name: [] for name in TEXT_CHANNELS}
+        self.joints: Dict[str, List[array]] = {name: [] for name in JOINT_CHANNELS}
+
+    def add_rows(self, rows: Iterable[dict]):
+        for row in rows:
+            self.numeric["time"].append(to_epoch(row["time"]))
+            for name in NUMERIC_CHANNELS:
+                value = row.get(name)
+                self.numeric[name].append(NAN if value is None else float(value))
+            for name in TEXT_CHANNELS:
+                self.text[name].append(row.get(name))
+            for name, columns in self.joints.items():
+                values = row.get(name) or ()
+                while len(columns) < len(values):
+                    columns.append(array("d", [NAN]) * self.rows)
+                for j, column in enumerate(columns):
+                    value = values[j] if j < len(values) else None
+                    column.append(NAN if value is None else float(value))
+            self.rows += 1
+
+
+class SessionArchive:
+    """
+    One directory per archived session under root, holding a zlib-compressed
+    file per channel (float64 arrays for numeric and joint channels, JSON lists
+    for text) and a small index.json with the session row and column layout.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, session_id: str) -> Path:
+        return self.root / str(session_id)
+
+    def has(self, session_id: str) -> bool:
+        return (self._dir(session_id) / INDEX_FILE).exists()
+
+    def index(self, session_id: str) -> dict:
+        return json.loads((self._dir(session_id) / INDEX_FILE).read_text())
+
+    def write(self, session: dict, builder: ColumnBuilder):
+        session_id = str(session["id"])
+        tmp = self.root / f".{session_id}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+
+        columns = {}
+        numeric = dict(builder.numeric)
+        for name, joint_columns in builder.joints.items():
+            for j, column in enumerate(joint_columns):
+                numeric[joint_column(name, j)] = column
+
+        for name, column in numeric.items():
+            filename = f"{name}.f8.z"
+            (tmp / filename).write_bytes(zlib.compress(column.tobytes(), 6))
+            columns[name] = {"file": filename, "dtype": "f8"}
+        for name, column in builder.text.items():
+            filename = f"{name}.json.z"
+            (tmp / filename).write_bytes(zlib.compress(json.dumps(column).encode(), 6))
+            columns[name] = {"file": filename, "dtype": "json"}
+
+        times = builder.numeric["time"]
+        index = {
+            "version": ARCHIVE_VERSION,
+            "byteorder": sys.byteorder,
+            "session": session,
+            "rows": builder.rows,
+            "start": times[0] if builder.rows else None,
+            "end": times[-1] if builder.rows else None,
+            "joints": {name: len(cols) for name, cols in builder.joints.items()},
+            "columns": columns,
+        }
+        (tmp / INDEX_FILE).write_text(json.dumps(index, default=str))
+
+        target = self._dir(session_id)
+        shutil.rmtree(target, ignore_errors=True)
+        tmp.rename(target)
+
+    def read_column(self, session_id: str, name: str, index: Optional[dict] = None) -> list:
+        index = index or self.index(session_id)
+        spec = index["columns"][name]
+        raw = zlib.decompress((self._dir(session_id) / spec["file"]).read_bytes())
+        if spec["dtype"] == "json":
+            return json.loads(raw)
+        column = array("d")
+        column.frombytes(raw)
+        if index.get("byteorder", sys.byteorder) != sys.byteorder:
+            column.byteswap()
+        return column.tolist()
+
+    def read_columns(self, session_id: str, channels: Sequence[str] = DEFAULT_CHANNELS,
+                     limit: Optional[int] = None, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None) -> Dict[str, list]:
+        """Columns keyed by channel, with "time" as epoch seconds and None for gaps"""
+        index = self.index(session_id)
+        times = self.read_column(session_id, "time", index)
+        lo = bisect.bisect_left(times, to_epoch(start)) if start is not None else 0
+        hi = bisect.bisect_left(times, to_epoch(end)) if end is not None else index["rows"]
+        if limit is not None:
+            hi = min(hi, lo + limit)
+
+        def numeric(values, boolean=False):
+            return [None if math.isnan(v) else (bool(v) if boolean else v) for v in values[lo:hi]]
+
+        columns = {"time": times[lo:hi]}
+        for channel in channels:
+            if channel in NUMERIC_CHANNELS:
+                columns[channel] = numeric(self.read_column(session_id, channel, index), channel in BOOLEAN_CHANNELS)
+            elif channel in TEXT_CHANNELS:
+                columns[channel] = self.read_column(session_id, channel, index)[lo:hi]
+            elif channel in JOINT_CHANNELS:
+                per_joint = [
+                    numeric(self.read_column(session_id, joint_column(channel, j), index))
+                    for j in range(index["joints"].get(channel, 0))
+                ]
+                # Rows from before the first joint reading (or without one) were padded; they had no list
+                columns[channel] = [
+                    None if all(v is None for v in values) else list(values) for values in zip(*per_joint)
+                ] if per_joint else [None] * (hi - lo)
+            else:
+                raise KeyError(channel)
+        return columns
+
+    def read_rows(self, session_id: str, channels: Sequence[str] = DEFAULT_CHANNELS,
+                  limit: Optional[int] = None) -> List[dict]:
+        columns = self.read_columns(session_id, channels, limit)
+        columns["time"] = [from_epoch(t) for t in columns["time"]]
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+    def read_range(self, session_id: str, channels: Sequence[str] = DEFAULT_CHANNELS,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   after: Optional[datetime] = None, seen: Optional[int] = None) -> List[dict]:
+        """
+        Rows with start <= time < end, or when resuming from a cursor, those
+        after the first `seen` rows at time `after` (all of them if None)
+        """
+        columns = self.read_columns(session_id, channels)
+        times = columns["time"]
+        lo = 0
+        if after is not None:
+            if seen is None:
+                lo = bisect.bisect_right(times, to_epoch(after))
+            else:
+                lo = bisect.bisect_left(times, to_epoch(after)) + seen
+        elif start is not None:
+            lo = bisect.bisect_left(times, to_epoch(start))
+        hi = bisect.bisect_left(times, to_epoch(end)) if end is not None else len(times)
+
+        columns = {name: values[lo:hi] for name, values in columns.items()}
+        columns["time"] = [from_epoch(t) for t in columns["time"]]
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+async def iter_archived_rows(archive: SessionArchive, session_id: str, channels: Sequence[str],
+                             start=None, end=None, after=None, chunk_size: int = 1000,
+                             seen: Optional[int] = None) -> AsyncIterator[List[dict]]:
+    rows = await asyncio.get_running_loop().run_in_executor(
+        None, archive.read_range, session_id, channels, start, end, after, seen
+    )
+    for i in range(0, len(rows), chunk_size):
+        yield rows[i:i + chunk_size]
+
+
+async def archive_session(database, session: dict) -> int:
+    """Copy one session's hot telemetry into the archive, then drop the hot rows"""
+    loop = asyncio.get_running_loop()
+    builder = ColumnBuilder()
+    async for chunk in database.export_session_telemetry(session["id"]):
+        await loop.run_in_executor(None, builder.add_rows, chunk)
+    await loop.run_in_executor(None, database.archive.write, session, builder)
+    await database.mark_session_archived(session["id"])
+    return builder.rows
+
+
+async def tier_sessions(database, older_than: timedelta = timedelta(hours=ARCHIVE_AFTER_HOURS)) -> int:
+    cutoff = datetime.now(timezone.utc) - older_than
+    sessions = await database.get_sessions_to_archive(cutoff)
+    for session in sessions:
+        try:
+            rows = await archive_session(database, session)
+            log.info(f"Archived session {session['id']} ({rows} rows)")
+        except Exception as e:
+            log.error(f"Archiving session {session['id']} failed: {e}")
+    return len(sessions)
+
+
+async def run_tiering(database, interval: float = ARCHIVE_INTERVAL_S):
+    while True:
+        try:
+            await tier_sessions(database)
+        except Exception as e:
+            log.error(f"Tiering run failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,114 @@
+"""Read-through TTL + LRU cache for listing queries, invalidated from the ingest path"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+QUERY_CACHE_TTL_S = float(os.getenv("QUERY_CACHE_TTL_S", "5"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+
+# Tag carried by entries that span every robot (no robot_id filter)
+ALL_ROBOTS = "*"
+
+
+class QueryCache:
+    """
+    Results keyed by (kind, query parameters), evicted least-recently-used
+    beyond max_entries and treated as missing after ttl seconds.
+
+    Each entry is tagged with the kind and robot it covers, so the ingest path
+    can drop exactly the listings a new session or failure makes stale.
+    Concurrent misses on one key share a single load.
+    """
+
+    def __init__(self, ttl: float = QUERY_CACHE_TTL_S, max_entries: int = QUERY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._tags: Dict[Tuple[str, str], Set[Hashable]] = {}
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _drop(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            kind, robot_id = key[0], key[1] or ALL_ROBOTS
+            tagged = self._tags.get((kind, robot_id))
+            if tagged:
+                tagged.discard(key)
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        kind, robot_id = key[0], key[1] or ALL_ROBOTS
+        self._tags.setdefault((kind, robot_id), set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    async def get(self, kind: str, robot_id: Optional[str], params: tuple,
+                  load: Callable[[], Awaitable[Any]]) -> Any:
+        key = (kind, robot_id, *params)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = self._loading[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await load()
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters see the error; nobody else needs to retrieve it
+            future.exception()
+            raise
+        else:
+            # An invalidation during the load means the result may already be stale
+            if self._loading.get(key) is future:
+                self._store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+    def invalidate(self, kind: str, robot_id: Optional[str] = None):
+        """Drop entries of this kind for the robot (all robots if None) and every all-robots listing"""
+        if robot_id is None:
+            tags = [tag for tag in self._tags if tag[0] == kind]
+        else:
+            tags = [(kind, robot_id), (kind, ALL_ROBOTS)]
+        for tag in tags:
+            for key in list(self._tags.pop(tag, ())):
+                self._entries.pop(key, None)
+                self.invalidations += 1
+        for key in [k for k in self._loading if k[0] == kind and (robot_id is None or k[1] in (robot_id, None))]:
+            del self._loading[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "ttl_s": self.ttl,
+            "max_entries": self.max_entries,
+        }
+
+
+query_cache = QueryCache()
@@ -0,0 +1,172 @@
+"""Telemetry channel layout shared by the storage backends"""
+
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Channel name -> (section, key) in the agent's telemetry payload.
+# Names match the typed columns of the Postgres telemetry table.
+NUMERIC_CHANNELS: Dict[str, Tuple[str, str]] = {
+    "gripper_position": ("gripper", "position_mm"),
+    "gripper_force": ("gripper", "force_n"),
+    "gripper_contact": ("gripper", "contact_detected"),
+    "task_progress": ("task", "phase_progress"),
+    "model_confidence": ("model", "action_confidence"),
+    "model_uncertainty": ("model", "uncertainty"),
+    "model_inference_ms": ("model", "inference_time_ms"),
+    "cpu_percent": ("system", "cpu_percent"),
+    "memory_mb": ("system", "memory_mb"),
+    "battery_percent": ("system", "battery_percent"),
+}
+
+TEXT_CHANNELS: Dict[str, Tuple[str, str]] = {
+    "task_name": ("task", "current_task"),
+    "task_phase": ("task", "phase"),
+    "model_action": ("model", "predicted_action"),
+}
+
+# Per-joint array channels, stored one column per joint index
+JOINT_CHANNELS: Dict[str, str] = {
+    "joint_positions": "positions_rad",
+    "joint_velocities": "velocities_rad_s",
+    "joint_torques": "torques_nm",
+    "joint_temps": "temperatures_c",
+}
+
+BOOLEAN_CHANNELS = {"gripper_contact"}
+
+# Every stored channel, in the column order used by the SQL backends
+STORED_CHANNELS = (*JOINT_CHANNELS, *NUMERIC_CHANNELS, *TEXT_CHANNELS)
+
+DEFAULT_CHANNELS = ("model_confidence", "task_phase", "battery_percent")
+
+
+def validate_channels(channels: Sequence[str], allowed: Sequence[str] = STORED_CHANNELS) -> Tuple[str, ...]:
+    """Reject unknown channel names (they are interpolated into SQL by some backends)"""
+    unknown = [c for c in channels if c not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown channel(s): {', '.join(unknown)}")
+    return tuple(channels)
+
+
+# A single joint out of a joint channel, e.g. "joint_torques[3]"
+JOINT_INDEX = re.compile(r"^(\w+)\[(\d+)\]$")
+
+
+def split_channel(channel: str) -> Tuple[str, Optional[int]]:
+    match = JOINT_INDEX.match(channel)
+    if match and match.group(1) in JOINT_CHANNELS:
+        return match.group(1), int(match.group(2))
+    return channel, None
+
+
+def parse_channels(spec: Optional[str], default: Sequence[str] = DEFAULT_CHANNELS) -> Tuple[str, ...]:
+    """
+    Parse a comma-separated channel projection. Stored channel names and
+    single joints ("joint_torques[3]") are accepted; raises ValueError.
+    """
+    if not spec:
+        return tuple(default)
+    channels = tuple(dict.fromkeys(c.strip() for c in spec.split(",") if c.strip()))
+    validate_channels([split_channel(c)[0] for c in channels])
+    return channels
+
+
+def source_channels(channels: Sequence[str]) -> Tuple[str, ...]:
+    """Stored channels a backend has to read to serve a projection"""
+    return tuple(dict.fromkeys(split_channel(c)[0] for c in channels))
+
+
+def _pick(values, index: int):
+    return values[index] if values is not None and index < len(values) else None
+
+
+def project_rows(rows: List[dict], channels: Sequence[str]) -> List[dict]:
+    """Reduce rows read with source_channels() to exactly `channels`"""
+    split = [(c, *split_channel(c)) for c in channels]
+    return [
+        {"time": row["time"], **{
+            name: row[base] if index is None else _pick(row[base], index) for name, base, index in split
+        }}
+        for row in rows
+    ]
+
+
+def project_columns(columns: Dict[str, list], channels: Sequence[str]) -> Dict[str, list]:
+    projected = {"time": columns["time"]}
+    for channel in channels:
+        base, index = split_channel(channel)
+        values = columns[base]
+        projected[channel] = values if index is None else [_pick(v, index) for v in values]
+    return projected
+
+
+def channel_value(data: dict, channel: str):
+    """Read one scalar or text channel out of a telemetry payload"""
+    section, key = NUMERIC_CHANNELS.get(channel) or TEXT_CHANNELS[channel]
+    return (data.get(section) or {}).get(key)
+
+
+def joint_values(data: dict, channel: str) -> Optional[list]:
+    return (data.get("joints") or {}).get(JOINT_CHANNELS[channel])
+
+
+def payload_of(row: dict) -> dict:
+    """Rebuild a telemetry payload from a row of stored channels, e.g. to classify it again"""
+    data: Dict[str, dict] = {}
+    for channel, key in JOINT_CHANNELS.items():
+        if row.get(channel) is not None:
+            data.setdefault("joints", {})[key] = row[channel]
+    for channels in (NUMERIC_CHANNELS, TEXT_CHANNELS):
+        for channel, (section, key) in channels.items():
+            if row.get(channel) is not None:
+                data.setdefault(section, {})[key] = row[channel]
+    return data
+
+
+def to_epoch(timestamp) -> float:
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+    return datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp()
+
+
+def from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+def advance_position(last, seen: Optional[int], times: Sequence) -> Tuple[object, int]:
+    """
+    Where a time-ordered read resumes after a page: the page's last time and
+    how many rows at exactly that time have been read, so rows sharing a
+    timestamp are neither skipped nor repeated across pages.
+    """
+    tail = times[-1]
+    ties = 0
+    for t in reversed(times):
+        if t != tail:
+            break
+        ties += 1
+    if ties == len(times) and tail == last:
+        ties += seen or 0
+    return tail, ties
+
+
+def encode_telemetry_cursor(time, seen: int) -> str:
+    """Opaque telemetry cursor: the time of the last row of a page and the rows read at that time"""
+    return f"{to_epoch(time)!r}_{seen}"
+
+
+def decode_telemetry_cursor(cursor: str) -> Tuple[datetime, Optional[int]]:
+    """
+    (time, rows already read at that time). A bare ISO timestamp, as older
+    clients send, resumes strictly after it (seen is None).
+    """
+    epoch, sep, seen = cursor.partition("_")
+    try:
+        if sep:
+            return from_epoch(float(epoch)), int(seen)
+        return datetime.fromisoformat(cursor.replace("Z", "+00:00")), None
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
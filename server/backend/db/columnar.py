@@ -0,0 +1,98 @@
+"""Columnar binary encoding for telemetry query results"""
+
+import json
+import struct
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from db.channels import JOINT_CHANNELS, TEXT_CHANNELS, split_channel
+
+MAGIC = b"RBBC"
+COLUMNAR_VERSION = 1
+MEDIA_TYPE = "application/vnd.robotblackbox.columnar"
+
+_HEADER = struct.Struct("<4sI")
+_ALIGN = 8
+
+
+def _as_float(values) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype="<f8")
+
+
+def _as_matrix(values) -> np.ndarray:
+    width = max((len(v) for v in values if v), default=0)
+    matrix = np.full((len(values), width), np.nan, dtype="<f8")
+    for i, row in enumerate(values):
+        if row:
+            matrix[i, :len(row)] = [np.nan if v is None else v for v in row]
+    return matrix
+
+
+def encode_columns(columns: Dict[str, list], channels: Sequence[str], **meta) -> bytes:
+    """
+    Encode query columns ("time" as epoch seconds plus one list per channel)
+    into a single buffer:
+
+        b"RBBC" | uint32 header length | JSON header | padding | column buffers
+
+    Numeric, boolean and single-joint channels become little-endian float64
+    arrays with NaN for gaps; whole joint channels become a rows x joints
+    float64 matrix; text channels are a UTF-8 JSON list. The header lists
+    each column's name, dtype, shape, offset and byte length, with offsets
+    relative to the start of the buffer and aligned to 8 bytes so clients
+    can np.frombuffer() a column without copying.
+    """
+    buffers: List[bytes] = []
+    specs = []
+    for name in ("time", *channels):
+        base, index = split_channel(name)
+        values = columns[name]
+        if base in TEXT_CHANNELS:
+            data, dtype, shape = json.dumps(values).encode(), "json", [len(values)]
+        elif base in JOINT_CHANNELS and index is None:
+            matrix = _as_matrix(values)
+            data, dtype, shape = matrix.tobytes(), "<f8", list(matrix.shape)
+        else:
+            data, dtype, shape = _as_float(values).tobytes(), "<f8", [len(values)]
+        specs.append({"name": name, "dtype": dtype, "shape": shape, "nbytes": len(data)})
+        buffers.append(data)
+
+    # Offsets depend on the header size, so size it once with placeholder
+    # offsets and then fill them in; padding the header absorbs the change
+    header = {"version": COLUMNAR_VERSION, "rows": len(columns["time"]), **meta, "columns": specs}
+    for spec in specs:
+        spec["offset"] = 0
+    reserve = len(json.dumps(header).encode()) + 16 * len(specs)
+    start = -(-(_HEADER.size + reserve) // _ALIGN) * _ALIGN
+
+    offset = start
+    for spec in specs:
+        spec["offset"] = offset
+        offset += -(-spec["nbytes"] // _ALIGN) * _ALIGN
+    encoded = json.dumps(header).encode()
+
+    out = bytearray(_HEADER.pack(MAGIC, len(encoded)))
+    out += encoded
+    out += b" " * (start - len(out))
+    for data in buffers:
+        out += data
+        out += b"\0" * (-len(data) % _ALIGN)
+    return bytes(out)
+
+
+def decode_columns(buffer: bytes) -> Dict[str, object]:
+    """Inverse of encode_columns: name -> numpy array (or list for text channels)"""
+    buffer = memoryview(buffer)
+    magic, length = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("Not a columnar telemetry buffer")
+    header = json.loads(bytes(buffer[_HEADER.size:_HEADER.size + length]))
+    columns = {}
+    for spec in header["columns"]:
+        raw = buffer[spec["offset"]:spec["offset"] + spec["nbytes"]]
+        if spec["dtype"] == "json":
+            columns[spec["name"]] = json.loads(bytes(raw))
+        else:
+            columns[spec["name"]] = np.frombuffer(raw, dtype=spec["dtype"]).reshape(spec["shape"])
+    return columns
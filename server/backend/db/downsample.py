@@ -0,0 +1,100 @@
+"""Downsampling for session replay - time-bucketed min/max/avg and LTTB"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from db.channels import from_epoch
+
+DOWNSAMPLE_MODES = ("minmax", "lttb")
+DOWNSAMPLE_CHANNELS = ("model_confidence", "battery_percent")
+
+
+def bucket_width(start: float, end: float, points: Optional[int] = None,
+                 resolution: Optional[float] = None) -> float:
+    """Bucket size in seconds, from an explicit resolution or a target point count"""
+    if resolution:
+        return float(resolution)
+    return max(end - start, 1e-6) / max(points or 1, 1)
+
+
+def _as_float(values) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _clean(value):
+    value = value.item() if isinstance(value, np.generic) else value
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def bucket_columns(columns: Dict[str, Sequence], channels: Sequence[str], width: float) -> List[dict]:
+    """
+    Collapse time-ordered columns into buckets of `width` seconds measured from
+    the first sample, with samples count and min/max/avg per numeric channel.
+    NaN/None samples are ignored, and a bucket with no values reports None.
+    """
+    times = np.asarray(columns["time"], dtype=float)
+    if times.size == 0:
+        return []
+
+    ids = np.floor((times - times[0]) / width).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    out = {
+        "time": [from_epoch(t) for t in times[0] + ids[starts] * width],
+        "samples": np.diff(np.r_[starts, times.size]),
+    }
+
+    for channel in channels:
+        values = _as_float(columns[channel])
+        valid = ~np.isnan(values)
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"{channel}_min"] = np.fmin.reduceat(values, starts)
+            out[f"{channel}_max"] = np.fmax.reduceat(values, starts)
+            out[f"{channel}_avg"] = np.add.reduceat(np.where(valid, values, 0.0), starts) / counts
+
+    names = list(out)
+    return [dict(zip(names, map(_clean, row))) for row in zip(*out.values())]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the points to keep, in order"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def lttb_rows(columns: Dict[str, Sequence], channels: Sequence[str], y_channel: str,
+              points: Optional[int] = None, resolution: Optional[float] = None) -> List[dict]:
+    """Raw rows picked by LTTB on one channel; samples where it is missing are skipped"""
+    times = np.asarray(columns["time"], dtype=float)
+    y = _as_float(columns[y_channel])
+    keep = np.flatnonzero(~np.isnan(y))
+    if keep.size == 0:
+        return []
+
+    if points is None:
+        points = int((times[keep[-1]] - times[keep[0]]) / bucket_width(0, 0, resolution=resolution)) + 1
+    picked = keep[lttb_indices(times[keep], y[keep], max(points, 3))]
+
+    return [
+        {"time": from_epoch(times[i]), **{channel: columns[channel][i] for channel in channels}}
+        for i in picked
+    ]
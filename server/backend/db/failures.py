@@ -0,0 +1,69 @@
+"""Failure search filters and keyset cursors shared by the storage backends"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from db.channels import to_epoch
+
+# Columns a closing failure episode may update on its row
+FAILURE_UPDATE_FIELDS = (
+    "ended_at", "duration_s", "frames", "severity", "confidence", "affected_components", "classifier_data",
+)
+
+
+@dataclass(frozen=True)
+class FailureQuery:
+    """Filters for failure search; results are newest first, ordered by (detected_at, id)"""
+
+    robot_id: Optional[str] = None
+    session_id: Optional[str] = None
+    failure_type: Optional[str] = None
+    severity: Optional[str] = None
+    acknowledged: Optional[bool] = None
+    joint: Optional[int] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+    def matches(self, failure: dict) -> bool:
+        """Python form of the SQL WHERE clause, for the in-memory backend"""
+        if self.robot_id is not None and failure.get("robot_id") != self.robot_id:
+            return False
+        if self.session_id is not None and str(failure.get("session_id")) != self.session_id:
+            return False
+        if self.failure_type is not None and failure.get("failure_type") != self.failure_type:
+            return False
+        if self.severity is not None and failure.get("severity") != self.severity:
+            return False
+        if self.acknowledged is not None and bool(failure.get("acknowledged")) != self.acknowledged:
+            return False
+        if self.joint is not None and self.joint not in failure_joints(failure):
+            return False
+        if self.start is not None or self.end is not None:
+            epoch = to_epoch(failure["detected_at"])
+            if self.start is not None and epoch < to_epoch(self.start):
+                return False
+            if self.end is not None and epoch >= to_epoch(self.end):
+                return False
+        return True
+
+
+def failure_joints(failure: dict) -> Tuple[int, ...]:
+    """Joint indexes named in a failure's affected_components"""
+    components = failure.get("affected_components") or {}
+    if not isinstance(components, dict):
+        return ()
+    return tuple(j for j in components.get("joints") or () if isinstance(j, int))
+
+
+def encode_cursor(detected_at, failure_id) -> str:
+    """Opaque keyset cursor: the (detected_at, id) of the last row of a page"""
+    return f"{to_epoch(detected_at)!r}_{failure_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        epoch, failure_id = cursor.split("_", 1)
+        return float(epoch), failure_id
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
@@ -0,0 +1,422 @@
+"""In-memory storage backend - columnar ring buffers with maintained indexes"""
+
+import bisect
+import logging
+import math
+import os
+import time
+import uuid
+from array import array
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db.channels import (
+    BOOLEAN_CHANNELS, DEFAULT_CHANNELS, JOINT_CHANNELS, NUMERIC_CHANNELS, TEXT_CHANNELS,
+    advance_position, channel_value, from_epoch, joint_values, to_epoch, validate_channels,
+)
+from db.downsample import DOWNSAMPLE_CHANNELS, bucket_columns, bucket_width
+from db.failures import FAILURE_UPDATE_FIELDS, FailureQuery, decode_cursor, encode_cursor, failure_joints
+from db.policies import STORAGE_POLICY, StoragePolicy
+from db.rollups import RollupStore
+from db.summaries import SessionSummary
+
+log = logging.getLogger(__name__)
+
+TELEMETRY_CAPACITY = int(os.getenv("MEMORY_TELEMETRY_CAPACITY", "1000"))
+FAILURE_CAPACITY = int(os.getenv("MEMORY_FAILURE_CAPACITY", "10000"))
+
+NAN = float("nan")
+# Index of every failure; search walks it when no filter has its own index
+ALL_FAILURES = ("all", None)
+
+
+def _column(capacity: int) -> array:
+    return array("d", [NAN]) * capacity
+
+
+class TelemetryRing:
+    """
+    Fixed-capacity ring buffer holding one session's telemetry column by column.
+
+    Every channel is a preallocated float array (text channels are plain lists),
+    so an append writes one slot per channel and never copies the buffer.
+    Joint columns are allocated the first time a joint index shows up.
+    """
+
+    def __init__(self, capacity: int = TELEMETRY_CAPACITY):
+        self.capacity = capacity
+        self.head = 0
+        self.count = 0
+        self.times = _column(capacity)
+        self.numeric: Dict[str, array] = {name: _column(capacity) for name in NUMERIC_CHANNELS}
+        self.text: Dict[str, list] = {name: [None] * capacity for name in TEXT_CHANNELS}
+        self.joints: Dict[str, List[array]] = {name: [] for name in JOINT_CHANNELS}
+
+    def append(self, timestamp: float, data: dict):
+        i = self.head
+        self.times[i] = timestamp
+
+        for name, column in self.numeric.items():
+            value = channel_value(data, name)
+            column[i] = NAN if value is None else float(value)
+
+        for name, column in self.text.items():
+            column[i] = channel_value(data, name)
+
+        for name, columns in self.joints.items():
+            values = joint_values(data, name) or ()
+            while len(columns) < len(values):
+                columns.append(_column(self.capacity))
+            for j, column in enumerate(columns):
+                value = values[j] if j < len(values) else None
+                column[i] = NAN if value is None else float(value)
+
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def slots(self) -> Iterable[int]:
+        """Physical slot indices from oldest to newest"""
+        start = (self.head - self.count) % self.capacity
+        return ((start + k) % self.capacity for k in range(self.count))
+
+    def value(self, channel: str, i: int):
+        if channel in self.numeric:
+            value = self.numeric[channel][i]
+            if math.isnan(value):
+                return None
+            return bool(value) if channel in BOOLEAN_CHANNELS else value
+        if channel in self.text:
+            return self.text[channel][i]
+        if channel in self.joints:
+            values = [column[i] for column in self.joints[channel]]
+            return [None if math.isnan(v) else v for v in values] or None
+        raise KeyError(channel)
+
+    def columns(self, channels=DEFAULT_CHANNELS, limit: Optional[int] = None,
+                lo: int = 0, hi: Optional[int] = None) -> Dict[str, list]:
+        base = self.head - self.count
+        hi = self.count if hi is None else hi
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        slots = [(base + k) % self.capacity for k in range(lo, hi)]
+        columns = {"time": [self.times[i] for i in slots]}
+        for channel in channels:
+            columns[channel] = [self.value(channel, i) for i in slots]
+        return columns
+
+    def _row(self, i: int, channels) -> dict:
+        row = {"time": from_epoch(self.times[i]).isoformat()}
+        for channel in channels:
+            row[channel] = self.value(channel, i)
+        return row
+
+    def rows(self, channels=DEFAULT_CHANNELS, limit: Optional[int] = None) -> List[dict]:
+        return [self._row(i, channels) for i in list(self.slots())[:limit]]
+
+    def position(self, epoch: float, right: bool = False) -> int:
+        """Binary search over logical (oldest-first) positions, like bisect_left/right"""
+        base = self.head - self.count
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            t = self.times[(base + mid) % self.capacity]
+            if t < epoch or (right and t == epoch):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def rows_between(self, lo: int, hi: int, channels=DEFAULT_CHANNELS) -> List[dict]:
+        base = self.head - self.count
+        return [self._row((base + k) % self.capacity, channels) for k in range(lo, hi)]
+
+
+class MemoryDatabase:
+    """
+    Storage backend that keeps everything in process memory.
+
+    Telemetry lives in per-session TelemetryRing buffers. Failures are kept
+    in one bounded dict, with id indexes in detected_at order over all of
+    them and by robot, session, type, severity and affected joint that search
+    starts from, and a SessionSummary per session is maintained on insert.
+    """
+
+    def __init__(self, telemetry_capacity: int = TELEMETRY_CAPACITY,
+                 failure_capacity: int = FAILURE_CAPACITY, policy: StoragePolicy = STORAGE_POLICY):
+        self.telemetry_capacity = telemetry_capacity
+        self.failure_capacity = failure_capacity
+        self.policy = policy
+        self.sessions: Dict[str, dict] = {}
+        self.sessions_by_robot: Dict[str, List[str]] = {}
+        self.telemetry: Dict[str, TelemetryRing] = {}
+        self.failures: Dict[str, dict] = {}
+        self.failure_index: Dict[Tuple[str, object], Deque[str]] = {}
+        self.summaries: Dict[str, SessionSummary] = {}
+        self.failure_clips: Dict[str, bytes] = {}
+        self.ingest_batches: Dict[str, dict] = {}
+        self.rollups = RollupStore()
+        # Ring buffers are already bounded, so there is nothing to tier out
+        self.archive = None
+
+    async def connect(self):
+        log.info("Using in-memory database")
+
+    async def disconnect(self):
+        pass
+
+    async def create_session(self, session_id: str, robot_id: str, metadata: dict) -> dict:
+        s = {"id": session_id, "robot_id": robot_id, "started_at": datetime.utcnow().isoformat(), "metadata": metadata}
+        if session_id not in self.sessions:
+            self.sessions_by_robot.setdefault(robot_id, []).append(session_id)
+        self.sessions[session_id] = s
+        return s
+
+    async def ensure_session(self, session_id: str, robot_id: str, metadata: dict,
+                             started_at: Optional[datetime] = None) -> dict:
+        """Create the session unless it exists (used by bulk ingest, which may resend it)"""
+        if session_id not in self.sessions:
+            await self.create_session(session_id, robot_id, metadata)
+            if started_at is not None:
+                self.sessions[session_id]["started_at"] = started_at.isoformat()
+        return self.sessions[session_id]
+
+    async def end_session(self, session_id: str):
+        if session_id in self.sessions:
+            self.sessions[session_id]["ended_at"] = datetime.utcnow().isoformat()
+
+    async def get_sessions(self, robot_id: Optional[str] = None, limit: int = 50) -> List[dict]:
+        if robot_id:
+            ids = reversed(self.sessions_by_robot.get(robot_id, []))
+        else:
+            ids = reversed(self.sessions.keys())
+
+        sessions = []
+        for session_id in ids:
+            if len(sessions) >= limit:
+                break
+            summary = self.summaries.get(session_id) or SessionSummary()
+            sessions.append({**self.sessions[session_id], "failure_count": summary.failures, "summary": summary.to_dict()})
+        return sessions
+
+    def _summary(self, session_id: str) -> SessionSummary:
+        summary = self.summaries.get(session_id)
+        if summary is None:
+            summary = self.summaries[session_id] = SessionSummary()
+        return summary
+
+    async def get_session_summary(self, session_id: str) -> Optional[dict]:
+        summary = self.summaries.get(session_id)
+        return summary.to_dict() if summary else None
+
+    async def insert_telemetry(self, session_id: str, robot_id: str, timestamp, data: dict):
+        ring = self.telemetry.get(session_id)
+        if ring is None:
+            ring = self.telemetry[session_id] = TelemetryRing(self.telemetry_capacity)
+        epoch = to_epoch(timestamp)
+        ring.append(epoch, data)
+        self._summary(session_id).add_sample(
+            epoch, channel_value(data, "model_confidence"), channel_value(data, "battery_percent")
+        )
+        self.rollups.add_telemetry(robot_id, session_id, epoch, data)
+        self.rollups.evict(time.time())
+
+    async def insert_telemetry_batch(self, batch_id: str, session_id: str, robot_id: str,
+                                     events: List[Tuple[datetime, dict]]) -> bool:
+        """Insert a whole batch once per batch_id; returns False for a batch already ingested"""
+        if batch_id in self.ingest_batches:
+            return False
+        self.ingest_batches[batch_id] = {
+            "batch_id": batch_id, "session_id": session_id, "robot_id": robot_id,
+            "events": len(events), "received_at": datetime.now(timezone.utc), "classified_at": None,
+        }
+        for timestamp, data in events:
+            await self.insert_telemetry(session_id, robot_id, timestamp, data)
+        return True
+
+    async def get_ingest_batch(self, batch_id: str) -> Optional[dict]:
+        return self.ingest_batches.get(batch_id)
+
+    async def mark_batch_classified(self, batch_id: str):
+        batch = self.ingest_batches.get(batch_id)
+        if batch is not None:
+            batch["classified_at"] = datetime.now(timezone.utc)
+
+    async def get_session_telemetry(self, session_id: str, limit: int = 10000,
+                                    channels: Sequence[str] = DEFAULT_CHANNELS) -> List[dict]:
+        channels = validate_channels(channels)
+        ring = self.telemetry.get(session_id)
+        return ring.rows(channels, limit=limit) if ring else []
+
+    async def iter_session_telemetry(self, session_id: str, start: Optional[datetime] = None,
+                                     end: Optional[datetime] = None, after: Optional[datetime] = None,
+                                     channels: Sequence[str] = DEFAULT_CHANNELS,
+                                     chunk_size: int = 1000, seen: Optional[int] = None) -> AsyncIterator[List[dict]]:
+        channels = validate_channels(channels)
+        ring = self.telemetry.get(session_id)
+        if ring is None:
+            return
+        # Pages resume at (time, rows read at that time), ties in ring order
+        if after is not None:
+            last = to_epoch(after)
+        else:
+            last, seen = (to_epoch(start) if start is not None else float("-inf")), 0
+        while True:
+            lo = ring.position(last, right=seen is None) + (seen or 0)
+            hi = ring.position(to_epoch(end)) if end is not None else ring.count
+            rows = ring.rows_between(lo, min(hi, lo + chunk_size), channels)
+            if not rows:
+                return
+            last, seen = advance_position(last, seen, [to_epoch(row["time"]) for row in rows])
+            yield rows
+
+    async def get_session_columns(self, session_id: str, channels: Sequence[str] = DEFAULT_CHANNELS,
+                                  limit: Optional[int] = None, start: Optional[datetime] = None,
+                                  end: Optional[datetime] = None) -> Dict[str, list]:
+        channels = validate_channels(channels)
+        ring = self.telemetry.get(session_id)
+        if ring is None:
+            return {"time": [], **{c: [] for c in channels}}
+        lo = ring.position(to_epoch(start)) if start is not None else 0
+        hi = ring.position(to_epoch(end)) if end is not None else ring.count
+        return ring.columns(channels, limit, lo, hi)
+
+    async def get_session_buckets(self, session_id: str, channels: Sequence[str] = DOWNSAMPLE_CHANNELS,
+                                  points: Optional[int] = None, resolution: Optional[float] = None) -> List[dict]:
+        columns = await self.get_session_columns(session_id, channels)
+        if not columns["time"]:
+            return []
+        width = bucket_width(columns["time"][0], columns["time"][-1], points, resolution)
+        return bucket_columns(columns, channels, width)
+
+    async def insert_failure(self, failure: dict) -> dict:
+        failure["id"] = str(uuid.uuid4())
+        session_id = failure.get("session_id")
+        robot_id = failure.get("robot_id")
+
+        failure.setdefault("detected_at", datetime.now(timezone.utc))
+        self.failures[failure["id"]] = failure
+        for key in _index_keys(failure):
+            self._index_failure(key, failure["id"])
+        epoch = to_epoch(failure["detected_at"])
+        self._summary(session_id).add_failure(failure.get("failure_type"), failure.get("severity"), epoch)
+        self.rollups.add_failure(robot_id, session_id, epoch)
+
+        while len(self.failures) > self.failure_capacity:
+            self._forget_failure(self.failures.pop(self.failure_index[ALL_FAILURES][0]))
+
+        return failure
+
+    async def update_failure(self, failure_id: str, fields: dict):
+        failure = self.failures.get(failure_id)
+        if failure is None:
+            return
+        before = set(_index_keys(failure))
+        failure.update((name, value) for name, value in fields.items() if name in FAILURE_UPDATE_FIELDS)
+        after = set(_index_keys(failure))
+        for key in before - after:
+            self.failure_index[key].remove(failure_id)
+            if not self.failure_index[key]:
+                del self.failure_index[key]
+        for key in after - before:
+            self._index_failure(key, failure_id)
+
+    def _order(self, failure_id: str) -> Tuple[float, str]:
+        return to_epoch(self.failures[failure_id]["detected_at"]), failure_id
+
+    def _index_failure(self, key: Tuple[str, object], failure_id: str):
+        """
+        Add to an index deque in (detected_at, id) order, the order search
+        pages in. Live failures append; a backfilled one is placed by binary search.
+        """
+        ids = self.failure_index.setdefault(key, deque())
+        order = self._order(failure_id)
+        if not ids or self._order(ids[-1]) <= order:
+            ids.append(failure_id)
+            return
+        ids.insert(bisect.bisect_right(ids, order, key=self._order), failure_id)
+
+    async def prune_expired(self) -> int:
+        """Drop session buffers with no sample inside the retention window, and expired failures"""
+        deleted = 0
+        now = time.time()
+        if self.policy.telemetry_retention_days is not None:
+            cutoff = now - self.policy.telemetry_retention_days * 86400
+            for session_id, ring in list(self.telemetry.items()):
+                if ring.count and ring.times[(ring.head - 1) % ring.capacity] < cutoff:
+                    deleted += ring.count
+                    del self.telemetry[session_id]
+        if self.policy.failure_retention_days is not None:
+            cutoff = now - self.policy.failure_retention_days * 86400
+            while self.failures:
+                oldest = self.failures[self.failure_index[ALL_FAILURES][0]]
+                if to_epoch(oldest["detected_at"]) >= cutoff:
+                    break
+                self._forget_failure(self.failures.pop(oldest["id"]))
+                deleted += 1
+        return deleted
+
+    async def get_rollups(self, start: float, end: float, resolution: float, robot_id: Optional[str] = None,
+                          session_id: Optional[str] = None) -> Tuple[int, List[dict]]:
+        return self.rollups.query(start, end, resolution, time.time(), robot_id=robot_id, session_id=session_id)
+
+    def _forget_failure(self, failure: dict):
+        self.failure_clips.pop(failure["id"], None)
+        # Failures leave oldest first, so each is (almost always) at the front of its index deques
+        for key in _index_keys(failure):
+            ids = self.failure_index[key]
+            if ids[0] == failure["id"]:
+                ids.popleft()
+            else:
+                ids.remove(failure["id"])
+            if not ids:
+                del self.failure_index[key]
+
+    async def save_failure_clip(self, failure_ids: List[str], clip: bytes):
+        for failure_id in failure_ids:
+            if failure_id in self.failures:
+                self.failure_clips[failure_id] = clip
+
+    async def get_failure_clip(self, failure_id: str) -> Optional[bytes]:
+        return self.failure_clips.get(failure_id)
+
+    async def get_failures(self, robot_id: Optional[str] = None, limit: int = 100) -> List[dict]:
+        failures, _ = await self.search_failures(FailureQuery(robot_id=robot_id), limit=limit)
+        return failures
+
+    async def search_failures(self, query: FailureQuery, cursor: Optional[str] = None,
+                              limit: int = 100) -> Tuple[List[dict], Optional[str]]:
+        """
+        Walk the smallest matching secondary index newest first. Indexes are
+        kept in (detected_at, id) order, so index order is result order and a
+        cursor is found by binary search rather than by walking up to it.
+        """
+        candidates = [
+            self.failure_index.get(key, ()) for key in (
+                ("robot_id", query.robot_id), ("session_id", query.session_id),
+                ("failure_type", query.failure_type), ("severity", query.severity), ("joint", query.joint),
+            ) if key[1] is not None
+        ]
+        ids = min(candidates, key=len) if candidates else self.failure_index.get(ALL_FAILURES, ())
+        end = len(ids)
+        if cursor is not None:
+            end = bisect.bisect_left(ids, decode_cursor(cursor), key=self._order)
+
+        failures = []
+        # Indexed from the end: deques index in O(1) near either end and walk blocks in between
+        for i in range(end - 1, -1, -1):
+            failure = self.failures[ids[i]]
+            if not query.matches(failure):
+                continue
+            if len(failures) == limit:
+                last = failures[-1]
+                return failures, encode_cursor(last["detected_at"], last["id"])
+            failures.append(failure)
+        return failures, None
+
+
+def _index_keys(failure: dict) -> List[Tuple[str, object]]:
+    keys = [ALL_FAILURES]
+    keys.extend((name, failure.get(name)) for name in ("robot_id", "session_id", "failure_type", "severity"))
+    keys.extend(("joint", joint) for joint in set(failure_joints(failure)))
+    return keys
@@ -0,0 +1,90 @@
+"""Storage policies - telemetry compression, retention windows and raw payload sampling"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+log = logging.getLogger(__name__)
+
+RAW_DATA_MODES = ("keep", "sample", "drop")
+
+
+def _optional_float(name: str, default: Optional[str] = None) -> Optional[float]:
+    value = os.getenv(name, default)
+    return float(value) if value not in (None, "", "0") else None
+
+
+@dataclass(frozen=True)
+class StoragePolicy:
+    """
+    compress_after_hours  compress telemetry chunks older than this (Postgres);
+              off unless TELEMETRY_COMPRESS_AFTER_HOURS is set, "0" also
+              disables it. Compressed chunks make backfills into them slow
+    telemetry_retention_days / failure_retention_days  drop older rows
+    raw_data  keep every raw JSON payload, keep one in raw_data_every per
+              session ("sample"), or drop it since the typed columns hold
+              every channel
+    """
+
+    compress_after_hours: Optional[float] = None
+    telemetry_retention_days: Optional[float] = None
+    failure_retention_days: Optional[float] = None
+    raw_data: str = "keep"
+    raw_data_every: int = 100
+    prune_interval_s: float = 3600.0
+
+    @classmethod
+    def from_env(cls) -> "StoragePolicy":
+        policy = cls(
+            compress_after_hours=_optional_float("TELEMETRY_COMPRESS_AFTER_HOURS"),
+            telemetry_retention_days=_optional_float("TELEMETRY_RETENTION_DAYS"),
+            failure_retention_days=_optional_float("FAILURE_RETENTION_DAYS"),
+            raw_data=os.getenv("RAW_DATA_MODE", "keep"),
+            raw_data_every=max(int(os.getenv("RAW_DATA_SAMPLE_EVERY", "100")), 1),
+            prune_interval_s=float(os.getenv("RETENTION_INTERVAL_S", "3600")),
+        )
+        if policy.raw_data not in RAW_DATA_MODES:
+            raise ValueError(f"RAW_DATA_MODE must be one of {', '.join(RAW_DATA_MODES)}")
+        return policy
+
+    @property
+    def has_retention(self) -> bool:
+        return self.telemetry_retention_days is not None or self.failure_retention_days is not None
+
+
+STORAGE_POLICY = StoragePolicy.from_env()
+
+
+class RawDataSampler:
+    """Decides per session which raw payloads are stored under the policy"""
+
+    def __init__(self, policy: StoragePolicy = STORAGE_POLICY):
+        self.policy = policy
+        self._counts: Dict[str, int] = {}
+
+    def keep(self, session_id: str) -> bool:
+        if self.policy.raw_data == "keep":
+            return True
+        if self.policy.raw_data == "drop":
+            return False
+        count = self._counts.get(session_id, 0)
+        self._counts[session_id] = count + 1
+        return count % self.policy.raw_data_every == 0
+
+    def forget(self, session_id: str):
+        self._counts.pop(session_id, None)
+
+
+async def run_retention(database, interval: Optional[float] = None):
+    """Periodically delete rows that fell out of their retention window"""
+    interval = interval or database.policy.prune_interval_s
+    while True:
+        try:
+            deleted = await database.prune_expired()
+            if deleted:
+                log.info(f"Retention removed {deleted} rows")
+        except Exception as e:
+            log.error(f"Retention run failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,247 @@
+"""Per-robot telemetry rollups at 1 s / 1 min / 1 h, maintained incrementally"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from db.channels import from_epoch
+
+# Bucket widths in seconds, finest first
+ROLLUP_LEVELS = (1, 60, 3600)
+
+# How long each level is kept (None = forever). The Postgres continuous
+# aggregates in schema.sql use the same windows.
+ROLLUP_RETENTION_S = {1: 86400, 60: 30 * 86400, 3600: None}
+
+ROLLUP_DEFAULT_POINTS = 500
+ROLLUP_JOINTS = 8
+
+# Rollup fields and how two partial buckets combine
+SUM_FIELDS = (
+    "samples", "failures",
+    "confidence_sum", "confidence_count",
+    "battery_sum", "battery_count",
+    "inference_ms_sum", "inference_ms_count",
+    "cpu_sum", "cpu_count",
+)
+MIN_FIELDS = ("confidence_min", "battery_min")
+MAX_FIELDS = ("inference_ms_max", "cpu_max", *(f"torque_max_{j}" for j in range(ROLLUP_JOINTS)))
+ROLLUP_FIELDS = SUM_FIELDS + MIN_FIELDS + MAX_FIELDS
+
+
+def rollup_aggregates(fields=ROLLUP_FIELDS) -> str:
+    """SQL select list that merges stored rollup rows field by field"""
+    parts = []
+    for name in fields:
+        fn = "SUM" if name in SUM_FIELDS else "MIN" if name in MIN_FIELDS else "MAX"
+        parts.append(f"{fn}({name}) AS {name}")
+    return ", ".join(parts)
+
+
+def choose_level(start: float, end: float, resolution: float, now: float) -> int:
+    """
+    Coarsest level no wider than the requested resolution, moving to a coarser
+    level only if the finer one no longer holds data back to `start`.
+    """
+    candidates = [w for w in ROLLUP_LEVELS if w <= resolution] or [ROLLUP_LEVELS[0]]
+    level = candidates[-1]
+    for width in ROLLUP_LEVELS:
+        if width < level:
+            continue
+        retention = ROLLUP_RETENTION_S[width]
+        if retention is None or start >= now - retention:
+            return width
+    return ROLLUP_LEVELS[-1]
+
+
+class RollupBucket:
+    """Mergeable partial aggregate for one (robot, session, bucket)"""
+
+    __slots__ = ROLLUP_FIELDS
+
+    def __init__(self):
+        for name in SUM_FIELDS:
+            setattr(self, name, 0)
+        for name in MIN_FIELDS + MAX_FIELDS:
+            setattr(self, name, None)
+
+    def add_sample(self, data: dict):
+        self.samples += 1
+        model = data.get("model") or {}
+        system = data.get("system") or {}
+
+        confidence = model.get("action_confidence")
+        if confidence is not None:
+            self.confidence_sum += confidence
+            self.confidence_count += 1
+            if self.confidence_min is None or confidence < self.confidence_min:
+                self.confidence_min = confidence
+
+        battery = system.get("battery_percent")
+        if battery is not None:
+            self.battery_sum += battery
+            self.battery_count += 1
+            if self.battery_min is None or battery < self.battery_min:
+                self.battery_min = battery
+
+        inference = model.get("inference_time_ms")
+        if inference is not None:
+            self.inference_ms_sum += inference
+            self.inference_ms_count += 1
+            if self.inference_ms_max is None or inference > self.inference_ms_max:
+                self.inference_ms_max = inference
+
+        cpu = system.get("cpu_percent")
+        if cpu is not None:
+            self.cpu_sum += cpu
+            self.cpu_count += 1
+            if self.cpu_max is None or cpu > self.cpu_max:
+                self.cpu_max = cpu
+
+        torques = (data.get("joints") or {}).get("torques_nm") or ()
+        for j, torque in enumerate(torques[:ROLLUP_JOINTS]):
+            if torque is None:
+                continue
+            name = f"torque_max_{j}"
+            current = getattr(self, name)
+            if current is None or torque > current:
+                setattr(self, name, torque)
+
+    def merge(self, other: "RollupBucket"):
+        for name in SUM_FIELDS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in MIN_FIELDS:
+            a, b = getattr(self, name), getattr(other, name)
+            setattr(self, name, b if a is None else a if b is None else min(a, b))
+        for name in MAX_FIELDS:
+            a, b = getattr(self, name), getattr(other, name)
+            setattr(self, name, b if a is None else a if b is None else max(a, b))
+
+    @classmethod
+    def from_fields(cls, fields: dict) -> "RollupBucket":
+        bucket = cls()
+        for name in ROLLUP_FIELDS:
+            value = fields.get(name)
+            if value is not None:
+                setattr(bucket, name, value)
+        return bucket
+
+    def fields(self) -> dict:
+        return {name: getattr(self, name) for name in ROLLUP_FIELDS}
+
+    def to_row(self, time: float) -> dict:
+        def avg(total, count):
+            return total / count if count else None
+
+        return {
+            "time": from_epoch(time),
+            "samples": self.samples,
+            "failures": self.failures,
+            "confidence_min": self.confidence_min,
+            "confidence_avg": avg(self.confidence_sum, self.confidence_count),
+            "battery_min": self.battery_min,
+            "battery_avg": avg(self.battery_sum, self.battery_count),
+            "inference_ms_avg": avg(self.inference_ms_sum, self.inference_ms_count),
+            "inference_ms_max": self.inference_ms_max,
+            "cpu_avg": avg(self.cpu_sum, self.cpu_count),
+            "cpu_max": self.cpu_max,
+            "torque_max": [getattr(self, f"torque_max_{j}") for j in range(ROLLUP_JOINTS)],
+        }
+
+
+def merge_rows(rows: List[Tuple[float, RollupBucket]], resolution: float) -> List[dict]:
+    """Re-bucket (time, bucket) pairs onto a coarser grid of `resolution` seconds"""
+    merged: Dict[float, RollupBucket] = {}
+    for time, bucket in rows:
+        key = math.floor(time / resolution) * resolution
+        target = merged.get(key)
+        if target is None:
+            target = merged[key] = RollupBucket()
+        target.merge(bucket)
+    return [merged[key].to_row(key) for key in sorted(merged)]
+
+
+class RollupStore:
+    """
+    Rollup buckets held in memory, indexed level -> robot -> bucket start ->
+    session. Adding a sample touches one bucket per level; a query walks only
+    the bucket starts inside the requested range at the chosen level.
+    """
+
+    def __init__(self, retention: Optional[Dict[int, Optional[float]]] = None):
+        self.retention = ROLLUP_RETENTION_S if retention is None else retention
+        self.levels: Dict[int, Dict[str, Dict[float, Dict[str, RollupBucket]]]] = {w: {} for w in ROLLUP_LEVELS}
+        self._order: Dict[int, Deque[Tuple[float, str]]] = {w: deque() for w in ROLLUP_LEVELS}
+
+    def _bucket(self, width: int, robot_id: str, session_id: str, epoch: float) -> RollupBucket:
+        start = math.floor(epoch / width) * width
+        by_start = self.levels[width].setdefault(robot_id, {})
+        by_session = by_start.get(start)
+        if by_session is None:
+            by_session = by_start[start] = {}
+            self._order[width].append((start, robot_id))
+        bucket = by_session.get(session_id)
+        if bucket is None:
+            bucket = by_session[session_id] = RollupBucket()
+        return bucket
+
+    def add_telemetry(self, robot_id: str, session_id: str, epoch: float, data: dict):
+        for width in ROLLUP_LEVELS:
+            self._bucket(width, robot_id, session_id, epoch).add_sample(data)
+
+    def add_failure(self, robot_id: str, session_id: str, epoch: float):
+        for width in ROLLUP_LEVELS:
+            self._bucket(width, robot_id, session_id, epoch).failures += 1
+
+    def evict(self, now: float):
+        for width, order in self._order.items():
+            retention = self.retention.get(width)
+            if retention is None:
+                continue
+            while order and order[0][0] < now - retention:
+                start, robot_id = order.popleft()
+                by_start = self.levels[width].get(robot_id, {})
+                by_start.pop(start, None)
+                if not by_start:
+                    self.levels[width].pop(robot_id, None)
+
+    def drain(self) -> List[Tuple[int, str, str, float, RollupBucket]]:
+        """Remove and return every bucket (used by backends that persist deltas)"""
+        drained = []
+        for width, robots in self.levels.items():
+            for robot_id, by_start in robots.items():
+                for start, by_session in by_start.items():
+                    for session_id, bucket in by_session.items():
+                        drained.append((width, robot_id, session_id, start, bucket))
+            robots.clear()
+            self._order[width].clear()
+        return drained
+
+    def query(self, start: float, end: float, resolution: float, now: float,
+              robot_id: Optional[str] = None, session_id: Optional[str] = None) -> Tuple[int, List[dict]]:
+        width = choose_level(start, end, resolution, now)
+        resolution = max(resolution, width)
+        robots = [robot_id] if robot_id else list(self.levels[width])
+
+        pairs = []
+        for rid in robots:
+            by_start = self.levels[width].get(rid)
+            if not by_start:
+                continue
+            first = math.floor(start / width) * width
+            if (end - first) / width > len(by_start):
+                starts = sorted(s for s in by_start if first <= s < end)
+            else:
+                starts = [s for s in _frange(first, end, width) if s in by_start]
+            for s in starts:
+                for sid, bucket in by_start[s].items():
+                    if session_id is None or sid == session_id:
+                        pairs.append((s, bucket))
+        return width, merge_rows(pairs, resolution)
+
+
+def _frange(start: float, end: float, step: float):
+    value = start
+    while value < end:
+        yield value
+        value += step
@@ -1,4 +1,5 @@
 -- RobotBlackBox TimescaleDB Schema
+-- Also run by the server on every start (Database.migrate): keep every statement idempotent
 
 CREATE EXTENSION IF NOT EXISTS timescaledb;
 
@@ -7,11 +8,14 @@ CREATE TABLE IF NOT EXISTS sessions (
     robot_id TEXT NOT NULL,
     started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     ended_at TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ,
     metadata JSONB DEFAULT '{}'
 );
 
-CREATE INDEX idx_sessions_robot ON sessions(robot_id);
-CREATE INDEX idx_sessions_time ON sessions(started_at DESC);
+ALTER TABLE sessions ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_sessions_robot ON sessions(robot_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_time ON sessions(started_at DESC);
 
 CREATE TABLE IF NOT EXISTS telemetry (
     time TIMESTAMPTZ NOT NULL,
@@ -39,8 +43,11 @@ CREATE TABLE IF NOT EXISTS telemetry (
 
 SELECT create_hypertable('telemetry', 'time', if_not_exists => TRUE);
 
-CREATE INDEX idx_telemetry_session ON telemetry(session_id, time DESC);
-CREATE INDEX idx_telemetry_robot ON telemetry(robot_id, time DESC);
+CREATE INDEX IF NOT EXISTS idx_telemetry_session ON telemetry(session_id, time DESC);
+CREATE INDEX IF NOT EXISTS idx_telemetry_robot ON telemetry(robot_id, time DESC);
+
+-- Compression and retention jobs for telemetry, and sampling of raw_data,
+-- are configured by the server at startup (see db/policies.py)
 
 CREATE TABLE IF NOT EXISTS failures (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -54,8 +61,215 @@ CREATE TABLE IF NOT EXISTS failures (
     detail TEXT,
     affected_components JSONB DEFAULT '{}',
     classifier_data JSONB DEFAULT '{}',
-    acknowledged BOOLEAN DEFAULT FALSE
+    acknowledged BOOLEAN DEFAULT FALSE,
+    -- A row covers one failure episode; these are set when it closes
+    ended_at TIMESTAMPTZ,
+    duration_s DOUBLE PRECISION,
+    frames INTEGER DEFAULT 1
+);
+
+ALTER TABLE failures ADD COLUMN IF NOT EXISTS ended_at TIMESTAMPTZ;
+ALTER TABLE failures ADD COLUMN IF NOT EXISTS duration_s DOUBLE PRECISION;
+ALTER TABLE failures ADD COLUMN IF NOT EXISTS frames INTEGER DEFAULT 1;
+
+-- Failure search pages newest first on (detected_at, id); each filter has a
+-- matching composite index, and joint filters use the GIN index with @>
+CREATE INDEX IF NOT EXISTS idx_failures_robot ON failures(robot_id, detected_at DESC);
+CREATE INDEX IF NOT EXISTS idx_failures_keyset ON failures(detected_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_failures_session ON failures(session_id, detected_at DESC);
+CREATE INDEX IF NOT EXISTS idx_failures_type_time ON failures(failure_type, detected_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_failures_robot_type ON failures(robot_id, failure_type, detected_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_failures_unacknowledged ON failures(detected_at DESC, id DESC) WHERE NOT acknowledged;
+CREATE INDEX IF NOT EXISTS idx_failures_components ON failures USING GIN (affected_components jsonb_path_ops);
+
+-- Bulk ingest ledger: one row per accepted batch, written in the same
+-- transaction as its telemetry so retries are idempotent. classified_at is
+-- set once the batch's failures are all stored; a retry of a batch without
+-- it finishes the classification
+CREATE TABLE IF NOT EXISTS ingest_batches (
+    batch_id TEXT PRIMARY KEY,
+    session_id UUID NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    robot_id TEXT NOT NULL,
+    events INTEGER NOT NULL,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    classified_at TIMESTAMPTZ
+);
+ALTER TABLE ingest_batches ADD COLUMN IF NOT EXISTS classified_at TIMESTAMPTZ;
+
+-- Compressed telemetry window around each failure (see live/clips.py)
+CREATE TABLE IF NOT EXISTS failure_clips (
+    failure_id UUID PRIMARY KEY REFERENCES failures(id) ON DELETE CASCADE,
+    clip BYTEA NOT NULL
 );
 
-CREATE INDEX idx_failures_robot ON failures(robot_id, detected_at DESC);
-CREATE INDEX idx_failures_type ON failures(failure_type);
+-- Session summaries, upserted from the write path (see db/summaries.py)
+CREATE TABLE IF NOT EXISTS session_summaries (
+    session_id UUID PRIMARY KEY REFERENCES sessions(id) ON DELETE CASCADE,
+    robot_id TEXT NOT NULL,
+    samples BIGINT DEFAULT 0,
+    failures INTEGER DEFAULT 0,
+    confidence_min DOUBLE PRECISION,
+    battery_start DOUBLE PRECISION,
+    battery_end DOUBLE PRECISION,
+    first_seen TIMESTAMPTZ,
+    last_seen TIMESTAMPTZ,
+    failures_by_type JSONB DEFAULT '{}',
+    failures_by_severity JSONB DEFAULT '{}'
+);
+
+-- Adds two {key: count} objects key by key
+CREATE OR REPLACE FUNCTION merge_counts(a JSONB, b JSONB) RETURNS JSONB
+LANGUAGE SQL IMMUTABLE AS $$
+    SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+    FROM (
+        SELECT key, SUM(value::bigint) AS total
+        FROM (
+            SELECT * FROM jsonb_each_text(COALESCE(a, '{}'::jsonb))
+            UNION ALL
+            SELECT * FROM jsonb_each_text(COALESCE(b, '{}'::jsonb))
+        ) AS counts
+        GROUP BY key
+    ) AS merged
+$$;
+
+-- Sessions recorded before session_summaries existed get their summary from
+-- their telemetry and failures, once: sessions that have a row are skipped
+INSERT INTO session_summaries (
+    session_id, robot_id, samples, failures, confidence_min, battery_start, battery_end,
+    first_seen, last_seen, failures_by_type, failures_by_severity
+)
+SELECT
+    s.id, s.robot_id,
+    (SELECT COUNT(*) FROM telemetry t WHERE t.session_id = s.id),
+    (SELECT COUNT(*) FROM failures f WHERE f.session_id = s.id),
+    (SELECT MIN(model_confidence) FROM telemetry t WHERE t.session_id = s.id),
+    (SELECT battery_percent FROM telemetry t WHERE t.session_id = s.id AND battery_percent IS NOT NULL
+     ORDER BY time ASC LIMIT 1),
+    (SELECT battery_percent FROM telemetry t WHERE t.session_id = s.id AND battery_percent IS NOT NULL
+     ORDER BY time DESC LIMIT 1),
+    LEAST((SELECT MIN(time) FROM telemetry t WHERE t.session_id = s.id),
+          (SELECT MIN(detected_at) FROM failures f WHERE f.session_id = s.id)),
+    GREATEST((SELECT MAX(time) FROM telemetry t WHERE t.session_id = s.id),
+             (SELECT MAX(detected_at) FROM failures f WHERE f.session_id = s.id)),
+    (SELECT COALESCE(jsonb_object_agg(failure_type, n), '{}'::jsonb) FROM (
+        SELECT failure_type, COUNT(*) AS n FROM failures f WHERE f.session_id = s.id GROUP BY failure_type
+    ) AS by_type),
+    (SELECT COALESCE(jsonb_object_agg(severity, n), '{}'::jsonb) FROM (
+        SELECT severity, COUNT(*) AS n FROM failures f WHERE f.session_id = s.id GROUP BY severity
+    ) AS by_severity)
+FROM sessions s
+WHERE NOT EXISTS (SELECT 1 FROM session_summaries sm WHERE sm.session_id = s.id)
+ON CONFLICT (session_id) DO NOTHING;
+
+-- Rollups: 1 s from raw telemetry, 1 min from 1 s, 1 h from 1 min.
+-- Averages are stored as sum + count so coarser levels stay exact.
+-- Retention windows match ROLLUP_RETENTION_S in db/rollups.py.
+CREATE MATERIALIZED VIEW IF NOT EXISTS telemetry_1s
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 second', time) AS bucket,
+    robot_id,
+    session_id,
+    COUNT(*) AS samples,
+    SUM(model_confidence) AS confidence_sum,
+    COUNT(model_confidence) AS confidence_count,
+    SUM(battery_percent) AS battery_sum,
+    COUNT(battery_percent) AS battery_count,
+    SUM(model_inference_ms) AS inference_ms_sum,
+    COUNT(model_inference_ms) AS inference_ms_count,
+    SUM(cpu_percent) AS cpu_sum,
+    COUNT(cpu_percent) AS cpu_count,
+    MIN(model_confidence) AS confidence_min,
+    MIN(battery_percent) AS battery_min,
+    MAX(model_inference_ms) AS inference_ms_max,
+    MAX(cpu_percent) AS cpu_max,
+    MAX(joint_torques[1]) AS torque_max_0,
+    MAX(joint_torques[2]) AS torque_max_1,
+    MAX(joint_torques[3]) AS torque_max_2,
+    MAX(joint_torques[4]) AS torque_max_3,
+    MAX(joint_torques[5]) AS torque_max_4,
+    MAX(joint_torques[6]) AS torque_max_5,
+    MAX(joint_torques[7]) AS torque_max_6,
+    MAX(joint_torques[8]) AS torque_max_7
+FROM telemetry
+GROUP BY 1, robot_id, session_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS telemetry_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 minute', bucket) AS bucket,
+    robot_id,
+    session_id,
+    SUM(samples) AS samples,
+    SUM(confidence_sum) AS confidence_sum,
+    SUM(confidence_count) AS confidence_count,
+    SUM(battery_sum) AS battery_sum,
+    SUM(battery_count) AS battery_count,
+    SUM(inference_ms_sum) AS inference_ms_sum,
+    SUM(inference_ms_count) AS inference_ms_count,
+    SUM(cpu_sum) AS cpu_sum,
+    SUM(cpu_count) AS cpu_count,
+    MIN(confidence_min) AS confidence_min,
+    MIN(battery_min) AS battery_min,
+    MAX(inference_ms_max) AS inference_ms_max,
+    MAX(cpu_max) AS cpu_max,
+    MAX(torque_max_0) AS torque_max_0,
+    MAX(torque_max_1) AS torque_max_1,
+    MAX(torque_max_2) AS torque_max_2,
+    MAX(torque_max_3) AS torque_max_3,
+    MAX(torque_max_4) AS torque_max_4,
+    MAX(torque_max_5) AS torque_max_5,
+    MAX(torque_max_6) AS torque_max_6,
+    MAX(torque_max_7) AS torque_max_7
+FROM telemetry_1s
+GROUP BY 1, robot_id, session_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS telemetry_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 hour', bucket) AS bucket,
+    robot_id,
+    session_id,
+    SUM(samples) AS samples,
+    SUM(confidence_sum) AS confidence_sum,
+    SUM(confidence_count) AS confidence_count,
+    SUM(battery_sum) AS battery_sum,
+    SUM(battery_count) AS battery_count,
+    SUM(inference_ms_sum) AS inference_ms_sum,
+    SUM(inference_ms_count) AS inference_ms_count,
+    SUM(cpu_sum) AS cpu_sum,
+    SUM(cpu_count) AS cpu_count,
+    MIN(confidence_min) AS confidence_min,
+    MIN(battery_min) AS battery_min,
+    MAX(inference_ms_max) AS inference_ms_max,
+    MAX(cpu_max) AS cpu_max,
+    MAX(torque_max_0) AS torque_max_0,
+    MAX(torque_max_1) AS torque_max_1,
+    MAX(torque_max_2) AS torque_max_2,
+    MAX(torque_max_3) AS torque_max_3,
+    MAX(torque_max_4) AS torque_max_4,
+    MAX(torque_max_5) AS torque_max_5,
+    MAX(torque_max_6) AS torque_max_6,
+    MAX(torque_max_7) AS torque_max_7
+FROM telemetry_1m
+GROUP BY 1, robot_id, session_id
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_telemetry_1s_robot ON telemetry_1s(robot_id, bucket DESC);
+CREATE INDEX IF NOT EXISTS idx_telemetry_1m_robot ON telemetry_1m(robot_id, bucket DESC);
+CREATE INDEX IF NOT EXISTS idx_telemetry_1h_robot ON telemetry_1h(robot_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy('telemetry_1s',
+    start_offset => INTERVAL '1 hour', end_offset => INTERVAL '1 second',
+    schedule_interval => INTERVAL '10 seconds', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('telemetry_1m',
+    start_offset => INTERVAL '6 hours', end_offset => INTERVAL '1 minute',
+    schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('telemetry_1h',
+    start_offset => INTERVAL '3 days', end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '30 minutes', if_not_exists => TRUE);
+
+SELECT add_retention_policy('telemetry_1s', INTERVAL '1 day', if_not_exists => TRUE);
+SELECT add_retention_policy('telemetry_1m', INTERVAL '30 days', if_not_exists => TRUE);
@@ -0,0 +1,173 @@
+-- RobotBlackBox embedded SQLite schema
+-- Times are stored as UTC epoch seconds (REAL) so range scans compare numbers
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    robot_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    archived_at REAL,
+    metadata TEXT DEFAULT '{}'
+);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_robot ON sessions(robot_id, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_sessions_time ON sessions(started_at DESC);
+
+-- Maintained from the write path so listing sessions never scans failures
+CREATE TABLE IF NOT EXISTS session_summaries (
+    session_id TEXT PRIMARY KEY,
+    robot_id TEXT NOT NULL,
+    samples INTEGER DEFAULT 0,
+    failures INTEGER DEFAULT 0,
+    confidence_min REAL,
+    battery_start REAL,
+    battery_end REAL,
+    first_seen REAL,
+    last_seen REAL,
+    failures_by_type TEXT DEFAULT '{}',
+    failures_by_severity TEXT DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS telemetry (
+    time REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    robot_id TEXT NOT NULL,
+    joint_positions TEXT,
+    joint_velocities TEXT,
+    joint_torques TEXT,
+    joint_temps TEXT,
+    gripper_position REAL,
+    gripper_force REAL,
+    gripper_contact INTEGER,
+    task_name TEXT,
+    task_phase TEXT,
+    task_progress REAL,
+    model_confidence REAL,
+    model_uncertainty REAL,
+    model_inference_ms REAL,
+    model_action TEXT,
+    cpu_percent REAL,
+    memory_mb REAL,
+    battery_percent REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_telemetry_session ON telemetry(session_id, time);
+CREATE INDEX IF NOT EXISTS idx_telemetry_robot ON telemetry(robot_id, time);
+
+CREATE TABLE IF NOT EXISTS failures (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    robot_id TEXT NOT NULL,
+    detected_at REAL NOT NULL,
+    failure_type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    confidence REAL,
+    summary TEXT NOT NULL,
+    detail TEXT,
+    affected_components TEXT DEFAULT '{}',
+    classifier_data TEXT DEFAULT '{}',
+    acknowledged INTEGER DEFAULT 0,
+    -- A row covers one failure episode; these are set when it closes
+    ended_at REAL,
+    duration_s REAL,
+    frames INTEGER DEFAULT 1
+);
+
+-- Failure search pages newest first on (detected_at, id)
+CREATE INDEX IF NOT EXISTS idx_failures_session ON failures(session_id);
+CREATE INDEX IF NOT EXISTS idx_failures_robot ON failures(robot_id, detected_at DESC);
+DROP INDEX IF EXISTS idx_failures_time;
+CREATE INDEX IF NOT EXISTS idx_failures_keyset ON failures(detected_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_failures_type_time ON failures(failure_type, detected_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_failures_robot_type ON failures(robot_id, failure_type, detected_at DESC, id DESC);
+
+-- Secondary index of affected_components.joints, written with each failure
+CREATE TABLE IF NOT EXISTS failure_joints (
+    joint INTEGER NOT NULL,
+    detected_at REAL NOT NULL,
+    failure_id TEXT NOT NULL,
+    PRIMARY KEY (joint, detected_at, failure_id)
+) WITHOUT ROWID;
+
+-- Bulk ingest ledger, committed in the same transaction as the batch's rows;
+-- classified_at is set once the batch's failures are all stored
+CREATE TABLE IF NOT EXISTS ingest_batches (
+    batch_id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    robot_id TEXT NOT NULL,
+    events INTEGER NOT NULL,
+    received_at REAL NOT NULL,
+    classified_at REAL
+);
+
+-- Compressed telemetry window around each failure (see live/clips.py)
+CREATE TABLE IF NOT EXISTS failure_clips (
+    failure_id TEXT PRIMARY KEY,
+    clip BLOB NOT NULL
+);
+
+-- Rollup deltas are merged into these rows by the writer thread
+CREATE TABLE IF NOT EXISTS rollups (
+    width INTEGER NOT NULL,
+    robot_id TEXT NOT NULL,
+    bucket REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    samples INTEGER DEFAULT 0,
+    failures INTEGER DEFAULT 0,
+    confidence_sum REAL DEFAULT 0,
+    confidence_count INTEGER DEFAULT 0,
+    battery_sum REAL DEFAULT 0,
+    battery_count INTEGER DEFAULT 0,
+    inference_ms_sum REAL DEFAULT 0,
+    inference_ms_count INTEGER DEFAULT 0,
+    cpu_sum REAL DEFAULT 0,
+    cpu_count INTEGER DEFAULT 0,
+    confidence_min REAL,
+    battery_min REAL,
+    inference_ms_max REAL,
+    cpu_max REAL,
+    torque_max_0 REAL,
+    torque_max_1 REAL,
+    torque_max_2 REAL,
+    torque_max_3 REAL,
+    torque_max_4 REAL,
+    torque_max_5 REAL,
+    torque_max_6 REAL,
+    torque_max_7 REAL,
+    PRIMARY KEY (width, robot_id, bucket, session_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_rollups_time ON rollups(width, bucket);
+
+-- Sessions recorded before session_summaries existed get their summary from
+-- their telemetry and failures, once: sessions that have a row are skipped
+INSERT OR IGNORE INTO session_summaries (
+    session_id, robot_id, samples, failures, confidence_min, battery_start, battery_end,
+    first_seen, last_seen, failures_by_type, failures_by_severity
+)
+SELECT
+    s.id, s.robot_id,
+    (SELECT COUNT(*) FROM telemetry t WHERE t.session_id = s.id),
+    (SELECT COUNT(*) FROM failures f WHERE f.session_id = s.id),
+    (SELECT MIN(model_confidence) FROM telemetry t WHERE t.session_id = s.id),
+    (SELECT battery_percent FROM telemetry t WHERE t.session_id = s.id AND battery_percent IS NOT NULL
+     ORDER BY time ASC LIMIT 1),
+    (SELECT battery_percent FROM telemetry t WHERE t.session_id = s.id AND battery_percent IS NOT NULL
+     ORDER BY time DESC LIMIT 1),
+    -- Two-argument MIN/MAX are NULL if either side is, hence the COALESCE pairs
+    (SELECT MIN(COALESCE(tt, ft), COALESCE(ft, tt)) FROM (
+        SELECT (SELECT MIN(time) FROM telemetry t WHERE t.session_id = s.id) AS tt,
+               (SELECT MIN(detected_at) FROM failures f WHERE f.session_id = s.id) AS ft
+    )),
+    (SELECT MAX(COALESCE(tt, ft), COALESCE(ft, tt)) FROM (
+        SELECT (SELECT MAX(time) FROM telemetry t WHERE t.session_id = s.id) AS tt,
+               (SELECT MAX(detected_at) FROM failures f WHERE f.session_id = s.id) AS ft
+    )),
+    (SELECT json_group_object(failure_type, n) FROM (
+        SELECT failure_type, COUNT(*) AS n FROM failures f WHERE f.session_id = s.id GROUP BY failure_type
+    )),
+    (SELECT json_group_object(severity, n) FROM (
+        SELECT severity, COUNT(*) AS n FROM failures f WHERE f.session_id = s.id GROUP BY severity
+    ))
+FROM sessions s
+WHERE NOT EXISTS (SELECT 1 FROM session_summaries sm WHERE sm.session_id = s.id);
@@ -0,0 +1,670 @@
+"""Embedded SQLite storage backend - WAL mode with a batching writer thread"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from db.archive import SessionArchive, iter_archived_rows
+from db.channels import (
+    BOOLEAN_CHANNELS, DEFAULT_CHANNELS, JOINT_CHANNELS, NUMERIC_CHANNELS, STORED_CHANNELS, TEXT_CHANNELS,
+    advance_position, channel_value, from_epoch, joint_values, to_epoch, validate_channels,
+)
+from db.downsample import DOWNSAMPLE_CHANNELS, bucket_columns, bucket_width
+from db.failures import FAILURE_UPDATE_FIELDS, FailureQuery, decode_cursor, encode_cursor, failure_joints
+from db.policies import STORAGE_POLICY, StoragePolicy
+from db.rollups import (
+    MIN_FIELDS, ROLLUP_FIELDS, ROLLUP_LEVELS, ROLLUP_RETENTION_S, SUM_FIELDS,
+    RollupBucket, RollupStore, choose_level, merge_rows, rollup_aggregates,
+)
+from db.summaries import SUMMARY_COUNTS, SUMMARY_FIELDS, SummaryStore, merge_counts, summary_of
+
+log = logging.getLogger(__name__)
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "robotblackbox.db")
+SQLITE_BATCH_SIZE = int(os.getenv("SQLITE_BATCH_SIZE", "2000"))
+SCHEMA_PATH = Path(__file__).with_name("schema_sqlite.sql")
+
+TELEMETRY_COLUMNS = ("time", "session_id", "robot_id", *STORED_CHANNELS)
+INSERT_TELEMETRY = (
+    f"INSERT INTO telemetry ({', '.join(TELEMETRY_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(TELEMETRY_COLUMNS))})"
+)
+FAILURE_JSON_COLUMNS = ("affected_components", "classifier_data")
+# Added after the first release; older databases get them on connect
+FAILURE_EPISODE_COLUMNS = {"ended_at": "REAL", "duration_s": "REAL", "frames": "INTEGER DEFAULT 1"}
+INGEST_PROGRESS_COLUMNS = {"classified_at": "REAL"}
+
+ROLLUP_FLUSH_S = float(os.getenv("SQLITE_ROLLUP_FLUSH_S", "1.0"))
+ROLLUP_PRUNE_S = 60.0
+ROLLUP_KEY_COLUMNS = ("width", "robot_id", "session_id", "bucket")
+
+
+def _rollup_merge(name: str) -> str:
+    if name in SUM_FIELDS:
+        return f"{name} = {name} + excluded.{name}"
+    fn = "MIN" if name in MIN_FIELDS else "MAX"
+    return f"{name} = COALESCE({fn}({name}, excluded.{name}), {name}, excluded.{name})"
+
+
+UPSERT_ROLLUP = (
+    f"INSERT INTO rollups ({', '.join(ROLLUP_KEY_COLUMNS + ROLLUP_FIELDS)}) "
+    f"VALUES ({', '.join('?' * (len(ROLLUP_KEY_COLUMNS) + len(ROLLUP_FIELDS)))}) "
+    f"ON CONFLICT(width, robot_id, bucket, session_id) DO UPDATE SET "
+    f"{', '.join(_rollup_merge(name) for name in ROLLUP_FIELDS)}"
+)
+
+SUMMARY_COLUMNS = ("session_id", "robot_id", *SUMMARY_FIELDS, *SUMMARY_COUNTS)
+UPSERT_SUMMARY = (
+    f"INSERT INTO session_summaries ({', '.join(SUMMARY_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(SUMMARY_COLUMNS))}) "
+    "ON CONFLICT(session_id) DO UPDATE SET "
+    "samples = samples + excluded.samples, "
+    "failures = failures + excluded.failures, "
+    "confidence_min = COALESCE(MIN(confidence_min, excluded.confidence_min), confidence_min, excluded.confidence_min), "
+    "battery_start = COALESCE(battery_start, excluded.battery_start), "
+    "battery_end = COALESCE(excluded.battery_end, battery_end), "
+    "first_seen = COALESCE(MIN(first_seen, excluded.first_seen), first_seen, excluded.first_seen), "
+    "last_seen = COALESCE(MAX(last_seen, excluded.last_seen), last_seen, excluded.last_seen), "
+    "failures_by_type = merge_counts(failures_by_type, excluded.failures_by_type), "
+    "failures_by_severity = merge_counts(failures_by_severity, excluded.failures_by_severity)"
+)
+
+
+def _merge_counts_json(a: Optional[str], b: Optional[str]) -> str:
+    return json.dumps(merge_counts(json.loads(a or "{}"), json.loads(b or "{}")))
+
+
+def connect_sqlite(path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.create_function("merge_counts", 2, _merge_counts_json, deterministic=True)
+    return conn
+
+
+def telemetry_row(session_id: str, robot_id: str, timestamp, data: dict) -> tuple:
+    row = [to_epoch(timestamp), session_id, robot_id]
+    for name in JOINT_CHANNELS:
+        values = joint_values(data, name)
+        row.append(json.dumps(values) if values is not None else None)
+    for name in NUMERIC_CHANNELS:
+        row.append(channel_value(data, name))
+    for name in TEXT_CHANNELS:
+        row.append(channel_value(data, name))
+    return tuple(row)
+
+
+def _decode(row: sqlite3.Row) -> dict:
+    """Turn a stored row back into API types (datetimes, lists, bools, dicts)"""
+    record = dict(row)
+    for key, value in record.items():
+        if value is None:
+            continue
+        if key in ("time", "started_at", "ended_at", "archived_at", "detected_at", "received_at", "classified_at"):
+            record[key] = from_epoch(value)
+        elif key in JOINT_CHANNELS:
+            record[key] = json.loads(value)
+        elif key in BOOLEAN_CHANNELS or key == "acknowledged":
+            record[key] = bool(value)
+        elif key == "metadata" or key in FAILURE_JSON_COLUMNS:
+            record[key] = json.loads(value)
+    return record
+
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    conn.commit()
+
+
+# Marks a queued op holding several statements that must commit together
+TRANSACTION = "-- transaction"
+
+
+class _Writer(threading.Thread):
+    """
+    Owns the only write connection. Queued statements are drained in batches
+    of up to batch_size and committed in a single transaction, grouping runs
+    of the same statement into executemany. A TRANSACTION op carries several
+    statements that always commit (or fail) together.
+    """
+
+    def __init__(self, path: str, batch_size: int):
+        super().__init__(name="sqlite-writer", daemon=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    def submit(self, sql: str, params: tuple, waiter=None):
+        self.queue.put((sql, params, waiter))
+
+    def submit_transaction(self, statements: List[Tuple[str, list]], waiter=None):
+        """statements: (sql, rows) pairs, each run with executemany"""
+        self.queue.put((TRANSACTION, statements, waiter))
+
+    def stop(self):
+        self.queue.put(None)
+
+    def run(self):
+        conn = connect_sqlite(self.path)
+        stopping = False
+        while not stopping:
+            op = self.queue.get()
+            if op is None:
+                break
+            batch = [op]
+            while len(batch) < self.batch_size:
+                try:
+                    op = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is None:
+                    stopping = True
+                    break
+                batch.append(op)
+            self._commit(conn, batch)
+        conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: list):
+        try:
+            self._execute(conn, batch)
+            errors = [None] * len(batch)
+        except sqlite3.Error as e:
+            log.error(f"SQLite batch of {len(batch)} failed ({e}), retrying one by one")
+            errors = []
+            for op in batch:
+                try:
+                    self._execute(conn, [op])
+                    errors.append(None)
+                except sqlite3.Error as op_error:
+                    errors.append(op_error)
+
+        for (_, _, waiter), error in zip(batch, errors):
+            if waiter is not None:
+                loop, future = waiter
+                loop.call_soon_threadsafe(_resolve, future, error)
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, batch: list):
+        conn.execute("BEGIN")
+        try:
+            for sql, ops in groupby(batch, key=lambda op: op[0]):
+                if sql is TRANSACTION:
+                    for _, statements, _ in ops:
+                        for statement, rows in statements:
+                            conn.executemany(statement, rows)
+                else:
+                    conn.executemany(sql, [op[1] for op in ops])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def _resolve(future: asyncio.Future, error: Optional[Exception]):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+class SQLiteDatabase:
+    """
+    Storage backend on an embedded SQLite file, for single-site deployments.
+
+    Telemetry inserts are queued to the writer thread without waiting, so the
+    event loop never blocks on disk. Session and failure writes wait for their
+    batch to commit. Reads run in the default executor on a separate
+    connection, which WAL mode lets proceed alongside the writer.
+
+    Rollups and session summaries accumulate in memory and are merged into
+    their tables as upserts about once a second, so they cost one row per
+    bucket or session rather than one write per sample.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH, batch_size: int = SQLITE_BATCH_SIZE,
+                 archive: Optional[SessionArchive] = None, policy: StoragePolicy = STORAGE_POLICY):
+        self.path = path
+        self.batch_size = batch_size
+        self.archive = archive
+        # Only the retention windows apply: there is no raw_data column and no chunk compression
+        self.policy = policy
+        self._writer: Optional[_Writer] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+        self._rollups = RollupStore()
+        self._summaries = SummaryStore()
+        self._rollups_flushed_at = time.monotonic()
+        self._rollups_pruned_at = 0.0
+
+    async def connect(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = connect_sqlite(self.path)
+        conn.executescript(SCHEMA_PATH.read_text())
+        _add_missing_columns(conn, "failures", FAILURE_EPISODE_COLUMNS)
+        _add_missing_columns(conn, "ingest_batches", INGEST_PROGRESS_COLUMNS)
+        conn.close()
+
+        self._reader = connect_sqlite(self.path, check_same_thread=False)
+        self._writer = _Writer(self.path, self.batch_size)
+        self._writer.start()
+        log.info(f"SQLite database at {self.path}")
+
+    async def disconnect(self):
+        if self._writer:
+            self._flush_rollups()
+            self._writer.stop()
+            await asyncio.get_running_loop().run_in_executor(None, self._writer.join)
+            self._writer = None
+        if self._reader:
+            self._reader.close()
+            self._reader = None
+
+    async def _write(self, sql: str, params: tuple):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._writer.submit(sql, params, (loop, future))
+        await future
+
+    async def _write_transaction(self, statements: List[Tuple[str, list]]):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._writer.submit_transaction(statements, (loop, future))
+        await future
+
+    def _query_sync(self, sql: str, params: tuple) -> List[dict]:
+        with self._read_lock:
+            return [_decode(row) for row in self._reader.execute(sql, params).fetchall()]
+
+    async def _query(self, sql: str, params: tuple = ()) -> List[dict]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._query_sync, sql, params)
+
+    async def create_session(self, session_id: str, robot_id: str, metadata: dict) -> dict:
+        started_at = time.time()
+        await self._write(
+            "INSERT INTO sessions (id, robot_id, started_at, metadata) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET ended_at = NULL",
+            (session_id, robot_id, started_at, json.dumps(metadata)),
+        )
+        return {"id": session_id, "robot_id": robot_id, "started_at": from_epoch(started_at), "metadata": metadata}
+
+    async def ensure_session(self, session_id: str, robot_id: str, metadata: dict,
+                             started_at: Optional[datetime] = None) -> dict:
+        """Create the session unless it exists (used by bulk ingest, which may resend it)"""
+        await self._write(
+            "INSERT INTO sessions (id, robot_id, started_at, metadata) VALUES (?, ?, ?, ?) ON CONFLICT(id) DO NOTHING",
+            (session_id, robot_id, to_epoch(started_at) if started_at is not None else time.time(), json.dumps(metadata)),
+        )
+        rows = await self._query("SELECT * FROM sessions WHERE id = ?", (session_id,))
+        return rows[0]
+
+    async def end_session(self, session_id: str):
+        self._flush_summaries()
+        await self._write("UPDATE sessions SET ended_at = ? WHERE id = ?", (time.time(), session_id))
+
+    async def get_sessions(self, robot_id: Optional[str] = None, limit: int = 50) -> List[dict]:
+        select = (
+            f"SELECT s.*, {', '.join(f'sm.{name}' for name in SUMMARY_FIELDS + SUMMARY_COUNTS)} "
+            "FROM sessions s LEFT JOIN session_summaries sm ON sm.session_id = s.id"
+        )
+        if robot_id:
+            rows = await self._query(f"{select} WHERE s.robot_id = ? ORDER BY s.started_at DESC LIMIT ?", (robot_id, limit))
+        else:
+            rows = await self._query(f"{select} ORDER BY s.started_at DESC LIMIT ?", (limit,))
+        return [self._with_summary(row) for row in rows]
+
+    def _with_summary(self, row: dict) -> dict:
+        summary = summary_of(row, self._summaries.get(row["id"]))
+        for name in SUMMARY_FIELDS + SUMMARY_COUNTS:
+            row.pop(name, None)
+        return {**row, "failure_count": summary["failure_count"], "summary": summary}
+
+    async def get_session_summary(self, session_id: str) -> Optional[dict]:
+        rows = await self._query("SELECT * FROM session_summaries WHERE session_id = ?", (session_id,))
+        pending = self._summaries.get(session_id)
+        if not rows and pending is None:
+            return None
+        return summary_of(rows[0] if rows else {}, pending)
+
+    def _flush_summaries(self):
+        for session_id, robot_id, summary in self._summaries.drain():
+            self._writer.submit(UPSERT_SUMMARY, (
+                session_id, robot_id,
+                *(getattr(summary, name) for name in SUMMARY_FIELDS),
+                *(json.dumps(getattr(summary, name)) for name in SUMMARY_COUNTS),
+            ))
+
+    def _flush_rollups(self):
+        now = time.time()
+        self._flush_summaries()
+        for width, robot_id, session_id, bucket_start, bucket in self._rollups.drain():
+            fields = bucket.fields()
+            self._writer.submit(UPSERT_ROLLUP, (width, robot_id, session_id, bucket_start,
+                                                *(fields[name] for name in ROLLUP_FIELDS)))
+        self._rollups_flushed_at = time.monotonic()
+
+        if self._rollups_flushed_at - self._rollups_pruned_at >= ROLLUP_PRUNE_S:
+            for width in ROLLUP_LEVELS:
+                if ROLLUP_RETENTION_S[width] is not None:
+                    self._writer.submit("DELETE FROM rollups WHERE width = ? AND bucket < ?",
+                                        (width, now - ROLLUP_RETENTION_S[width]))
+            self._rollups_pruned_at = self._rollups_flushed_at
+
+    async def insert_telemetry(self, session_id: str, robot_id: str, timestamp, data: dict):
+        row = telemetry_row(session_id, robot_id, timestamp, data)
+        self._writer.submit(INSERT_TELEMETRY, row)
+        self._rollups.add_telemetry(robot_id, session_id, row[0], data)
+        self._summaries.add_sample(
+            robot_id, session_id, row[0], channel_value(data, "model_confidence"), channel_value(data, "battery_percent")
+        )
+        if time.monotonic() - self._rollups_flushed_at >= ROLLUP_FLUSH_S:
+            self._flush_rollups()
+
+    async def insert_telemetry_batch(self, batch_id: str, session_id: str, robot_id: str,
+                                     events: List[Tuple[datetime, dict]]) -> bool:
+        """
+        Insert a whole batch in one writer transaction together with its
+        ingest_batches row. Returns False if batch_id was already ingested.
+        """
+        if await self.get_ingest_batch(batch_id) is not None:
+            return False
+        rows = [telemetry_row(session_id, robot_id, ts, data) for ts, data in events]
+        try:
+            await self._write_transaction([
+                ("INSERT INTO ingest_batches (batch_id, session_id, robot_id, events, received_at) VALUES (?, ?, ?, ?, ?)",
+                 [(batch_id, session_id, robot_id, len(rows), time.time())]),
+                (INSERT_TELEMETRY, rows),
+            ])
+        except sqlite3.IntegrityError:
+            # A concurrent retry of the same batch committed first
+            return False
+
+        for row, (_, data) in zip(rows, events):
+            self._rollups.add_telemetry(robot_id, session_id, row[0], data)
+            self._summaries.add_sample(
+                robot_id, session_id, row[0], channel_value(data, "model_confidence"), channel_value(data, "battery_percent")
+            )
+        self._flush_rollups()
+        return True
+
+    async def get_ingest_batch(self, batch_id: str) -> Optional[dict]:
+        rows = await self._query("SELECT * FROM ingest_batches WHERE batch_id = ?", (batch_id,))
+        return rows[0] if rows else None
+
+    async def mark_batch_classified(self, batch_id: str):
+        await self._write("UPDATE ingest_batches SET classified_at = ? WHERE batch_id = ?", (time.time(), batch_id))
+
+    async def get_session_telemetry(self, session_id: str, limit: int = 10000,
+                                    channels: Sequence[str] = DEFAULT_CHANNELS) -> List[dict]:
+        channels = validate_channels(channels)
+        if self.archive and self.archive.has(session_id):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.archive.read_rows, session_id, channels, limit
+            )
+        return await self._query(
+            f"SELECT {', '.join(('time', *channels))} FROM telemetry "
+            "WHERE session_id = ? ORDER BY time ASC LIMIT ?",
+            (session_id, limit),
+        )
+
+    async def iter_session_telemetry(self, session_id: str, start: Optional[datetime] = None,
+                                     end: Optional[datetime] = None, after: Optional[datetime] = None,
+                                     channels: Sequence[str] = DEFAULT_CHANNELS,
+                                     chunk_size: int = 1000, seen: Optional[int] = None) -> AsyncIterator[List[dict]]:
+        channels = validate_channels(channels)
+        if self.archive and self.archive.has(session_id):
+            async for rows in iter_archived_rows(self.archive, session_id, channels, start, end, after,
+                                                 chunk_size=chunk_size, seen=seen):
+                yield rows
+            return
+
+        # Pages resume at (time, rows read at that time), ties in rowid order
+        columns = ", ".join(("time AS raw_time", "time", *channels))
+        upper = to_epoch(end) if end is not None else float("inf")
+        if after is not None:
+            last = to_epoch(after)
+        else:
+            last, seen = (to_epoch(start) if start is not None else float("-inf")), 0
+        while True:
+            rows = await self._query(
+                f"SELECT {columns} FROM telemetry WHERE session_id = ? AND time {'>' if seen is None else '>='} ? "
+                "AND time < ? ORDER BY time ASC, rowid ASC LIMIT ? OFFSET ?",
+                (session_id, last, upper, chunk_size, seen or 0),
+            )
+            if not rows:
+                return
+            last, seen = advance_position(last, seen, [row["raw_time"] for row in rows])
+            for row in rows:
+                del row["raw_time"]
+            yield rows
+
+    async def get_session_columns(self, session_id: str, channels: Sequence[str] = DEFAULT_CHANNELS,
+                                  limit: Optional[int] = None, start: Optional[datetime] = None,
+                                  end: Optional[datetime] = None) -> Dict[str, list]:
+        channels = validate_channels(channels)
+        if self.archive and self.archive.has(session_id):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.archive.read_columns, session_id, channels, limit, start, end
+            )
+        rows = await self._query(
+            f"SELECT {', '.join(('time AS raw_time', *channels))} FROM telemetry "
+            "WHERE session_id = ? AND time >= ? AND time < ? ORDER BY time ASC LIMIT ?",
+            (
+                session_id,
+                to_epoch(start) if start is not None else float("-inf"),
+                to_epoch(end) if end is not None else float("inf"),
+                -1 if limit is None else limit,
+            ),
+        )
+        columns = {"time": [row["raw_time"] for row in rows]}
+        for channel in channels:
+            columns[channel] = [row[channel] for row in rows]
+        return columns
+
+    async def get_session_buckets(self, session_id: str, channels: Sequence[str] = DOWNSAMPLE_CHANNELS,
+                                  points: Optional[int] = None, resolution: Optional[float] = None) -> List[dict]:
+        channels = validate_channels(channels, NUMERIC_CHANNELS)
+        if self.archive and self.archive.has(session_id):
+            columns = await self.get_session_columns(session_id, channels)
+            if not columns["time"]:
+                return []
+            width = bucket_width(columns["time"][0], columns["time"][-1], points, resolution)
+            return await asyncio.get_running_loop().run_in_executor(None, bucket_columns, columns, channels, width)
+
+        bounds = await self._query(
+            "SELECT MIN(time) AS t0, MAX(time) AS t1 FROM telemetry WHERE session_id = ?", (session_id,)
+        )
+        t0, t1 = bounds[0]["t0"], bounds[0]["t1"]
+        if t0 is None:
+            return []
+        width = bucket_width(t0, t1, points, resolution)
+        aggregates = ", ".join(
+            f"MIN({c}) AS {c}_min, MAX({c}) AS {c}_max, AVG({c}) AS {c}_avg" for c in channels
+        )
+        rows = await self._query(
+            f"SELECT CAST((time - ?) / ? AS INTEGER) AS bucket, COUNT(*) AS samples, {aggregates} "
+            "FROM telemetry WHERE session_id = ? GROUP BY bucket ORDER BY bucket",
+            (t0, width, session_id),
+        )
+        return [{"time": from_epoch(t0 + row.pop("bucket") * width), **row} for row in rows]
+
+    async def prune_expired(self) -> int:
+        deleted = 0
+        now = time.time()
+        for table, column, days in (
+            ("telemetry", "time", self.policy.telemetry_retention_days),
+            ("failures", "detected_at", self.policy.failure_retention_days),
+        ):
+            if days is None:
+                continue
+            cutoff = now - days * 86400
+            rows = await self._query(f"SELECT COUNT(*) AS n FROM {table} WHERE {column} < ?", (cutoff,))
+            if rows[0]["n"]:
+                if table == "failures":
+                    self._writer.submit("DELETE FROM failure_joints WHERE detected_at < ?", (cutoff,))
+                    self._writer.submit(
+                        "DELETE FROM failure_clips WHERE failure_id IN (SELECT id FROM failures WHERE detected_at < ?)",
+                        (cutoff,),
+                    )
+                await self._write(f"DELETE FROM {table} WHERE {column} < ?", (cutoff,))
+                deleted += rows[0]["n"]
+        return deleted
+
+    async def get_sessions_to_archive(self, ended_before: datetime, limit: int = 100) -> List[dict]:
+        return await self._query(
+            "SELECT * FROM sessions WHERE ended_at < ? AND archived_at IS NULL ORDER BY ended_at LIMIT ?",
+            (to_epoch(ended_before), limit),
+        )
+
+    async def export_session_telemetry(self, session_id: str, chunk_size: int = 5000) -> AsyncIterator[List[dict]]:
+        columns = ", ".join(("rowid", "time AS raw_time", "time", *STORED_CHANNELS))
+        last = (float("-inf"), 0)
+        while True:
+            rows = await self._query(
+                f"SELECT {columns} FROM telemetry WHERE session_id = ? AND (time, rowid) > (?, ?) "
+                "ORDER BY time, rowid LIMIT ?",
+                (session_id, last[0], last[1], chunk_size),
+            )
+            if not rows:
+                return
+            last = (rows[-1]["raw_time"], rows[-1]["rowid"])
+            for row in rows:
+                del row["rowid"], row["raw_time"]
+            yield rows
+
+    async def mark_session_archived(self, session_id: str):
+        self._writer.submit("UPDATE sessions SET archived_at = ? WHERE id = ?", (time.time(), session_id))
+        await self._write("DELETE FROM telemetry WHERE session_id = ?", (session_id,))
+
+    async def insert_failure(self, failure: dict) -> dict:
+        failure["id"] = str(uuid.uuid4())
+        epoch = to_epoch(failure.get("detected_at") or from_epoch(time.time()))
+        self._rollups.add_failure(failure["robot_id"], failure["session_id"], epoch)
+        self._summaries.add_failure(
+            failure["robot_id"], failure["session_id"], failure["failure_type"], failure["severity"], epoch
+        )
+        # Failures are rare, so their summary delta is written in the same batch
+        self._flush_summaries()
+        for joint in failure_joints(failure):
+            self._writer.submit("INSERT OR IGNORE INTO failure_joints (joint, detected_at, failure_id) VALUES (?, ?, ?)",
+                                (joint, epoch, failure["id"]))
+        await self._write(
+            "INSERT INTO failures (id, session_id, robot_id, detected_at, failure_type, severity, confidence, "
+            "summary, detail, affected_components, classifier_data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                failure["id"], failure["session_id"], failure["robot_id"], epoch,
+                failure["failure_type"], failure["severity"], failure.get("confidence"),
+                failure["summary"], failure.get("detail"),
+                json.dumps(failure.get("affected_components") or {}),
+                json.dumps(failure.get("classifier_data") or {}),
+            ),
+        )
+        return failure
+
+    async def update_failure(self, failure_id: str, fields: dict):
+        """Write a closing episode's fields onto its failure row"""
+        fields = {name: value for name, value in fields.items() if name in FAILURE_UPDATE_FIELDS}
+        params = []
+        for name, value in fields.items():
+            if name == "ended_at":
+                value = to_epoch(value)
+            elif name in FAILURE_JSON_COLUMNS:
+                value = json.dumps(value or {})
+            params.append(value)
+        statements = [(
+            f"UPDATE failures SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+            [(*params, failure_id)],
+        )]
+        joints = failure_joints(fields)
+        if joints:
+            statements.append((
+                "INSERT OR IGNORE INTO failure_joints (joint, detected_at, failure_id) "
+                "SELECT ?, detected_at, id FROM failures WHERE id = ?",
+                [(joint, failure_id) for joint in joints],
+            ))
+        await self._write_transaction(statements)
+
+    async def get_rollups(self, start: float, end: float, resolution: float, robot_id: Optional[str] = None,
+                          session_id: Optional[str] = None) -> Tuple[int, List[dict]]:
+        width = choose_level(start, end, resolution, time.time())
+        resolution = max(resolution, width)
+        conditions, params = ["width = ?", "bucket >= ?", "bucket < ?"], [width, start - start % width, end]
+        if robot_id:
+            conditions.append("robot_id = ?")
+            params.append(robot_id)
+        if session_id:
+            conditions.append("session_id = ?")
+            params.append(session_id)
+        rows = await self._query(
+            f"SELECT CAST(bucket / ? AS INTEGER) * ? AS slot, {rollup_aggregates()} FROM rollups "
+            f"WHERE {' AND '.join(conditions)} GROUP BY slot ORDER BY slot",
+            (resolution, resolution, *params),
+        )
+        return width, merge_rows([(row["slot"], RollupBucket.from_fields(row)) for row in rows], resolution)
+
+    async def save_failure_clip(self, failure_ids: List[str], clip: bytes):
+        for failure_id in failure_ids:
+            self._writer.submit(
+                "INSERT INTO failure_clips (failure_id, clip) VALUES (?, ?) "
+                "ON CONFLICT(failure_id) DO UPDATE SET clip = excluded.clip",
+                (failure_id, clip),
+            )
+
+    async def get_failure_clip(self, failure_id: str) -> Optional[bytes]:
+        rows = await self._query("SELECT clip FROM failure_clips WHERE failure_id = ?", (failure_id,))
+        return rows[0]["clip"] if rows else None
+
+    async def get_failures(self, robot_id: Optional[str] = None, limit: int = 100) -> List[dict]:
+        failures, _ = await self.search_failures(FailureQuery(robot_id=robot_id), limit=limit)
+        return failures
+
+    async def search_failures(self, query: FailureQuery, cursor: Optional[str] = None,
+                              limit: int = 100) -> Tuple[List[dict], Optional[str]]:
+        conditions, params = [], []
+        for column, value in (
+            ("robot_id", query.robot_id), ("session_id", query.session_id),
+            ("failure_type", query.failure_type), ("severity", query.severity),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if query.acknowledged is not None:
+            conditions.append("acknowledged = ?")
+            params.append(int(query.acknowledged))
+        if query.joint is not None:
+            conditions.append("id IN (SELECT failure_id FROM failure_joints WHERE joint = ?)")
+            params.append(query.joint)
+        if query.start is not None:
+            conditions.append("detected_at >= ?")
+            params.append(to_epoch(query.start))
+        if query.end is not None:
+            conditions.append("detected_at < ?")
+            params.append(to_epoch(query.end))
+        if cursor is not None:
+            conditions.append("(detected_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = await self._query(
+            f"SELECT * FROM failures {where}ORDER BY detected_at DESC, id DESC LIMIT ?", (*params, limit + 1)
+        )
+        failures = rows[:limit]
+        next_cursor = encode_cursor(failures[-1]["detected_at"], failures[-1]["id"]) if len(rows) > limit else None
+        return failures, next_cursor
@@ -0,0 +1,149 @@
+"""Per-session summaries maintained on the write path"""
+
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from db.channels import from_epoch, to_epoch
+
+# Scalar summary fields, in the column order used by the SQL backends
+SUMMARY_FIELDS = (
+    "samples", "failures", "confidence_min",
+    "battery_start", "battery_end", "first_seen", "last_seen",
+)
+SUMMARY_COUNTS = ("failures_by_type", "failures_by_severity")
+
+
+def merge_counts(a: Optional[dict], b: Optional[dict]) -> dict:
+    merged = dict(a or {})
+    for key, count in (b or {}).items():
+        merged[key] = merged.get(key, 0) + count
+    return merged
+
+
+class SessionSummary:
+    """
+    Running summary of one session. Samples must arrive in time order, which
+    is how agents send them. Two summaries of consecutive stretches of the
+    same session merge into the summary of the whole.
+    """
+
+    __slots__ = SUMMARY_FIELDS + SUMMARY_COUNTS
+
+    def __init__(self):
+        self.samples = 0
+        self.failures = 0
+        self.confidence_min = None
+        self.battery_start = None
+        self.battery_end = None
+        self.first_seen = None
+        self.last_seen = None
+        self.failures_by_type: Dict[str, int] = {}
+        self.failures_by_severity: Dict[str, int] = {}
+
+    def _seen(self, epoch: float):
+        if self.first_seen is None or epoch < self.first_seen:
+            self.first_seen = epoch
+        if self.last_seen is None or epoch > self.last_seen:
+            self.last_seen = epoch
+
+    def add_sample(self, epoch: float, confidence: Optional[float] = None, battery: Optional[float] = None):
+        self.samples += 1
+        self._seen(epoch)
+        if confidence is not None and (self.confidence_min is None or confidence < self.confidence_min):
+            self.confidence_min = confidence
+        if battery is not None:
+            if self.battery_start is None:
+                self.battery_start = battery
+            self.battery_end = battery
+
+    def add_failure(self, failure_type: str, severity: str, epoch: Optional[float] = None):
+        self.failures += 1
+        self.failures_by_type[failure_type] = self.failures_by_type.get(failure_type, 0) + 1
+        self.failures_by_severity[severity] = self.failures_by_severity.get(severity, 0) + 1
+        if epoch is not None:
+            self._seen(epoch)
+
+    def merge(self, later: "SessionSummary"):
+        """Fold in the summary of a stretch that follows this one"""
+        self.samples += later.samples
+        self.failures += later.failures
+        if later.confidence_min is not None and (self.confidence_min is None or later.confidence_min < self.confidence_min):
+            self.confidence_min = later.confidence_min
+        if self.battery_start is None:
+            self.battery_start = later.battery_start
+        if later.battery_end is not None:
+            self.battery_end = later.battery_end
+        for epoch in (later.first_seen, later.last_seen):
+            if epoch is not None:
+                self._seen(epoch)
+        self.failures_by_type = merge_counts(self.failures_by_type, later.failures_by_type)
+        self.failures_by_severity = merge_counts(self.failures_by_severity, later.failures_by_severity)
+
+    @classmethod
+    def from_fields(cls, fields: dict) -> "SessionSummary":
+        summary = cls()
+        for name in SUMMARY_FIELDS + SUMMARY_COUNTS:
+            value = fields.get(name)
+            if isinstance(value, datetime):
+                value = to_epoch(value)
+            elif isinstance(value, str) and name in SUMMARY_COUNTS:
+                value = json.loads(value)
+            if value is not None:
+                setattr(summary, name, value)
+        return summary
+
+    def to_dict(self) -> dict:
+        span = None
+        if self.first_seen is not None:
+            span = self.last_seen - self.first_seen
+        return {
+            "samples": self.samples,
+            "failure_count": self.failures,
+            "failures_by_type": dict(self.failures_by_type),
+            "failures_by_severity": dict(self.failures_by_severity),
+            "duration_s": span,
+            "confidence_min": self.confidence_min,
+            "battery_start": self.battery_start,
+            "battery_end": self.battery_end,
+            "first_seen": from_epoch(self.first_seen).isoformat() if self.first_seen is not None else None,
+            "last_seen": from_epoch(self.last_seen).isoformat() if self.last_seen is not None else None,
+        }
+
+
+class SummaryStore:
+    """Pending summary deltas per session, drained by backends that persist them"""
+
+    def __init__(self):
+        self.pending: Dict[str, Tuple[str, SessionSummary]] = {}
+
+    def _summary(self, robot_id: str, session_id: str) -> SessionSummary:
+        entry = self.pending.get(session_id)
+        if entry is None:
+            entry = self.pending[session_id] = (robot_id, SessionSummary())
+        return entry[1]
+
+    def add_sample(self, robot_id: str, session_id: str, epoch: float,
+                   confidence: Optional[float] = None, battery: Optional[float] = None):
+        self._summary(robot_id, session_id).add_sample(epoch, confidence, battery)
+
+    def add_failure(self, robot_id: str, session_id: str, failure_type: str, severity: str,
+                    epoch: Optional[float] = None):
+        self._summary(robot_id, session_id).add_failure(failure_type, severity, epoch)
+
+    def get(self, session_id: str) -> Optional[SessionSummary]:
+        entry = self.pending.get(session_id)
+        return entry[1] if entry else None
+
+    def drain(self) -> List[Tuple[str, str, SessionSummary]]:
+        drained = [(session_id, robot_id, summary) for session_id, (robot_id, summary) in self.pending.items()]
+        self.pending = {}
+        return drained
+
+
+def summary_of(record: dict, pending: Optional[SessionSummary] = None) -> dict:
+    """Stored summary columns of a session row plus any not-yet-flushed delta"""
+    summary = SessionSummary.from_fields(record)
+    if pending is not None:
+        summary.merge(pending)
+    return summary.to_dict()
@@ -0,0 +1,100 @@
+"""Fleet aggregator - incremental per-robot summaries for fleet dashboards"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+from live.state import RobotStateCache, robot_states
+
+log = logging.getLogger(__name__)
+
+FLEET_SNAPSHOT_INTERVAL_S = float(os.getenv("FLEET_SNAPSHOT_INTERVAL_S", "1.0"))
+# Connected robots with no telemetry or heartbeat for this long are shown as "stale"
+FLEET_STALE_AFTER_S = float(os.getenv("FLEET_STALE_AFTER_S", "10.0"))
+
+
+class FleetSubscription:
+    """A dashboard's interest in a slice of the fleet (all robots, a prefix or a tag)"""
+
+    def __init__(self, websocket: WebSocket, prefix: Optional[str] = None, tag: Optional[str] = None):
+        self.websocket = websocket
+        self.prefix = prefix
+        self.tag = tag
+
+    def matches(self, robot_id: str, tags: Set[str]) -> bool:
+        if self.prefix and not robot_id.startswith(self.prefix):
+            return False
+        return not self.tag or self.tag in tags
+
+
+class FleetAggregator:
+    """
+    Fans per-robot summaries from the state cache out to fleet subscribers.
+
+    Fleet subscribers get a full snapshot when they subscribe and then, once
+    per interval, only the robots that changed since the previous tick,
+    including robots that have gone quiet for stale_after seconds.
+    """
+
+    def __init__(self, states: RobotStateCache, interval: float = FLEET_SNAPSHOT_INTERVAL_S,
+                 stale_after: float = FLEET_STALE_AFTER_S):
+        self.states = states
+        self.interval = interval
+        self.stale_after = stale_after
+        self._subscriptions: Dict[WebSocket, FleetSubscription] = {}
+
+    def snapshot(self, subscription: FleetSubscription, robot_ids=None) -> List[dict]:
+        robot_ids = [s.robot_id for s in self.states.all()] if robot_ids is None else robot_ids
+        summaries = []
+        for robot_id in robot_ids:
+            state = self.states.get(robot_id)
+            if state is not None and subscription.matches(robot_id, state.tags):
+                summaries.append(state.summary())
+        return summaries
+
+    async def subscribe(self, websocket: WebSocket, prefix: Optional[str] = None, tag: Optional[str] = None):
+        subscription = FleetSubscription(websocket, prefix, tag)
+        self._subscriptions[websocket] = subscription
+        await websocket.send_text(json.dumps({
+            "type": "fleet_snapshot",
+            "full": True,
+            "robots": self.snapshot(subscription),
+        }))
+
+    def unsubscribe(self, websocket: WebSocket):
+        self._subscriptions.pop(websocket, None)
+
+    async def flush(self):
+        self.states.mark_stale(self.stale_after)
+        dirty = self.states.drain_dirty()
+        if not dirty or not self._subscriptions:
+            return
+
+        dead = []
+
+        for websocket, subscription in list(self._subscriptions.items()):
+            robots = self.snapshot(subscription, dirty)
+            if not robots:
+                continue
+            try:
+                await websocket.send_text(json.dumps({"type": "fleet_snapshot", "full": False, "robots": robots}))
+            except Exception:
+                dead.append(websocket)
+
+        for websocket in dead:
+            self.unsubscribe(websocket)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"Fleet snapshot failed: {e}")
+
+
+fleet = FleetAggregator(robot_states)
@@ -0,0 +1,124 @@
+"""Failure context clips - telemetry around each failure, cut from the live ingest stream"""
+
+import json
+import os
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from db.channels import JOINT_CHANNELS, NUMERIC_CHANNELS, TEXT_CHANNELS, channel_value, from_epoch, joint_values
+
+CLIP_BEFORE_S = float(os.getenv("CLIP_BEFORE_S", "10"))
+CLIP_AFTER_S = float(os.getenv("CLIP_AFTER_S", "5"))
+# Failures joining an open clip extend it to after_s past themselves, up to this long past the first
+CLIP_MAX_AFTER_S = float(os.getenv("CLIP_MAX_AFTER_S", "60"))
+
+
+@dataclass
+class PendingClip:
+    robot_id: str
+    session_id: str
+    detected_at: float
+    until: float
+    failure_ids: List[str] = field(default_factory=list)
+    frames: List[Tuple[float, dict]] = field(default_factory=list)
+
+
+def encode_clip(clip: PendingClip, before_s: float, after_s: float) -> bytes:
+    """
+    Columnar JSON (epoch times plus one list per stored channel), zlib
+    compressed. Neighbouring samples are similar, so this is a few KB for a
+    15 s window.
+    """
+    columns = {"time": [t for t, _ in clip.frames]}
+    for name in (*NUMERIC_CHANNELS, *TEXT_CHANNELS):
+        columns[name] = [channel_value(data, name) for _, data in clip.frames]
+    for name in JOINT_CHANNELS:
+        columns[name] = [joint_values(data, name) for _, data in clip.frames]
+    body = {
+        "robot_id": clip.robot_id,
+        "session_id": clip.session_id,
+        "detected_at": from_epoch(clip.detected_at).isoformat(),
+        "failure_ids": clip.failure_ids,
+        "before_s": before_s,
+        "after_s": after_s,
+        "samples": len(clip.frames),
+        "columns": columns,
+    }
+    return zlib.compress(json.dumps(body, separators=(",", ":")).encode(), 6)
+
+
+def decode_clip(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob))
+
+
+class ClipRecorder:
+    """
+    Keeps the last before_s seconds of frames per robot. A failure opens a
+    clip seeded with that history, which keeps collecting frames until
+    after_s past the failure and is then handed back for storage. Failures
+    that fire while a clip for the same robot is still open join it instead
+    of copying the history again, and extend it to after_s past themselves,
+    at most max_after_s past the clip's first failure.
+    Finished clips are returned unencoded; encode() is the CPU-bound part.
+    """
+
+    def __init__(self, before_s: float = CLIP_BEFORE_S, after_s: float = CLIP_AFTER_S,
+                 max_after_s: float = CLIP_MAX_AFTER_S):
+        self.before_s = before_s
+        self.after_s = after_s
+        self.max_after_s = max(max_after_s, after_s)
+        self._history: Dict[str, Deque[Tuple[float, dict]]] = {}
+        self._open: Dict[str, PendingClip] = {}
+
+    def add_frame(self, robot_id: str, epoch: float, data: dict) -> List[PendingClip]:
+        """Record a frame; returns every clip it completes"""
+        history = self._history.get(robot_id)
+        if history is None:
+            history = self._history[robot_id] = deque()
+        history.append((epoch, data))
+        while history and history[0][0] < epoch - self.before_s:
+            history.popleft()
+
+        clip = self._open.get(robot_id)
+        if clip is None:
+            return []
+        if epoch > clip.until:
+            return self.close(robot_id)
+        clip.frames.append((epoch, data))
+        return []
+
+    def failure(self, robot_id: str, session_id: str, failure_id: str, epoch: float):
+        """Open (or join) a clip; call after add_frame for the frame that failed"""
+        clip = self._open.get(robot_id)
+        if clip is not None:
+            clip.failure_ids.append(failure_id)
+            clip.until = max(clip.until, min(epoch + self.after_s, clip.detected_at + self.max_after_s))
+            return
+        self._open[robot_id] = PendingClip(
+            robot_id, session_id, epoch, epoch + self.after_s, [failure_id], list(self._history.get(robot_id, ()))
+        )
+
+    def close(self, robot_id: str) -> List[PendingClip]:
+        """Finish the robot's open clip early, e.g. when its session ends"""
+        clip = self._open.pop(robot_id, None)
+        if clip is None:
+            return []
+        return [clip]
+
+    def encode(self, clip: PendingClip) -> bytes:
+        return encode_clip(clip, self.before_s, clip.until - clip.detected_at)
+
+    def forget(self, robot_id: str):
+        self._history.pop(robot_id, None)
+
+    def pending(self, failure_id: str) -> Optional[dict]:
+        """A clip that is still collecting, decoded, so it can be served before it is stored"""
+        for clip in self._open.values():
+            if failure_id in clip.failure_ids:
+                return decode_clip(self.encode(clip))
+        return None
+
+
+clips = ClipRecorder()
@@ -0,0 +1,153 @@
+"""Last-known state per robot, maintained on the ingest path"""
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Sequence, Set
+
+from db.channels import to_epoch
+from db.summaries import SessionSummary
+
+MAX_OPEN_FAILURES = 20
+
+
+@dataclass
+class RobotState:
+    robot_id: str
+    status: str = "online"
+    session_id: Optional[str] = None
+    tags: Set[str] = field(default_factory=set)
+    telemetry: Optional[dict] = None
+    active_failure: Optional[dict] = None
+    open_failures: Deque[dict] = field(default_factory=lambda: deque(maxlen=MAX_OPEN_FAILURES))
+    last_seen: Optional[str] = None
+    last_heartbeat: Optional[dict] = None
+    # Monotonic time of the last telemetry frame or heartbeat, for staleness
+    received_at: float = field(default_factory=time.monotonic)
+    session_summary: SessionSummary = field(default_factory=SessionSummary)
+
+    def summary(self) -> dict:
+        telemetry = self.telemetry or {}
+        return {
+            "robot_id": self.robot_id,
+            "status": self.status,
+            "session_id": self.session_id,
+            "battery_percent": telemetry.get("battery_percent"),
+            "model_confidence": telemetry.get("model_confidence"),
+            "active_failure": self.active_failure,
+            "last_seen": self.last_seen,
+            "session": self.session_summary.to_dict(),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "robot_id": self.robot_id,
+            "status": self.status,
+            "session_id": self.session_id,
+            "tags": sorted(self.tags),
+            "telemetry": self.telemetry,
+            "active_failure": self.active_failure,
+            "open_failures": list(self.open_failures),
+            "last_seen": self.last_seen,
+            "last_heartbeat": self.last_heartbeat,
+            "session": self.session_summary.to_dict(),
+        }
+
+
+class RobotStateCache:
+    """
+    In-memory last-known state for every robot seen since startup.
+
+    Updates are O(1) and record the robot as changed so the fleet aggregator
+    can fan out only what moved since its previous tick.
+    """
+
+    def __init__(self):
+        self._robots: Dict[str, RobotState] = {}
+        self._dirty: Set[str] = set()
+
+    def _state(self, robot_id: str, changed: bool = True) -> RobotState:
+        state = self._robots.get(robot_id)
+        if state is None:
+            state = self._robots[robot_id] = RobotState(robot_id)
+        if changed:
+            self._dirty.add(robot_id)
+        return state
+
+    def get(self, robot_id: str) -> Optional[RobotState]:
+        return self._robots.get(robot_id)
+
+    def all(self) -> List[RobotState]:
+        return list(self._robots.values())
+
+    def drain_dirty(self) -> Set[str]:
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def mark_stale(self, after: float, now: Optional[float] = None) -> List[str]:
+        """Mark connected robots silent for `after` seconds as "stale"; returns their ids"""
+        now = time.monotonic() if now is None else now
+        stale = []
+        for state in self._robots.values():
+            if state.status in ("online", "failure") and now - state.received_at >= after:
+                state.status = "stale"
+                self._dirty.add(state.robot_id)
+                stale.append(state.robot_id)
+        return stale
+
+    def session_started(self, robot_id: str, session_id: str, metadata: dict):
+        state = self._state(robot_id)
+        state.session_id = session_id
+        state.status = "online"
+        state.received_at = time.monotonic()
+        state.tags = set(metadata.get("tags") or [])
+        state.open_failures.clear()
+        state.session_summary = SessionSummary()
+
+    def session_ended(self, robot_id: str):
+        state = self._state(robot_id)
+        state.status = "offline"
+        state.active_failure = None
+
+    def update_telemetry(self, robot_id: str, timestamp: datetime, telemetry: dict,
+                         opened: Sequence[dict] = (), ongoing: Optional[dict] = None):
+        """`opened` are the failures that started with this frame; `ongoing` the most severe still open"""
+        state = self._state(robot_id)
+        state.telemetry = telemetry
+        state.last_seen = timestamp.isoformat()
+        state.active_failure = ongoing or (opened[0] if opened else None)
+        state.status = "failure" if state.active_failure else "online"
+        state.received_at = time.monotonic()
+        epoch = to_epoch(timestamp)
+        state.session_summary.add_sample(epoch, telemetry.get("model_confidence"), telemetry.get("battery_percent"))
+        for failure in opened:
+            state.open_failures.appendleft(failure)
+            state.session_summary.add_failure(failure["failure_type"], failure["severity"], epoch)
+
+    def failure_closed(self, robot_id: str, failure_id: str):
+        """Drop a failure whose episode has closed from the robot's open failures"""
+        state = self._robots.get(robot_id)
+        if state is None:
+            return
+        for failure in state.open_failures:
+            if failure.get("id") == failure_id:
+                state.open_failures.remove(failure)
+                self._dirty.add(robot_id)
+                break
+        if state.active_failure and state.active_failure.get("id") == failure_id:
+            state.active_failure = None
+            if state.status == "failure":
+                state.status = "online"
+
+    def heartbeat(self, robot_id: str, timestamp: datetime, data: dict):
+        state = self._state(robot_id, changed=False)
+        state.last_heartbeat = {"timestamp": timestamp.isoformat(), **data}
+        state.received_at = time.monotonic()
+        if state.status == "stale":
+            # Alive again, though nothing else about it changed
+            state.status = "failure" if state.active_failure else "online"
+            self._dirty.add(robot_id)
+
+
+robot_states = RobotStateCache()
@@ -3,16 +3,38 @@
 import asyncio
 import json
 import logging
+import os
+import time
 import uuid
+import zlib
 from datetime import datetime
-from typing import Dict, Optional, Set
+from typing import Dict, List, Optional, Set, Tuple
 
 import uvicorn
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 
+from db.archive import run_tiering
+from db.cache import query_cache
+from db.channels import (
+    advance_position, decode_telemetry_cursor, encode_telemetry_cursor, parse_channels, project_columns, project_rows,
+    source_channels, to_epoch,
+)
+from db.columnar import MEDIA_TYPE as COLUMNAR_MEDIA_TYPE, encode_columns
 from db.client import db
-from classifier.classifier import classifier, FailureResult
+from db.downsample import DOWNSAMPLE_CHANNELS, DOWNSAMPLE_MODES, lttb_rows
+from db.failures import FailureQuery
+from db.policies import run_retention
+from db.rollups import ROLLUP_DEFAULT_POINTS
+from classifier.classifier import classifier, rulebook, FailureClassifier, FailureResult
+from classifier.detectors import detectors
+from classifier.episodes import Episode, EpisodeTracker, episodes
+from classifier.rules import watch_rules
+from classifier.state import CLASSIFIER_STATE_PATH, run_eviction, run_snapshots
+from live.aggregator import fleet
+from live.clips import PendingClip, clips, decode_clip
+from live.state import robot_states
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [SERVER] %(message)s")
 log = logging.getLogger(__name__)
@@ -26,20 +48,114 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+INGEST_MAX_EVENTS = int(os.getenv("INGEST_MAX_EVENTS", "100000"))
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(64 * 1024 * 1024)))
+
+TELEMETRY_FORMATS = ("json", "ndjson", "columnar", "binary")
+
+# "lazy" rehydrates each robot's saved classifier state on its first frame, "eager" at startup
+CLASSIFIER_STATE_RESTORE = os.getenv("CLASSIFIER_STATE_RESTORE", "lazy")
+
+# Backfilled sessions that send nothing for this long lose their classifier state and open episodes
+BACKFILL_IDLE_S = float(os.getenv("BACKFILL_IDLE_S", "600"))
+
 dashboard_connections: Dict[str, Set[WebSocket]] = {}
+# Backfilled sessions are classified apart from live traffic, keyed per session
+backfill_classifier = FailureClassifier(rulebook)
+backfill_episodes = EpisodeTracker()
+# Last batch per backfill key (monotonic), and batches being classified right now
+backfill_seen: Dict[str, float] = {}
+classifying: Set[str] = set()
+background_tasks: Set[asyncio.Task] = set()
 
 
 @app.on_event("startup")
 async def startup():
     await db.connect()
+    detectors.load()
+    background_tasks.add(asyncio.create_task(fleet.run()))
+    if detectors.expensive:
+        background_tasks.add(asyncio.create_task(detectors.run()))
+    if db.archive:
+        background_tasks.add(asyncio.create_task(run_tiering(db)))
+    if db.policy.has_retention:
+        background_tasks.add(asyncio.create_task(run_retention(db)))
+    if rulebook.path:
+        background_tasks.add(asyncio.create_task(watch_rules(rulebook)))
+    background_tasks.add(asyncio.create_task(run_eviction(classifier.state)))
+    background_tasks.add(asyncio.create_task(expire_backfills()))
+    if CLASSIFIER_STATE_PATH:
+        restored = classifier.state.load(CLASSIFIER_STATE_PATH, eager=CLASSIFIER_STATE_RESTORE == "eager")
+        log.info(f"Restored classifier state for {restored} robots")
+        background_tasks.add(asyncio.create_task(run_snapshots(classifier.state, CLASSIFIER_STATE_PATH)))
     log.info("RobotBlackBox server started")
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    detectors.close()
+    if CLASSIFIER_STATE_PATH:
+        classifier.state.save(CLASSIFIER_STATE_PATH)
     await db.disconnect()
 
 
+async def open_episode(episode: Episode, live: bool = True):
+    """Store the failure row for a newly opened episode"""
+    record = await db.insert_failure(episode.record())
+    episode.failure_id = str(record["id"])
+    query_cache.invalidate("failures", episode.robot_id)
+    query_cache.invalidate("sessions", episode.robot_id)
+    if live:
+        clips.failure(episode.robot_id, episode.session_id, episode.failure_id, episode.started_at)
+
+
+async def close_episode(episode: Episode, live: bool = True):
+    """Write duration and peak values onto the episode's row"""
+    await db.update_failure(episode.failure_id, episode.closing())
+    query_cache.invalidate("failures", episode.robot_id)
+    if live:
+        robot_states.failure_closed(episode.robot_id, episode.failure_id)
+        await broadcast_to_dashboards(episode.robot_id, {
+            "type": "failure_closed",
+            "robot_id": episode.robot_id,
+            "failure": {**episode.alert(), "duration_s": episode.duration_s, "frames": episode.frames},
+        })
+
+
+async def track_episodes(robot_id: str, session_id: str, epoch: float, result: FailureResult) -> List[Episode]:
+    """Feed one result to the live episode tracker, storing and alerting what it opens or closes"""
+    opened, closed = episodes.step(robot_id, session_id, epoch, result)
+    for episode in closed:
+        await close_episode(episode)
+    for episode in opened:
+        log.warning(f"[{robot_id}] FAILURE: {episode.failure_type} | {episode.result.summary}")
+        await open_episode(episode)
+        await broadcast_to_dashboards(robot_id, {
+            "type": "failure",
+            "robot_id": robot_id,
+            "failure": episode.alert(),
+        })
+    return opened
+
+
+def store_clips(finished: List[PendingClip]):
+    """Encode and save finished clips off the ingest loop"""
+    for clip in finished:
+        task = asyncio.create_task(save_clip(clip))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+
+async def save_clip(clip: PendingClip):
+    try:
+        blob = await asyncio.get_running_loop().run_in_executor(None, clips.encode, clip)
+        await db.save_failure_clip(clip.failure_ids, blob)
+    except Exception as e:
+        log.error(f"Saving the clip of failure(s) {clip.failure_ids} failed: {e}")
+
+
 @app.websocket("/ws/agent/{robot_id}")
 async def agent_websocket(websocket: WebSocket, robot_id: str):
     await websocket.accept()
@@ -55,55 +171,45 @@ async def agent_websocket(websocket: WebSocket, robot_id: str):
                 if event_type == "session_start":
                     session_id = event["session_id"]
                     await db.create_session(session_id, robot_id, event.get("metadata", {}))
+                    robot_states.session_started(robot_id, session_id, event.get("metadata", {}))
+                    classifier.assign_model(robot_id, event.get("metadata", {}).get("robot_model"))
+                    query_cache.invalidate("sessions", robot_id)
                     log.info(f"Session started: {session_id}")
                 
                 elif event_type == "telemetry" and session_id:
                     ts = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00"))
                     data = event.get("data", {})
+                    epoch = to_epoch(ts)
                     
                     await db.insert_telemetry(session_id, robot_id, ts, data)
+                    store_clips(clips.add_frame(robot_id, epoch, data))
                     
                     result: FailureResult = classifier.classify(robot_id, data)
+                    opened = await track_episodes(robot_id, session_id, epoch, result)
+                    # Plug-in detectors; expensive ones report what their last batch found
+                    for found in detectors.observe(robot_id, epoch, data):
+                        opened += await track_episodes(robot_id, session_id, epoch, found)
+                    ongoing = episodes.current(robot_id)
                     
-                    if result.is_failure:
-                        log.warning(f"[{robot_id}] FAILURE: {result.failure_type} | {result.summary}")
-                        
-                        failure_record = await db.insert_failure({
-                            "session_id": session_id,
-                            "robot_id": robot_id,
-                            "detected_at": ts,
-                            "failure_type": result.failure_type,
-                            "severity": result.severity,
-                            "confidence": result.confidence,
-                            "summary": result.summary,
-                            "detail": result.detail,
-                            "affected_components": result.affected_components,
-                            "classifier_data": result.classifier_data,
-                        })
-                        
-                        await broadcast_to_dashboards(robot_id, {
-                            "type": "failure",
-                            "robot_id": robot_id,
-                            "failure": {
-                                "id": str(failure_record["id"]),
-                                "failure_type": result.failure_type,
-                                "severity": result.severity,
-                                "summary": result.summary,
-                                "timestamp": ts.isoformat(),
-                            }
-                        })
-                    
-                    await broadcast_to_dashboards(robot_id, {
+                    telemetry = {
                         "type": "telemetry",
                         "robot_id": robot_id,
                         "timestamp": ts.isoformat(),
                         "model_confidence": data.get("model", {}).get("action_confidence"),
                         "battery_percent": data.get("system", {}).get("battery_percent"),
                         "task_phase": data.get("task", {}).get("phase"),
-                    })
+                    }
+                    robot_states.update_telemetry(
+                        robot_id, ts, telemetry,
+                        [episode.alert() for episode in opened],
+                        ongoing.alert() if ongoing else None,
+                    )
+                    
+                    await broadcast_to_dashboards(robot_id, telemetry)
                 
                 elif event_type == "heartbeat":
-                    pass
+                    ts = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00"))
+                    robot_states.heartbeat(robot_id, ts, event.get("data", {}))
                     
             except json.JSONDecodeError:
                 log.error(f"Invalid JSON from {robot_id}")
@@ -114,7 +220,14 @@ async def agent_websocket(websocket: WebSocket, robot_id: str):
         log.info(f"Agent disconnected: {robot_id}")
     finally:
         if session_id:
+            for episode in episodes.close_all(robot_id):
+                await close_episode(episode)
+            store_clips(clips.close(robot_id))
+            clips.forget(robot_id)
+            detectors.forget(robot_id)
             await db.end_session(session_id)
+            robot_states.session_ended(robot_id)
+            query_cache.invalidate("sessions", robot_id)
 
 
 @app.websocket("/ws/dashboard")
@@ -133,9 +246,17 @@ async def dashboard_websocket(websocket: WebSocket):
                         dashboard_connections[robot_id] = set()
                     dashboard_connections[robot_id].add(websocket)
                     await websocket.send_text(json.dumps({"type": "subscribed", "robot_id": robot_id}))
+                    state = robot_states.get(robot_id)
+                    if state is not None:
+                        await websocket.send_text(json.dumps({"type": "snapshot", "robot_id": robot_id, "state": state.to_dict()}))
+            elif msg.get("type") == "subscribe_fleet":
+                await fleet.subscribe(websocket, prefix=msg.get("prefix"), tag=msg.get("tag"))
+            elif msg.get("type") == "unsubscribe_fleet":
+                fleet.unsubscribe(websocket)
     except WebSocketDisconnect:
         pass
     finally:
+        fleet.unsubscribe(websocket)
         for robot_id in subscribed_robots:
             if robot_id in dashboard_connections:
                 dashboard_connections[robot_id].discard(websocket)
@@ -164,22 +285,387 @@ async def health():
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
 
 
+@app.get("/api/robots")
+async def list_robots():
+    return {"robots": [state.to_dict() for state in robot_states.all()]}
+
+
+@app.get("/api/robots/{robot_id}")
+async def get_robot(robot_id: str):
+    state = robot_states.get(robot_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Robot not seen since server start")
+    return state.to_dict()
+
+
 @app.get("/api/sessions")
 async def list_sessions(robot_id: Optional[str] = None, limit: int = 50):
-    sessions = await db.get_sessions(robot_id=robot_id, limit=limit)
+    sessions = await query_cache.get(
+        "sessions", robot_id, (limit,), lambda: db.get_sessions(robot_id=robot_id, limit=limit)
+    )
     return {"sessions": sessions}
 
 
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+async def _telemetry_page(session_id: str, channels, start, end, cursor, limit: int):
+    rows = []
+    after, seen = cursor or (None, None)
+    pages = db.iter_session_telemetry(
+        session_id, start=start, end=end, after=after, seen=seen, channels=source_channels(channels),
+        chunk_size=min(limit, 1000)
+    )
+    try:
+        async for chunk in pages:
+            rows.extend(project_rows(chunk[:limit - len(rows)], channels))
+            if len(rows) >= limit:
+                break
+    finally:
+        await pages.aclose()
+    next_cursor = None
+    if len(rows) >= limit:
+        # The cursor counts the rows read at the last timestamp, so rows sharing it are not skipped
+        if after is not None:
+            last = to_epoch(after)
+        else:
+            last, seen = (to_epoch(start) if start is not None else None), 0
+        last, seen = advance_position(last, seen, [to_epoch(row["time"]) for row in rows])
+        next_cursor = encode_telemetry_cursor(rows[-1]["time"], seen)
+    return rows, next_cursor
+
+
+async def _telemetry_lines(session_id: str, channels, start, end, cursor, limit: int):
+    sent = 0
+    after, seen = cursor or (None, None)
+    pages = db.iter_session_telemetry(
+        session_id, start=start, end=end, after=after, seen=seen, channels=source_channels(channels)
+    )
+    try:
+        async for chunk in pages:
+            chunk = project_rows(chunk[:limit - sent], channels)
+            sent += len(chunk)
+            yield "".join(json.dumps(row, default=_isoformat) + "\n" for row in chunk)
+            if sent >= limit:
+                break
+    finally:
+        await pages.aclose()
+
+
 @app.get("/api/sessions/{session_id}/telemetry")
-async def get_session_telemetry(session_id: str, limit: int = 5000):
-    telemetry = await db.get_session_telemetry(session_id, limit=limit)
-    return {"session_id": session_id, "telemetry": telemetry}
+async def get_session_telemetry(
+    session_id: str,
+    limit: int = 5000,
+    points: Optional[int] = None,
+    resolution: Optional[float] = None,
+    mode: str = "minmax",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    format: str = "json",
+    channels: Optional[str] = None,
+):
+    if format not in TELEMETRY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(TELEMETRY_FORMATS)}")
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail="limit must be > 0")
+    try:
+        projection = parse_channels(channels)
+        if cursor is not None:
+            cursor = decode_telemetry_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if points is None and resolution is None:
+        if format in ("columnar", "binary"):
+            if cursor is not None:
+                raise HTTPException(status_code=400, detail="cursor is not supported for columnar formats; use start")
+            columns = await db.get_session_columns(
+                session_id, source_channels(projection), limit=limit, start=start, end=end
+            )
+            columns = project_columns(columns, projection)
+            if format == "binary":
+                body = await asyncio.get_running_loop().run_in_executor(
+                    None, lambda: encode_columns(columns, projection, session_id=session_id)
+                )
+                return Response(content=body, media_type=COLUMNAR_MEDIA_TYPE)
+            return {"session_id": session_id, "rows": len(columns["time"]), "columns": columns}
+        if format == "ndjson":
+            return StreamingResponse(
+                _telemetry_lines(session_id, projection, start, end, cursor, limit), media_type="application/x-ndjson"
+            )
+        if start is None and end is None and cursor is None:
+            telemetry = await db.get_session_telemetry(session_id, limit=limit, channels=source_channels(projection))
+            return {"session_id": session_id, "telemetry": project_rows(telemetry, projection)}
+        telemetry, next_cursor = await _telemetry_page(session_id, projection, start, end, cursor, limit)
+        return {"session_id": session_id, "telemetry": telemetry, "next_cursor": next_cursor}
+    
+    if mode not in DOWNSAMPLE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(DOWNSAMPLE_MODES)}")
+    if (points is not None and points < 3) or (resolution is not None and resolution <= 0):
+        raise HTTPException(status_code=400, detail="points must be >= 3 and resolution > 0")
+    
+    if mode == "minmax":
+        try:
+            telemetry = await db.get_session_buckets(
+                session_id, parse_channels(channels, DOWNSAMPLE_CHANNELS), points=points, resolution=resolution
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        wanted = tuple(dict.fromkeys((*projection, "model_confidence")))
+        columns = project_columns(await db.get_session_columns(session_id, source_channels(wanted)), wanted)
+        telemetry = await asyncio.get_running_loop().run_in_executor(
+            None, lttb_rows, columns, projection, "model_confidence", points, resolution
+        )
+    return {"session_id": session_id, "mode": mode, "telemetry": telemetry}
+
+
+@app.get("/api/rollups")
+async def get_rollups(
+    robot_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[float] = None,
+):
+    end_s = to_epoch(end) if end else time.time()
+    start_s = to_epoch(start) if start else end_s - 3600
+    if start_s >= end_s:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    resolution = resolution or max((end_s - start_s) / ROLLUP_DEFAULT_POINTS, 1.0)
+    
+    level, rollups = await db.get_rollups(start_s, end_s, resolution, robot_id=robot_id, session_id=session_id)
+    return {"level_s": level, "resolution_s": max(resolution, level), "rollups": rollups}
 
 
 @app.get("/api/failures")
-async def list_failures(robot_id: Optional[str] = None, limit: int = 100):
-    failures = await db.get_failures(robot_id=robot_id, limit=limit)
-    return {"failures": failures}
+async def list_failures(
+    robot_id: Optional[str] = None,
+    limit: int = 100,
+    session_id: Optional[str] = None,
+    failure_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    acknowledged: Optional[bool] = None,
+    joint: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+):
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail="limit must be > 0")
+    query = FailureQuery(
+        robot_id=robot_id, session_id=session_id, failure_type=failure_type, severity=severity,
+        acknowledged=acknowledged, joint=joint, start=start, end=end,
+    )
+    try:
+        failures, next_cursor = await query_cache.get(
+            "failures", robot_id, (query, cursor, limit), lambda: db.search_failures(query, cursor=cursor, limit=limit)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"failures": failures, "next_cursor": next_cursor}
+
+
+def _decode_batch(body: bytes, encoding: str) -> Tuple[dict, List[Tuple[datetime, dict]]]:
+    """Decompress (gzip/deflate) and validate a bulk ingest body"""
+    if encoding in ("gzip", "deflate") or body[:2] == b"\x1f\x8b":
+        inflater = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        body = inflater.decompress(body, INGEST_MAX_BYTES)
+        if inflater.unconsumed_tail:
+            raise ValueError(f"Batch is larger than {INGEST_MAX_BYTES} bytes uncompressed")
+    elif len(body) > INGEST_MAX_BYTES:
+        raise ValueError(f"Batch is larger than {INGEST_MAX_BYTES} bytes uncompressed")
+    batch = json.loads(body)
+    
+    if not isinstance(batch, dict) or not batch.get("batch_id") or not batch.get("robot_id"):
+        raise ValueError("batch_id and robot_id are required")
+    raw_events = batch.get("events")
+    if not isinstance(raw_events, list) or not raw_events:
+        raise ValueError("events must be a non-empty list")
+    if len(raw_events) > INGEST_MAX_EVENTS:
+        raise ValueError(f"At most {INGEST_MAX_EVENTS} events per batch")
+    
+    events = []
+    for i, event in enumerate(raw_events):
+        try:
+            ts = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00"))
+            data = event["data"]
+        except (KeyError, TypeError, AttributeError, ValueError):
+            raise ValueError(f"Event {i} needs an ISO timestamp and a data object")
+        if not isinstance(data, dict):
+            raise ValueError(f"Event {i} needs an ISO timestamp and a data object")
+        events.append((ts, data))
+    events.sort(key=lambda event: to_epoch(event[0]))
+    return batch, events
+
+
+@app.post("/api/sessions/{session_id}/ingest")
+async def ingest_batch(session_id: str, request: Request):
+    """
+    Bulk ingest for backfill: one gzip-compressed JSON batch of
+    {"batch_id", "robot_id", "metadata"?, "end_session"?, "events": [{"timestamp", "data"}]}.
+    Rows go through the backend's bulk path and are classified without any
+    live broadcast. Re-sending a batch_id is a no-op that reports duplicate,
+    unless its rows were committed but its classification never finished:
+    then the retry classifies it, keeping the failures already stored.
+    """
+    body = await request.body()
+    try:
+        batch, events = await asyncio.get_running_loop().run_in_executor(
+            None, _decode_batch, body, request.headers.get("content-encoding", "")
+        )
+    except (ValueError, zlib.error) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    batch_id, robot_id = str(batch["batch_id"]), batch["robot_id"]
+    await db.ensure_session(session_id, robot_id, batch.get("metadata") or {}, started_at=events[0][0])
+    inserted = await db.insert_telemetry_batch(batch_id, session_id, robot_id, events)
+    key = f"{robot_id}/{session_id}"
+    resumed = not inserted and batch_id not in classifying and await unclassified(batch_id)
+    
+    failures = 0
+    if inserted or resumed:
+        classifying.add(batch_id)
+        try:
+            failures = await classify_backfill(key, batch_id, session_id, robot_id, batch, events, resumed)
+        finally:
+            classifying.discard(batch_id)
+        log.info(f"Ingested batch {batch_id}: {len(events)} events, {failures} failures for session {session_id}")
+    if batch.get("end_session"):
+        await finish_backfill(key)
+        await db.end_session(session_id)
+    query_cache.invalidate("sessions", robot_id)
+    
+    return {
+        "batch_id": batch_id,
+        "session_id": session_id,
+        "duplicate": not inserted,
+        "accepted": len(events) if inserted else 0,
+        "failures": failures,
+        "session": await db.get_session_summary(session_id),
+    }
+
+
+async def unclassified(batch_id: str) -> bool:
+    """Whether a stored batch's rows were committed without its failures being all written"""
+    stored = await db.get_ingest_batch(batch_id)
+    return stored is not None and stored.get("classified_at") is None
+
+
+async def classify_backfill(key: str, batch_id: str, session_id: str, robot_id: str, batch: dict,
+                            events: List[Tuple[datetime, dict]], resumed: bool) -> int:
+    """
+    Classify a committed batch and store its failure episodes, then mark it
+    classified. A resumed batch starts the session's classification afresh
+    and reuses the rows an interrupted attempt already stored for its episodes.
+    """
+    backfill_seen[key] = time.monotonic()
+    stored: Dict[Tuple[float, str], str] = {}
+    if resumed:
+        await finish_backfill(key)
+        stored = await stored_failures(session_id, events[0][0])
+    metadata = batch.get("metadata") or {}
+    backfill_classifier.assign_model(key, metadata.get("robot_model") or rulebook.model_of(robot_id))
+    results = backfill_classifier.classify_batch([(key, data) for _, data in events])
+    failures = 0
+    for (ts, _), result in zip(events, results):
+        opened, closed = backfill_episodes.step(key, session_id, to_epoch(ts), result)
+        for episode in closed:
+            await close_episode(episode, live=False)
+        for episode in opened:
+            # Rows keep the real robot id; the tracker key only separates sessions
+            episode.robot_id = robot_id
+            failure_id = stored.get((round(episode.started_at, 6), episode.failure_type))
+            if failure_id is None:
+                await open_episode(episode, live=False)
+            else:
+                episode.failure_id = failure_id
+            failures += 1
+    await db.mark_batch_classified(batch_id)
+    backfill_seen[key] = time.monotonic()
+    return failures
+
+
+async def stored_failures(session_id: str, start: datetime) -> Dict[Tuple[float, str], str]:
+    """A session's failures from start on, by (detected_at epoch, type)"""
+    query, cursor, found = FailureQuery(session_id=session_id, start=start), None, {}
+    while True:
+        page, cursor = await db.search_failures(query, cursor=cursor, limit=1000)
+        for failure in page:
+            found[(round(to_epoch(failure["detected_at"]), 6), failure["failure_type"])] = str(failure["id"])
+        if cursor is None:
+            return found
+
+
+async def finish_backfill(key: str):
+    """Close a backfilled session's open episodes and drop its classifier state"""
+    backfill_seen.pop(key, None)
+    for episode in backfill_episodes.close_all(key):
+        await close_episode(episode, live=False)
+    backfill_classifier.state.forget(key)
+
+
+async def expire_backfills(idle_s: float = BACKFILL_IDLE_S):
+    """Finish backfilled sessions that stopped sending without end_session"""
+    while True:
+        await asyncio.sleep(min(idle_s, 60.0))
+        try:
+            now = time.monotonic()
+            for key in [key for key, seen in backfill_seen.items() if now - seen >= idle_s]:
+                await finish_backfill(key)
+        except Exception as e:
+            log.error(f"Backfill expiry failed: {e}")
+
+
+@app.get("/api/ingest/{batch_id}")
+async def get_ingest_batch(batch_id: str):
+    batch = await db.get_ingest_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Unknown batch")
+    return {**batch, "session": await db.get_session_summary(str(batch["session_id"]))}
+
+
+@app.get("/api/failures/{failure_id}/context")
+async def get_failure_context(failure_id: str):
+    clip = clips.pending(failure_id)
+    if clip is not None:
+        return {**clip, "complete": False}
+    blob = await db.get_failure_clip(failure_id)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="No context clip for this failure")
+    return {**decode_clip(blob), "complete": True}
+
+
+@app.get("/api/classifier/rules")
+async def get_classifier_rules():
+    return rulebook.describe()
+
+
+@app.post("/api/classifier/rules/reload")
+async def reload_classifier_rules():
+    """Re-read CLASSIFIER_RULES_PATH now instead of waiting for the file watcher"""
+    if not rulebook.path:
+        raise HTTPException(status_code=400, detail="CLASSIFIER_RULES_PATH is not set")
+    if not rulebook.reload():
+        raise HTTPException(status_code=400, detail=rulebook.error)
+    return rulebook.describe()
+
+
+@app.get("/api/classifier/state")
+async def get_classifier_state():
+    return classifier.state.stats()
+
+
+@app.get("/api/classifier/detectors")
+async def get_classifier_detectors():
+    return detectors.stats()
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    return query_cache.stats()
 
 
 if __name__ == "__main__":
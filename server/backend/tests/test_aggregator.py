@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from live.aggregator import FleetAggregator
+from live.state import RobotStateCache
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+
+def _join(states: RobotStateCache, robot_id: str, battery: float, tags=()):
+    states.session_started(robot_id, f"session-{robot_id}", {"tags": list(tags)})
+    states.update_telemetry(robot_id, NOW, {"battery_percent": battery, "model_confidence": 0.9})
+
+
+def _robots(message: dict) -> dict:
+    return {robot["robot_id"]: robot for robot in message["robots"]}
+
+
+def test_subscribers_get_a_full_snapshot_then_only_changes():
+    states = RobotStateCache()
+    fleet = FleetAggregator(states, stale_after=60)
+    _join(states, "arm_1", 80.0)
+    _join(states, "arm_2", 60.0)
+    socket = FakeSocket()
+    asyncio.run(fleet.subscribe(socket))
+    [full] = socket.sent
+    assert full["full"] and _robots(full)["arm_2"]["battery_percent"] == 60.0
+    assert _robots(full)["arm_1"]["session_id"] == "session-arm_1"
+
+    # A robot joining and another reporting show up in the next tick; quiet ones do not
+    asyncio.run(fleet.flush())
+    _join(states, "arm_3", 40.0)
+    states.update_telemetry("arm_1", NOW, {"battery_percent": 79.0}, ongoing={"failure_type": "motor"})
+    asyncio.run(fleet.flush())
+    delta = _robots(socket.sent[-1])
+    assert not socket.sent[-1]["full"] and set(delta) == {"arm_1", "arm_3"}
+    assert delta["arm_1"]["status"] == "failure" and delta["arm_1"]["active_failure"] == {"failure_type": "motor"}
+    # Nothing changed, nothing sent
+    asyncio.run(fleet.flush())
+    assert len(socket.sent) == 3
+
+
+def test_prefix_and_tag_subscriptions_see_their_slice():
+    states = RobotStateCache()
+    fleet = FleetAggregator(states, stale_after=60)
+    _join(states, "arm_1", 80.0, tags=["line_a"])
+    _join(states, "cart_1", 70.0, tags=["line_b"])
+    arms, line_b = FakeSocket(), FakeSocket()
+    asyncio.run(fleet.subscribe(arms, prefix="arm_"))
+    asyncio.run(fleet.subscribe(line_b, tag="line_b"))
+    assert set(_robots(arms.sent[0])) == {"arm_1"}
+    assert set(_robots(line_b.sent[0])) == {"cart_1"}
+
+
+def test_silent_robots_go_stale_and_disconnected_ones_go_offline():
+    states = RobotStateCache()
+    fleet = FleetAggregator(states, stale_after=5)
+    _join(states, "arm_1", 80.0)
+    _join(states, "arm_2", 60.0)
+    socket = FakeSocket()
+    asyncio.run(fleet.subscribe(socket))
+    asyncio.run(fleet.flush())
+
+    states.get("arm_1").received_at = time.monotonic() - 10
+    states.session_ended("arm_2")
+    asyncio.run(fleet.flush())
+    delta = _robots(socket.sent[-1])
+    assert (delta["arm_1"]["status"], delta["arm_2"]["status"]) == ("stale", "offline")
+    # Offline robots stay in the snapshot but never go stale
+    assert states.mark_stale(5, now=time.monotonic() + 60) == []
+
+    # A heartbeat brings a stale robot back
+    states.heartbeat("arm_1", NOW, {"cpu_percent": 10})
+    asyncio.run(fleet.flush())
+    assert _robots(socket.sent[-1])["arm_1"]["status"] == "online"
+    assert len(_robots(socket.sent[-1])) == 1
+
+
+def test_closed_sockets_are_dropped():
+    class ClosedSocket(FakeSocket):
+        async def send_text(self, text: str):
+            if self.sent:
+                raise RuntimeError("closed")
+            await super().send_text(text)
+
+    states = RobotStateCache()
+    fleet = FleetAggregator(states, stale_after=60)
+    _join(states, "arm_1", 80.0)
+    socket = ClosedSocket()
+    asyncio.run(fleet.subscribe(socket))
+    states.update_telemetry("arm_1", NOW, {"battery_percent": 79.0})
+    asyncio.run(fleet.flush())
+    assert socket not in fleet._subscriptions
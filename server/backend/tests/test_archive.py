@@ -0,0 +1,48 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from db.archive import SessionArchive, tier_sessions
+from db.sqlite import SQLiteDatabase
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+CHANNELS = ("model_confidence", "task_phase", "gripper_contact", "joint_torques")
+
+
+def _frame(i: int) -> dict:
+    # Joints appear partway through, as they do when a driver comes up late
+    joints = {"torques_nm": [float(i), None]} if i >= 3 else {}
+    return {"model": {"action_confidence": i / 10}, "task": {"phase": f"phase_{i % 2}"},
+            "gripper": {"contact_detected": i % 3 == 0}, "joints": joints}
+
+
+def test_tiered_sessions_read_back_the_same_from_the_archive(tmp_path):
+    async def run():
+        database = SQLiteDatabase(path=str(tmp_path / "hot.db"), archive=SessionArchive(str(tmp_path / "cold")))
+        await database.connect()
+        try:
+            await database.create_session("s1", "arm_1", {})
+            await database.insert_telemetry_batch(str(uuid.uuid4()), "s1", "arm_1",
+                                                  [(T0 + timedelta(seconds=i), _frame(i)) for i in range(8)])
+            await database.end_session("s1")
+            hot = await database.get_session_telemetry("s1", channels=CHANNELS)
+            pages = [chunk async for chunk in database.iter_session_telemetry("s1", channels=CHANNELS, chunk_size=3)]
+
+            assert await tier_sessions(database, older_than=timedelta(0)) == 1
+            # Moved, not copied: the hot rows are gone and the session is not picked up again
+            remaining = await database._query("SELECT COUNT(*) AS n FROM telemetry WHERE session_id = ?", ("s1",))
+            assert remaining[0]["n"] == 0
+            assert await tier_sessions(database, older_than=timedelta(0)) == 0
+
+            cold = await database.get_session_telemetry("s1", channels=CHANNELS)
+            cold_pages = [chunk async for chunk in database.iter_session_telemetry("s1", channels=CHANNELS,
+                                                                                   chunk_size=3)]
+            return hot, pages, cold, cold_pages
+        finally:
+            await database.disconnect()
+
+    hot, pages, cold, cold_pages = asyncio.run(run())
+    assert cold == hot and sum(cold_pages, []) == sum(pages, []) == hot
+    assert cold[0]["joint_torques"] is None and cold[5]["joint_torques"] == [5.0, None]
+    assert cold[3]["gripper_contact"] is True and cold[1]["task_phase"] == "phase_1"
+    assert SessionArchive(str(tmp_path / "cold")).index("s1")["rows"] == 8
@@ -0,0 +1,20 @@
+import sys
+
+import pytest
+
+from classifier import backtest
+
+
+def test_a_rules_file_that_does_not_load_fails_the_run(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text('{"models": {"default": {"rules": [{"name": "x"}]}}}')
+    with pytest.raises(ValueError, match="not loaded"):
+        backtest.load_rulebook(str(path))
+    monkeypatch.setattr(sys, "argv", ["backtest", "--rules", str(path)])
+    with pytest.raises(SystemExit) as exit:
+        backtest.main()
+    assert exit.value.code != 0
+
+
+def test_no_rules_file_runs_the_built_in_rules():
+    assert backtest.load_rulebook(None).models
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from classifier.classifier import FailureClassifier
+from classifier.rules import RuleBook
+from classifier.state import run_eviction
+
+FRAME = {"joints": {"positions_rad": [0.0], "torques_nm": [1.0]}, "model": {"action_confidence": 0.9}}
+
+
+def _classifier(**state) -> FailureClassifier:
+    classifier = FailureClassifier(RuleBook(FailureClassifier, path=None))
+    for name, value in state.items():
+        setattr(classifier.state, name, value)
+    return classifier
+
+
+def test_session_pin_survives_lazy_rehydration():
+    classifier = _classifier(max_robots=1)
+    classifier.assign_model("arm_1", "old")
+    classifier.classify("arm_1", FRAME)
+    classifier.classify("arm_2", FRAME)
+    assert classifier.state.stats()["cold_robots"] == 1
+
+    # A new session pins arm_1 while its old state (and old pin) is still cold
+    classifier.assign_model("arm_1", "new")
+    classifier.classify("arm_1", FRAME)
+    assert classifier._models["arm_1"] == "new"
+    assert classifier._confidence_stats["arm_1"].values
+
+
+def test_idle_robots_are_evicted_under_the_robot_budget():
+    classifier = _classifier(max_robots=100)
+    classifier.state.touch("arm_1", now=time.time() - 120)
+    classifier.state.touch("arm_2")
+
+    async def run():
+        task = asyncio.create_task(run_eviction(classifier.state, interval=0.01, idle_s=60.0))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+    stats = classifier.state.stats()
+    assert (stats["live_robots"], stats["cold_robots"]) == (1, 1)
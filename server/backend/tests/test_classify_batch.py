@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from classifier.classifier import BATCH_MIN_FRAMES, FailureClassifier
+from classifier.rules import RuleBook
+
+ROBOTS = [f"robot_{i}" for i in range(7)]
+
+
+def _joints(rng: random.Random):
+    roll = rng.random()
+    if roll < 0.05:
+        return None
+    positions = [rng.uniform(-3, 3) for _ in range(6)]
+    torques = [abs(rng.gauss(10, 5)) for _ in range(6)]
+    if roll < 0.1:
+        positions[rng.randrange(6)] = None
+    elif roll < 0.13:
+        positions = None
+    elif roll < 0.2:
+        torques[rng.randrange(6)] = rng.uniform(50, 90)
+    elif roll < 0.23:
+        torques[rng.randrange(6)] = None
+    return {"positions_rad": positions, "torques_nm": torques}
+
+
+def _frame(rng: random.Random) -> dict:
+    frame = {}
+    joints = _joints(rng)
+    if joints is not None:
+        frame["joints"] = joints
+    if rng.random() > 0.05:
+        confidence = rng.choice([rng.uniform(0.5, 1.0)] * 6 + [rng.uniform(0.0, 0.5), None])
+        frame["model"] = {"action_confidence": confidence}
+    if rng.random() > 0.05:
+        frame["system"] = {"battery_percent": rng.choice([rng.uniform(15, 100)] * 8 + [rng.uniform(0, 15)])}
+    return frame
+
+
+def _frames(count=3000, seed=11):
+    rng = random.Random(seed)
+    return [(rng.choice(ROBOTS), _frame(rng)) for _ in range(count)]
+
+
+def _chunks(frames, seed=5):
+    rng = random.Random(seed)
+    start = 0
+    while start < len(frames):
+        # Mostly batches big enough to vectorize, some small enough to fall back
+        size = rng.choice([rng.randint(BATCH_MIN_FRAMES, 200), rng.randint(1, BATCH_MIN_FRAMES - 1)])
+        yield frames[start:start + size]
+        start += size
+
+
+def _state(classifier: FailureClassifier) -> dict:
+    return {
+        "consecutive": dict(classifier._consecutive),
+        "rule_runs": {robot_id: dict(runs) for robot_id, runs in classifier._rule_runs.items()},
+        "confidence": {
+            robot_id: (list(stats.values), stats.mean, stats.std)
+            for robot_id, stats in classifier._confidence_stats.items()
+        },
+    }
+
+
+def test_classify_batch_matches_classify_over_random_frames():
+    frames = _frames()
+    sequential = FailureClassifier(RuleBook(FailureClassifier, path=None))
+    batched = FailureClassifier(RuleBook(FailureClassifier, path=None))
+    expected = [sequential.classify(robot_id, data) for robot_id, data in frames]
+    results = [result for chunk in _chunks(frames) for result in batched.classify_batch(chunk)]
+
+    assert results == expected
+    # Every rule of the chain, and healthy frames, came up
+    assert {result.rule for result in expected} == {
+        "", "sensor_dropout", "motor_overload", "model_critical", "model_low_confidence", "low_battery",
+    }
+
+    state, batched_state = _state(sequential), _state(batched)
+    assert batched_state["consecutive"] == state["consecutive"]
+    assert batched_state["rule_runs"] == state["rule_runs"]
+    assert batched_state["confidence"].keys() == state["confidence"].keys()
+    for robot_id, (values, mean, std) in state["confidence"].items():
+        batched_values, batched_mean, batched_std = batched_state["confidence"][robot_id]
+        assert batched_values == values
+        assert batched_mean == pytest.approx(mean) and batched_std == pytest.approx(std)
@@ -0,0 +1,28 @@
+from live.clips import ClipRecorder, decode_clip
+
+
+def _run(recorder, epochs, failures):
+    """Feed one frame per epoch, raising the given failures on theirs; returns the finished clips"""
+    finished = []
+    for epoch in epochs:
+        finished += recorder.add_frame("arm", epoch, {"system": {"battery_percent": epoch}})
+        if epoch in failures:
+            recorder.failure("arm", "s1", failures[epoch], epoch)
+    return finished
+
+
+def test_a_failure_joining_an_open_clip_extends_it():
+    recorder = ClipRecorder(before_s=2, after_s=5, max_after_s=60)
+    [clip] = _run(recorder, range(20), {3: "f1", 7: "f2"})
+    assert clip.failure_ids == ["f1", "f2"]
+    # 5 s past the second failure, not the first
+    assert (clip.frames[0][0], clip.frames[-1][0]) == (1, 12)
+    body = decode_clip(recorder.encode(clip))
+    assert (body["after_s"], body["samples"]) == (9, 12)
+
+
+def test_joining_failures_extend_a_clip_only_up_to_the_cap():
+    recorder = ClipRecorder(before_s=0, after_s=5, max_after_s=8)
+    [clip] = _run(recorder, range(30), {0: "f1", 4: "f2", 8: "f3"})
+    assert clip.failure_ids == ["f1", "f2", "f3"]
+    assert clip.frames[-1][0] == 8
@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from db.columnar import MEDIA_TYPE, decode_columns, encode_columns
+from db.memory import MemoryDatabase
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_columns_round_trip_through_the_binary_encoding():
+    columns = {
+        "time": [0.0, 0.1, 0.2],
+        "model_confidence": [0.9, None, 0.7],
+        "gripper_contact": [True, False, None],
+        "task_phase": ["reach", None, "grasp"],
+        "joint_torques": [[1.0, 2.0], None, [3.0, None, 4.0]],
+        "joint_torques[1]": [2.0, None, None],
+    }
+    channels = list(columns)[1:]
+    buffer = encode_columns(columns, channels, session_id="s1")
+    decoded = decode_columns(buffer)
+    assert decoded["task_phase"] == ["reach", None, "grasp"]
+    np.testing.assert_array_equal(decoded["model_confidence"], [0.9, np.nan, 0.7])
+    np.testing.assert_array_equal(decoded["gripper_contact"], [1.0, 0.0, np.nan])
+    np.testing.assert_array_equal(decoded["joint_torques"], [[1, 2, np.nan], [np.nan] * 3, [3, np.nan, 4]])
+    np.testing.assert_array_equal(decoded["joint_torques[1]"], [2.0, np.nan, np.nan])
+    # Columns are read in place, so every one starts on an 8-byte boundary
+    for array in decoded.values():
+        if isinstance(array, np.ndarray):
+            assert not array.flags.owndata and array.ctypes.data % 8 == 0
+    with pytest.raises(ValueError):
+        decode_columns(b"JSON" + buffer[4:])
+
+
+@pytest.fixture
+def url(monkeypatch):
+    database = MemoryDatabase()
+    monkeypatch.setattr(main, "db", database)
+    session_id = str(uuid.uuid4())
+
+    async def fill():
+        await database.create_session(session_id, "arm_1", {})
+        for i in range(20):
+            await database.insert_telemetry(session_id, "arm_1", T0 + timedelta(seconds=i), {
+                "joints": {"torques_nm": [float(i), 2.0 * i, 3.0 * i]},
+                "task": {"current_task": "pick"}, "gripper": {"contact_detected": i % 2 == 0},
+            })
+
+    asyncio.run(fill())
+    return f"/api/sessions/{session_id}/telemetry"
+
+
+def _client() -> TestClient:
+    # Outside a `with` block, so no startup tasks or database connect
+    return TestClient(main.app)
+
+
+def test_projection_is_the_same_in_every_format(url):
+    client = _client()
+    params = {"channels": "joint_torques[1],task_name,gripper_contact", "limit": 10}
+    rows = client.get(url, params=params).json()["telemetry"]
+    assert rows[3] == {"time": (T0 + timedelta(seconds=3)).isoformat(), "joint_torques[1]": 6.0,
+                       "task_name": "pick", "gripper_contact": False}
+
+    columnar = client.get(url, params={**params, "format": "columnar"}).json()
+    assert columnar["rows"] == 10
+    assert columnar["columns"]["joint_torques[1]"] == [row["joint_torques[1]"] for row in rows]
+
+    response = client.get(url, params={**params, "format": "binary"})
+    assert response.headers["content-type"] == MEDIA_TYPE
+    decoded = decode_columns(response.content)
+    assert decoded["joint_torques[1]"].tolist() == [2.0 * i for i in range(10)]
+    assert decoded["task_name"] == ["pick"] * 10
+    assert decoded["time"][0] == T0.timestamp()
+
+
+def test_unknown_channels_and_formats_are_rejected(url):
+    client = _client()
+    assert client.get(url, params={"channels": "raw_data"}).status_code == 400
+    assert client.get(url, params={"format": "parquet"}).status_code == 400
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+import pytest
+
+from classifier.correlation import CorrelationDetector, WindowedMoments
+
+
+def _frame(rng, velocities, offset=0.0):
+    torques = [None if v is None else 2.0 * v + rng.gauss(0, 0.05) + offset for v in velocities]
+    return {"joints": {"torques_nm": torques, "velocities_rad_s": velocities}}
+
+
+def test_windowed_moments_skip_only_the_missing_pairs():
+    rng = np.random.default_rng(4)
+    moments = WindowedMoments(3, 25, resync=40)
+    xs, ys = rng.normal(size=(300, 3)), rng.normal(size=(300, 3))
+    xs[rng.random((300, 3)) < 0.2] = np.nan
+    ys[:, 2] = np.nan
+    for x, y in zip(xs, ys):
+        moments.push(x, y)
+    x, y = xs[-25:], ys[-25:]
+    mx, my, vx, vy, cov = moments.moments()
+    for pair in range(2):
+        valid = ~np.isnan(x[:, pair])
+        assert moments.counts[pair] == valid.sum()
+        assert mx[pair] == pytest.approx(x[valid, pair].mean())
+        assert vx[pair] == pytest.approx(x[valid, pair].var())
+        # y only counts where its x is present too
+        assert my[pair] == pytest.approx(y[valid, pair].mean())
+        assert vy[pair] == pytest.approx(y[valid, pair].var())
+        assert cov[pair] == pytest.approx(np.cov(x[valid, pair], y[valid, pair], bias=True)[0, 1])
+    assert moments.counts[2] == 0
+
+
+def test_a_missing_joint_does_not_blind_the_others():
+    rng = random.Random(1)
+    detector = CorrelationDetector("joints.torques_nm~joints.velocities_rad_s", window=20, hop=5, warmup=5)
+    for _ in range(400):
+        assert detector.update("arm", _frame(rng, [rng.gauss(0, 1), rng.gauss(0, 1)])) is None
+    # Joint 0 stops reporting velocity while joint 1 drags well off its usual line
+    results = []
+    for _ in range(40):
+        frame = _frame(rng, [None, rng.gauss(0, 1)], offset=5.0)
+        frame["joints"]["torques_nm"][0] = 1.0
+        results.append(detector.update("arm", frame))
+    flagged = [r for r in results if r is not None]
+    assert flagged and all(r.affected_components["joints"] == [1] for r in flagged)
+    # Joint 0 sat its gap out rather than being learned from or judged
+    state = detector._robots["arm"]
+    assert state.evaluations[0] < state.evaluations[1]
+
+
+def test_a_frame_with_no_readings_is_skipped():
+    detector = CorrelationDetector("joints.torques_nm~joints.velocities_rad_s", window=20)
+    detector.update("arm", {"joints": {"torques_nm": [1.0], "velocities_rad_s": [0.5]}})
+    assert detector.update("arm", {"joints": {"torques_nm": ["?"], "velocities_rad_s": None}}) is None
+    assert detector._robots["arm"].frames == 1
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from classifier.classifier import FailureResult
+from classifier.detectors import EXPENSIVE, Detector, DetectorHub
+
+
+class WindowSum(Detector):
+    """Flags every window, reporting what it was given"""
+
+    name = "window_sum"
+    cost = EXPENSIVE
+    window = 4
+    width = 2
+
+    def features(self, data):
+        return data["values"]
+
+    def analyze(self, windows):
+        return [
+            FailureResult(True, "test", "low", 0.5, "window", "", {}, {"window": window.tolist()}, self.name)
+            for window in windows
+        ]
+
+
+class GatedSum(WindowSum):
+    """Holds the analysis until the test lets it finish"""
+
+    def __init__(self):
+        self.started, self.finish = threading.Event(), threading.Event()
+
+    def analyze(self, windows):
+        self.started.set()
+        self.finish.wait(5)
+        return super().analyze(windows)
+
+
+def _observe(hub, robot_id, epochs):
+    for epoch in epochs:
+        hub.observe(robot_id, epoch, {"values": [epoch, None]})
+
+
+def test_windows_round_trip_through_shared_memory_in_a_worker():
+    hub = DetectorHub(workers=1, max_staleness=10.0)
+    hub.register(WindowSum())
+    _observe(hub, "a", [1.0, 2.0, 3.0, 4.0, 5.0])
+    _observe(hub, "b", [1.0, 2.0, 3.0, 4.0])
+    try:
+        asyncio.run(hub._run_batch(hub.expensive[0]))
+    finally:
+        hub.close()
+    [a] = hub.observe("a", 5.5, {"values": [6.0, 0.0]})
+    [b] = hub.observe("b", 4.5, {"values": [5.0, 0.0]})
+    # Oldest frame first, missing values as NaN
+    assert np.array_equal(a.classifier_data["window"], [[2, np.nan], [3, np.nan], [4, np.nan], [5, np.nan]],
+                          equal_nan=True)
+    assert [row[0] for row in b.classifier_data["window"]] == [1, 2, 3, 4]
+
+
+def test_results_expire_from_the_window_they_were_computed_on():
+    hub = DetectorHub(workers=0, max_staleness=2.0)
+    detector = GatedSum()
+    hub.register(detector)
+    _observe(hub, "a", [1.0, 2.0, 3.0, 4.0])
+
+    async def scenario():
+        batch = asyncio.create_task(hub._run_batch(detector))
+        await asyncio.get_running_loop().run_in_executor(None, detector.started.wait, 5)
+        # Frames that arrive while the batch runs are not part of its window
+        _observe(hub, "a", [5.0, 5.9])
+        detector.finish.set()
+        await batch
+
+    asyncio.run(scenario())
+    assert [r.rule for r in hub.observe("a", 5.95, {"values": [6.0, 0.0]})] == ["window_sum"]
+    # 2.5 s past the submitted window end (4.0), though only 0.6 s past the latest frame
+    assert hub.observe("a", 6.5, {"values": [6.5, 0.0]}) == []
+    assert hub.dropped_stale == 1
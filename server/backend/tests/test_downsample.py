@@ -0,0 +1,80 @@
+import asyncio
+import math
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from db.downsample import bucket_columns, lttb_indices
+from db.memory import MemoryDatabase
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_buckets_match_a_brute_force_min_max_avg():
+    rng = np.random.default_rng(2)
+    times = np.sort(rng.uniform(0, 100, 500))
+    values = [None if rng.random() < 0.1 else float(v) for v in rng.normal(size=500)]
+    # No values at all between 40 and 50 seconds
+    values = [None if 40 <= t < 50 else v for t, v in zip(times, values)]
+    buckets = bucket_columns({"time": times.tolist(), "c": values}, ["c"], width=10.0)
+    assert sum(b["samples"] for b in buckets) == 500
+    for bucket in buckets:
+        bucket_id = round((bucket["time"].timestamp() - times[0]) / 10)
+        inside = [v for t, v in zip(times, values) if (t - times[0]) // 10 == bucket_id and v is not None]
+        if not inside:
+            assert bucket["c_min"] is bucket["c_max"] is bucket["c_avg"] is None
+            continue
+        assert (bucket["c_min"], bucket["c_max"]) == (min(inside), max(inside))
+        assert bucket["c_avg"] == pytest.approx(sum(inside) / len(inside))
+    assert any(b["c_avg"] is None for b in buckets)
+
+
+def test_lttb_keeps_the_ends_and_the_spike():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[437] = 25.0
+    picked = lttb_indices(x, y, 40)
+    assert len(picked) == 40 and picked[0] == 0 and picked[-1] == 999
+    assert 437 in picked and (np.diff(picked) > 0).all()
+    assert lttb_indices(x[:10], y[:10], 40).tolist() == list(range(10))
+
+
+@pytest.fixture
+def session(monkeypatch):
+    database = MemoryDatabase(telemetry_capacity=5000)
+    monkeypatch.setattr(main, "db", database)
+    session_id = str(uuid.uuid4())
+
+    async def fill():
+        await database.create_session(session_id, "arm_1", {})
+        for i in range(3600):
+            confidence = 0.05 if i == 1234 else 0.8 + 0.1 * math.sin(i / 100)
+            await database.insert_telemetry(session_id, "arm_1", T0 + timedelta(seconds=i),
+                                            {"model": {"action_confidence": confidence}})
+
+    asyncio.run(fill())
+    return session_id
+
+
+def test_replay_endpoint_downsamples_to_the_requested_points(session):
+    # Outside a `with` block, so no startup tasks or database connect
+    client = TestClient(main.app)
+    url = f"/api/sessions/{session}/telemetry"
+
+    buckets = client.get(url, params={"points": 60}).json()["telemetry"]
+    assert len(buckets) <= 61 and sum(b["samples"] for b in buckets) == 3600
+    assert min(b["model_confidence_min"] for b in buckets) == 0.05
+
+    hourly = client.get(url, params={"resolution": 600}).json()["telemetry"]
+    assert [b["samples"] for b in hourly] == [600] * 6
+
+    lttb = client.get(url, params={"points": 60, "mode": "lttb", "channels": "model_confidence"}).json()
+    assert len(lttb["telemetry"]) == 60
+    assert 0.05 in [row["model_confidence"] for row in lttb["telemetry"]]
+
+    assert client.get(url, params={"points": 2}).status_code == 400
+    assert client.get(url, params={"points": 60, "mode": "median"}).status_code == 400
@@ -0,0 +1,77 @@
+from classifier.classifier import FailureResult
+from classifier.episodes import EpisodeTracker
+
+OK = FailureResult(False, "none", "none", 1.0, "OK", "", {}, {})
+
+
+def _failure(failure_type: str = "motor", severity: str = "high", joints=(1,)) -> FailureResult:
+    return FailureResult(True, failure_type, severity, 0.9, f"{failure_type} failure", "",
+                         {"joints": list(joints)}, {}, f"{failure_type}_rule")
+
+
+def _step(tracker: EpisodeTracker, epoch: float, result: FailureResult, robot_id: str = "arm"):
+    """One frame, with the caller's part: opened episodes get their failure id"""
+    opened, closed = tracker.step(robot_id, "s1", epoch, result)
+    for episode in opened:
+        episode.failure_id = f"{episode.failure_type}@{episode.started_at}"
+    return [e.failure_id for e in opened], [e.failure_id for e in closed]
+
+
+def test_episode_closes_only_after_staying_clear_for_close_after():
+    tracker = EpisodeTracker(close_after=1.0, min_duration=0)
+    assert _step(tracker, 0.0, _failure()) == (["motor@0.0"], [])
+    assert _step(tracker, 0.2, _failure(joints=(3,))) == ([], [])
+    # Clear frames inside the hysteresis window keep it open, and a relapse extends it
+    assert _step(tracker, 0.5, OK) == ([], [])
+    assert _step(tracker, 1.1, OK) == ([], [])
+    assert _step(tracker, 1.15, _failure()) == ([], [])
+    assert _step(tracker, 2.0, OK) == ([], [])
+    assert tracker.current("arm").frames == 3
+    assert _step(tracker, 2.15, OK) == ([], ["motor@0.0"])
+    assert tracker.current("arm") is None and len(tracker) == 0
+
+    # The closed episode's span and joints cover every failing frame
+    tracker = EpisodeTracker(close_after=1.0, min_duration=0)
+    _step(tracker, 0.0, _failure())
+    _step(tracker, 0.2, _failure(joints=(3,)))
+    episode = tracker.current("arm")
+    tracker.step("arm", "s1", 5.0, OK)
+    assert episode.closing()["duration_s"] == 0.2 and episode.closing()["affected_components"]["joints"] == [1, 3]
+
+
+def test_failure_types_open_and_close_independently():
+    tracker = EpisodeTracker(close_after=1.0, min_duration=0)
+    _step(tracker, 0.0, _failure("motor"))
+    assert _step(tracker, 0.5, _failure("model", "critical")) == (["model@0.5"], [])
+    assert tracker.current("arm").failure_type == "model"
+    # Model keeps failing, so only motor has been clear long enough
+    assert _step(tracker, 1.2, _failure("model", "critical")) == ([], ["motor@0.0"])
+    assert len(tracker) == 1
+
+
+def test_blips_shorter_than_min_duration_never_open():
+    tracker = EpisodeTracker(close_after=1.0, min_duration=0.5)
+    assert _step(tracker, 0.0, _failure()) == ([], [])
+    assert _step(tracker, 0.3, _failure()) == ([], [])
+    # The blip clears without ever having opened, so nothing closes either
+    assert _step(tracker, 1.5, OK) == ([], [])
+    assert len(tracker) == 0
+
+    assert _step(tracker, 10.0, _failure()) == ([], [])
+    assert _step(tracker, 10.5, _failure()) == (["motor@10.0"], [])
+    # Opened once, not on every later frame
+    assert _step(tracker, 10.7, _failure()) == ([], [])
+
+
+def test_close_all_returns_the_opened_episodes_and_forgets_the_robot():
+    tracker = EpisodeTracker(close_after=1.0, min_duration=0.5)
+    _step(tracker, 0.0, _failure("motor"))
+    _step(tracker, 0.6, _failure("motor"))
+    # Still pending: dropped on disconnect without ever being reported
+    _step(tracker, 0.6, _failure("sensor"))
+    _step(tracker, 0.6, _failure("motor"), robot_id="other")
+    assert [e.failure_id for e in tracker.close_all("arm")] == ["motor@0.0"]
+    assert tracker.current("arm") is None and tracker.close_all("arm") == []
+    assert len(tracker) == 1
+    # A new session starts from scratch
+    assert _step(tracker, 2.0, _failure("motor")) == ([], [])
@@ -0,0 +1,99 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from db.failures import FailureQuery
+from db import memory
+from db.memory import MemoryDatabase
+from db.sqlite import SQLiteDatabase
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def database(request, tmp_path):
+    if request.param == "memory":
+        return MemoryDatabase(failure_capacity=5)
+    return SQLiteDatabase(path=str(tmp_path / "failures.db"))
+
+
+def _failure(session_id: str, detected_at: datetime, failure_type: str = "collision") -> dict:
+    return {
+        "session_id": session_id, "robot_id": "arm_1", "detected_at": detected_at, "failure_type": failure_type,
+        "severity": "high", "confidence": 0.9, "summary": "", "detail": "", "affected_components": {"joints": [1]},
+        "classifier_data": {},
+    }
+
+
+async def _pages(database, query: FailureQuery, limit: int):
+    pages, cursor = [], None
+    while True:
+        page, cursor = await database.search_failures(query, cursor=cursor, limit=limit)
+        pages.append([f["detected_at"] for f in page])
+        if cursor is None:
+            return pages
+
+
+def _run(database, body):
+    async def run():
+        await database.connect()
+        try:
+            return await body()
+        finally:
+            await database.disconnect()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("query", [FailureQuery(), FailureQuery(failure_type="collision"), FailureQuery(joint=1)])
+def test_backfilled_failures_page_newest_first(database, query):
+    inserted = [NOW, NOW - timedelta(hours=1), NOW - timedelta(minutes=30)]
+
+    async def body():
+        session_id = str(uuid.uuid4())
+        await database.create_session(session_id, "arm_1", {})
+        for detected_at in inserted:
+            await database.insert_failure(_failure(session_id, detected_at))
+        return await _pages(database, query, limit=2)
+
+    pages = [[d if isinstance(d, datetime) else datetime.fromisoformat(d) for d in page]
+             for page in _run(database, body)]
+    assert pages == [[NOW, NOW - timedelta(minutes=30)], [NOW - timedelta(hours=1)]]
+
+
+def test_memory_evicts_the_earliest_detected():
+    database = MemoryDatabase(failure_capacity=3)
+
+    async def body():
+        for minutes in (0, -10, 5, -20):
+            await database.insert_failure(_failure("s", NOW + timedelta(minutes=minutes)))
+        failures, _ = await database.search_failures(FailureQuery(), limit=10)
+        return [f["detected_at"] for f in failures]
+
+    assert asyncio.run(body()) == [NOW + timedelta(minutes=m) for m in (5, 0, -10)]
+
+
+def test_memory_pages_jump_to_their_cursor(monkeypatch):
+    database = MemoryDatabase(failure_capacity=5000)
+
+    async def body():
+        # Pairs share a detected_at, so pages have to break ties on id
+        for n in range(4000):
+            await database.insert_failure(_failure("s", NOW + timedelta(seconds=n // 2)))
+        # Count how many failures each page orders against its cursor
+        calls = []
+        to_epoch = memory.to_epoch
+        monkeypatch.setattr(memory, "to_epoch", lambda value: calls.append(value) or to_epoch(value))
+        pages, cursor = [], None
+        while True:
+            page, cursor = await database.search_failures(FailureQuery(), cursor=cursor, limit=7)
+            pages.append(page)
+            if cursor is None:
+                return pages, calls
+
+    pages, calls = asyncio.run(body())
+    seen = [f["id"] for page in pages for f in page]
+    assert seen == sorted(database.failures, key=database._order, reverse=True)
+    # A binary search per page, not a walk down from the newest failure
+    assert len(calls) <= len(pages) * 32
@@ -0,0 +1,104 @@
+import asyncio
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from db.failures import FailureQuery
+from db.memory import MemoryDatabase
+
+START = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = MemoryDatabase()
+    monkeypatch.setattr(main, "db", database)
+    return database
+
+
+@pytest.fixture
+def client():
+    # Outside a `with` block, so no startup tasks or database connect
+    return TestClient(main.app, raise_server_exceptions=False)
+
+
+def _batch(batch_id: str, batteries, **extra) -> bytes:
+    events = [
+        {"timestamp": (START + timedelta(seconds=i / 10)).isoformat(), "data": {"system": {"battery_percent": b}}}
+        for i, b in enumerate(batteries)
+    ]
+    return json.dumps({"batch_id": batch_id, "robot_id": "arm", "events": events, **extra}).encode()
+
+
+# Two low battery episodes, each closed by two clear seconds
+TWO_EPISODES = [5.0] * 10 + [80.0] * 20 + [5.0] * 10 + [80.0] * 20
+
+
+def _failures(database, session_id):
+    failures, _ = asyncio.run(database.search_failures(FailureQuery(session_id=session_id)))
+    return failures
+
+
+def test_uncompressed_body_is_held_to_the_limit(client, database, monkeypatch):
+    body = _batch("big", TWO_EPISODES)
+    monkeypatch.setattr(main, "INGEST_MAX_BYTES", len(body) - 1)
+    response = client.post(f"/api/sessions/{uuid.uuid4()}/ingest", content=body)
+    assert response.status_code == 400 and "larger than" in response.json()["detail"]
+    # The same batch gzipped stays under the wire limit but not the uncompressed one
+    response = client.post(f"/api/sessions/{uuid.uuid4()}/ingest", content=gzip.compress(body),
+                           headers={"content-encoding": "gzip"})
+    assert response.status_code == 400
+
+
+def test_retry_finishes_an_interrupted_classification(client, database, monkeypatch):
+    session_id, body = str(uuid.uuid4()), _batch("interrupted", TWO_EPISODES)
+    insert_failure = database.insert_failure
+    calls = []
+
+    async def crash_on_second(failure):
+        calls.append(failure)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return await insert_failure(failure)
+
+    monkeypatch.setattr(database, "insert_failure", crash_on_second)
+    assert client.post(f"/api/sessions/{session_id}/ingest", content=body).status_code == 500
+    assert len(_failures(database, session_id)) == 1
+    assert asyncio.run(database.get_ingest_batch("interrupted"))["classified_at"] is None
+
+    monkeypatch.setattr(database, "insert_failure", insert_failure)
+    retried = client.post(f"/api/sessions/{session_id}/ingest", content=body).json()
+    assert (retried["duplicate"], retried["failures"]) == (True, 2)
+    # The first episode's row was reused rather than written twice
+    assert len(_failures(database, session_id)) == 2
+    assert asyncio.run(database.get_ingest_batch("interrupted"))["classified_at"] is not None
+
+    again = client.post(f"/api/sessions/{session_id}/ingest", content=body).json()
+    assert (again["duplicate"], again["failures"]) == (True, 0)
+    assert len(_failures(database, session_id)) == 2
+
+
+def test_idle_backfills_are_forgotten(client, database):
+    session_id = str(uuid.uuid4())
+    key = f"arm/{session_id}"
+    # Ends mid-episode and never sends end_session
+    assert client.post(f"/api/sessions/{session_id}/ingest", content=_batch("idle", [5.0] * 10)).status_code == 200
+    assert key in main.backfill_classifier._consecutive
+    assert key in main.backfill_seen
+
+    async def expire():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(main.expire_backfills(idle_s=0.01), 0.1)
+
+    asyncio.run(expire())
+    assert key not in main.backfill_seen
+    assert key not in main.backfill_classifier._consecutive
+    assert not main.backfill_episodes.close_all(key)
+    [failure] = _failures(database, session_id)
+    # Its open episode was closed on the way out
+    assert failure["frames"] == 10
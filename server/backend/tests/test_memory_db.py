@@ -0,0 +1,83 @@
+import asyncio
+import importlib.util
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from db.memory import MemoryDatabase
+
+START = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+LEGACY_CLIENT = os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend", "db", "client.py")
+
+
+def _legacy_database(**capacities):
+    # The deployed backend/ tree has its own top-level db package, so its client is loaded by path
+    spec = importlib.util.spec_from_file_location("legacy_db_client", LEGACY_CLIENT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Database(**capacities)
+
+
+@pytest.fixture(params=["memory", "legacy"])
+def make_database(request):
+    return MemoryDatabase if request.param == "memory" else _legacy_database
+
+
+def _frame(i: int) -> dict:
+    return {"model": {"action_confidence": i / 10}, "system": {"battery_percent": 100.0 - i},
+            "joints": {"torques_nm": [float(i), -float(i)]}}
+
+
+def _failure(session_id: str, n: int) -> dict:
+    return {"session_id": session_id, "robot_id": f"arm_{n % 2}", "detected_at": START + timedelta(seconds=n),
+            "failure_type": "motor", "severity": "high", "summary": str(n)}
+
+
+def test_ring_keeps_the_newest_frames_at_capacity(make_database):
+    database = make_database(telemetry_capacity=4)
+
+    async def run():
+        for i in range(10):
+            await database.insert_telemetry("s", "arm", START + timedelta(seconds=i), _frame(i))
+        return await database.get_session_telemetry("s")
+
+    rows = asyncio.run(run())
+    assert [row["battery_percent"] for row in rows] == [94.0, 93.0, 92.0, 91.0]
+    assert rows[0]["time"] == (START + timedelta(seconds=6)).isoformat()
+    ring = database.telemetry["s"]
+    # Every channel is kept, joint by joint, not just the default projection
+    assert [ring.value("joint_torques", i) for i in ring.slots()][-1] == [9.0, -9.0]
+
+
+def test_failures_come_back_newest_first(make_database):
+    database = make_database(failure_capacity=3)
+
+    async def run():
+        for n in range(5):
+            await database.insert_failure(_failure("s", n))
+        return await database.get_failures(), await database.get_failures("arm_0")
+
+    everything, arm_0 = asyncio.run(run())
+    assert [f["summary"] for f in everything] == ["4", "3", "2"]
+    assert [f["summary"] for f in arm_0] == ["4", "2"]
+
+
+def test_failure_counts_after_eviction():
+    async def run(database):
+        await database.create_session("a", "arm", {})
+        await database.create_session("b", "arm", {})
+        for n in range(3):
+            await database.insert_failure(_failure("a", n))
+        for n in range(3, 5):
+            await database.insert_failure(_failure("b", n))
+        return {s["id"]: s["failure_count"] for s in await database.get_sessions()}
+
+    # The session summary counts every failure the session had, like the SQL backends
+    memory = MemoryDatabase(failure_capacity=3)
+    assert asyncio.run(run(memory)) == {"a": 3, "b": 2}
+    assert [memory.failures[i]["summary"] for i in memory.failure_index[("session_id", "a")]] == ["2"]
+    # The deployed backend counts what it still holds, as it did before the ring buffers
+    legacy = _legacy_database(failure_capacity=3)
+    assert asyncio.run(run(legacy)) == {"a": 1, "b": 2}
+    assert [legacy.failures[i]["summary"] for i in legacy.failures_by_session["a"]] == ["2"]
@@ -0,0 +1,100 @@
+import asyncio
+import sqlite3
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from db.client import SCHEMA_PATH, schema_statements
+from db.failures import FailureQuery
+from db.sqlite import SQLiteDatabase
+
+
+def test_postgres_schema_runs_as_separate_idempotent_statements():
+    statements = schema_statements(SCHEMA_PATH.read_text())
+    assert all(s.rstrip().endswith(";") for s in statements)
+    # The merge_counts body holds semicolons of its own
+    assert sum("merge_counts(a JSONB" in s for s in statements) == 1
+    for statement in statements:
+        head = statement.split("(")[0]
+        if head.startswith(("CREATE TABLE", "CREATE INDEX", "CREATE MATERIALIZED VIEW", "CREATE EXTENSION")):
+            assert "IF NOT EXISTS" in head, head
+        if head.startswith("ALTER TABLE"):
+            assert "ADD COLUMN IF NOT EXISTS" in statement, statement
+    for added in ("ADD COLUMN IF NOT EXISTS ended_at", "TABLE IF NOT EXISTS ingest_batches",
+                  "TABLE IF NOT EXISTS failure_clips", "TABLE IF NOT EXISTS session_summaries"):
+        assert any(added in s for s in statements), added
+
+
+def test_sqlite_file_from_before_episodes_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE failures (id TEXT PRIMARY KEY, session_id TEXT NOT NULL, robot_id TEXT NOT NULL, "
+        "detected_at REAL NOT NULL, failure_type TEXT NOT NULL, severity TEXT NOT NULL, confidence REAL, "
+        "summary TEXT NOT NULL, detail TEXT, affected_components TEXT DEFAULT '{}', "
+        "classifier_data TEXT DEFAULT '{}', acknowledged INTEGER DEFAULT 0)"
+    )
+    conn.commit()
+    conn.close()
+    database = SQLiteDatabase(path=path)
+    detected_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    async def run():
+        await database.connect()
+        try:
+            failure = await database.insert_failure({
+                "session_id": str(uuid.uuid4()), "robot_id": "arm_1", "detected_at": detected_at,
+                "failure_type": "collision", "severity": "high", "confidence": 0.9, "summary": "", "detail": "",
+                "affected_components": {}, "classifier_data": {},
+            })
+            await database.update_failure(failure["id"], {
+                "ended_at": detected_at + timedelta(seconds=3), "duration_s": 3.0, "frames": 30,
+            })
+            failures, _ = await database.search_failures(FailureQuery(), limit=1)
+            return failures[0]
+        finally:
+            await database.disconnect()
+
+    failure = asyncio.run(run())
+    assert (failure["duration_s"], failure["frames"]) == (3.0, 30)
+
+
+def test_sqlite_sessions_from_before_summaries_are_summarized(tmp_path):
+    path = str(tmp_path / "old.db")
+    session_id, start = str(uuid.uuid4()), datetime(2026, 1, 1, tzinfo=timezone.utc)
+    events = [
+        (start + timedelta(seconds=i), {"model": {"action_confidence": 0.9 - i / 10}, "system": {"battery_percent": 80 - i}})
+        for i in range(3)
+    ]
+
+    async def record():
+        database = SQLiteDatabase(path=path)
+        await database.connect()
+        try:
+            await database.ensure_session(session_id, "arm_1", {}, started_at=start)
+            await database.insert_telemetry_batch("b1", session_id, "arm_1", events)
+            await database.insert_failure({
+                "session_id": session_id, "robot_id": "arm_1", "detected_at": start + timedelta(seconds=5),
+                "failure_type": "motor", "severity": "high", "summary": "",
+            })
+            return (await database.get_sessions("arm_1"))[0]["summary"]
+        finally:
+            await database.disconnect()
+
+    expected = asyncio.run(record())
+    # As if written before the write path kept summaries
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM session_summaries")
+    conn.commit()
+    conn.close()
+
+    async def reopen():
+        database = SQLiteDatabase(path=path)
+        await database.connect()
+        try:
+            return (await database.get_sessions("arm_1"))[0]["summary"]
+        finally:
+            await database.disconnect()
+
+    summary = asyncio.run(reopen())
+    assert summary == expected
+    assert (summary["samples"], summary["failure_count"], summary["battery_start"], summary["battery_end"]) == (3, 1, 80, 78)
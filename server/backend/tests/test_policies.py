@@ -0,0 +1,13 @@
+import pytest
+
+from db.policies import StoragePolicy
+
+
+@pytest.mark.parametrize("setting, expected", [(None, None), ("0", None), ("", None), ("12", 12.0)])
+def test_compression_is_off_unless_configured(monkeypatch, setting, expected):
+    if setting is None:
+        monkeypatch.delenv("TELEMETRY_COMPRESS_AFTER_HOURS", raising=False)
+    else:
+        monkeypatch.setenv("TELEMETRY_COMPRESS_AFTER_HOURS", setting)
+    assert StoragePolicy.from_env().compress_after_hours == expected
+    assert StoragePolicy().compress_after_hours is None
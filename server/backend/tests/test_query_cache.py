@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from db.cache import QueryCache
+
+
+def _loader(calls: list, value):
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+    return load
+
+
+def test_hits_until_the_robot_is_invalidated():
+    cache, calls = QueryCache(ttl=60), []
+
+    async def run():
+        assert await cache.get("sessions", "arm_1", (50,), _loader(calls, "a1")) == "a1"
+        assert await cache.get("sessions", "arm_1", (50,), _loader(calls, "again")) == "a1"
+        await cache.get("sessions", "arm_2", (50,), _loader(calls, "a2"))
+        await cache.get("sessions", None, (50,), _loader(calls, "all"))
+        await cache.get("failures", "arm_1", (100,), _loader(calls, "f1"))
+        # A new arm_1 session makes arm_1's and the fleet-wide listing stale, nothing else
+        cache.invalidate("sessions", "arm_1")
+        await cache.get("sessions", "arm_1", (50,), _loader(calls, "a1 new"))
+        await cache.get("sessions", "arm_2", (50,), _loader(calls, "a2 new"))
+        await cache.get("sessions", None, (50,), _loader(calls, "all new"))
+        await cache.get("failures", "arm_1", (100,), _loader(calls, "f1 new"))
+
+    asyncio.run(run())
+    assert calls == ["a1", "a2", "all", "f1", "a1 new", "all new"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (3, 6, 2)
+
+
+def test_entries_expire_and_the_least_recently_used_is_evicted():
+    cache, calls = QueryCache(ttl=60, max_entries=2), []
+
+    async def run():
+        for robot_id in ("a", "b", "a", "c", "a", "b"):
+            await cache.get("sessions", robot_id, (), _loader(calls, robot_id))
+        cache.ttl = 0
+        await cache.get("sessions", "x", (), _loader(calls, "x"))
+        await cache.get("sessions", "x", (), _loader(calls, "x"))
+
+    asyncio.run(run())
+    # "b" was the least recently used when "c" came in
+    assert calls == ["a", "b", "c", "b", "x", "x"]
+    assert cache.stats()["evictions"] == 3
+
+
+def test_concurrent_misses_share_one_load_and_errors_are_not_cached():
+    cache, calls = QueryCache(ttl=60), []
+
+    async def run():
+        results = await asyncio.gather(*(cache.get("failures", "a", (), _loader(calls, "f")) for _ in range(5)))
+        assert results == ["f"] * 5
+
+        async def broken():
+            raise RuntimeError("database down")
+
+        with pytest.raises(RuntimeError):
+            await cache.get("failures", "b", (), broken)
+        assert await cache.get("failures", "b", (), _loader(calls, "recovered")) == "recovered"
+
+    asyncio.run(run())
+    assert calls == ["f", "recovered"]
+
+
+def test_an_invalidation_during_a_load_is_not_overwritten():
+    cache, calls = QueryCache(ttl=60), []
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow():
+            started.set()
+            await release.wait()
+            return "before the new session"
+
+        load = asyncio.create_task(cache.get("sessions", "a", (), slow))
+        await started.wait()
+        cache.invalidate("sessions", "a")
+        release.set()
+        assert await load == "before the new session"
+        assert await cache.get("sessions", "a", (), _loader(calls, "after")) == "after"
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from db.memory import MemoryDatabase
+from live.state import RobotStateCache
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def _alert(failure_id: str, failure_type: str = "motor") -> dict:
+    return {"id": failure_id, "failure_type": failure_type, "severity": "high", "summary": "", "timestamp": ""}
+
+
+def test_cache_keeps_the_latest_frame_and_session():
+    states = RobotStateCache()
+    states.session_started("arm", "s1", {"tags": ["line_a"]})
+    states.update_telemetry("arm", NOW, {"battery_percent": 80.0, "model_confidence": 0.9})
+    states.update_telemetry("arm", NOW + timedelta(seconds=1), {"battery_percent": 79.0, "model_confidence": 0.8})
+    states.heartbeat("arm", NOW + timedelta(seconds=2), {"cpu_percent": 12})
+    state = states.get("arm").to_dict()
+    assert (state["session_id"], state["tags"], state["status"]) == ("s1", ["line_a"], "online")
+    assert state["telemetry"]["battery_percent"] == 79.0
+    assert state["last_seen"] == (NOW + timedelta(seconds=1)).isoformat()
+    assert state["last_heartbeat"] == {"timestamp": (NOW + timedelta(seconds=2)).isoformat(), "cpu_percent": 12}
+    assert state["session"]["samples"] == 2
+
+
+def test_every_opened_failure_is_kept_until_it_closes():
+    states = RobotStateCache()
+    states.session_started("arm", "s1", {})
+    motor, battery = _alert("f1"), _alert("f2", "system")
+    states.update_telemetry("arm", NOW, {}, [motor, battery], ongoing=motor)
+    state = states.get("arm")
+    assert [f["id"] for f in state.open_failures] == ["f2", "f1"]
+    assert state.session_summary.failures == 2 and state.status == "failure"
+
+    states.drain_dirty()
+    states.failure_closed("arm", "f1")
+    assert [f["id"] for f in state.open_failures] == ["f2"]
+    assert states.drain_dirty() == {"arm"}
+    states.update_telemetry("arm", NOW, {}, ongoing=battery)
+    assert state.active_failure["id"] == "f2"
+
+    states.failure_closed("arm", "f2")
+    assert not state.open_failures and state.active_failure is None and state.status == "online"
+    # Unknown robots and failures are ignored
+    states.failure_closed("cart", "f3")
+    states.failure_closed("arm", "f3")
+
+
+def test_a_new_session_starts_with_no_open_failures():
+    states = RobotStateCache()
+    states.session_started("arm", "s1", {})
+    states.update_telemetry("arm", NOW, {}, [_alert("f1")])
+    states.session_ended("arm")
+    assert states.get("arm").status == "offline" and states.get("arm").active_failure is None
+    states.session_started("arm", "s2", {})
+    assert not states.get("arm").open_failures
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "db", MemoryDatabase())
+    monkeypatch.setattr(main, "robot_states", RobotStateCache())
+    # Outside a `with` block, so no startup tasks or database connect
+    return TestClient(main.app)
+
+
+def _telemetry(second: float, battery: float) -> str:
+    return json.dumps({"type": "telemetry", "timestamp": (NOW + timedelta(seconds=second)).isoformat(),
+                       "data": {"system": {"battery_percent": battery}}})
+
+
+def test_ingest_closes_resolved_failures_in_the_robot_listing(client):
+    robot_id = f"arm-{uuid.uuid4()}"
+    with client.websocket_connect(f"/ws/agent/{robot_id}") as agent:
+        agent.send_text(json.dumps({"type": "session_start", "session_id": str(uuid.uuid4())}))
+        for i in range(5):
+            agent.send_text(_telemetry(i / 10, 5.0))
+        # Clear for longer than EPISODE_CLOSE_AFTER_S
+        for i in range(5, 30):
+            agent.send_text(_telemetry(i / 10, 80.0))
+        # Messages are handled in order, so once the heartbeat shows the frames are in
+        agent.send_text(json.dumps({"type": "heartbeat", "timestamp": NOW.isoformat(), "data": {}}))
+        robots = {}
+        for _ in range(50):
+            robots = {r["robot_id"]: r for r in client.get("/api/robots").json()["robots"]}
+            if robot_id in robots and robots[robot_id]["last_heartbeat"]:
+                break
+            time.sleep(0.02)
+        robot = robots[robot_id]
+        assert robot["session"]["failure_count"] == 1
+        assert robot["open_failures"] == [] and robot["active_failure"] is None
+        assert robot["status"] == "online"
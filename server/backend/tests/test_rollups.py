@@ -0,0 +1,77 @@
+import asyncio
+import math
+import time
+import uuid
+
+import pytest
+
+from db.channels import from_epoch
+from db.memory import MemoryDatabase
+from db.rollups import choose_level
+from db.sqlite import SQLiteDatabase
+
+NOW = time.time()
+
+
+def test_queries_go_to_the_coarsest_level_that_still_has_the_range():
+    hour_ago, two_days_ago = NOW - 3600, NOW - 2 * 86400
+    assert choose_level(hour_ago, NOW, 30, NOW) == 1
+    assert choose_level(hour_ago, NOW, 300, NOW) == 60
+    assert choose_level(hour_ago, NOW, 7200, NOW) == 3600
+    # One-second buckets are only kept for a day
+    assert choose_level(two_days_ago, NOW, 1, NOW) == 60
+    assert choose_level(NOW - 60 * 86400, NOW, 1, NOW) == 3600
+
+
+def _frame(i: int) -> dict:
+    return {"model": {"action_confidence": 0.5 + (i % 50) / 100, "inference_time_ms": 10.0 + i % 7},
+            "system": {"battery_percent": 100.0 - i / 100, "cpu_percent": 20.0},
+            "joints": {"torques_nm": [float(i % 13), 2.0]}}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def database(request, tmp_path):
+    if request.param == "memory":
+        return MemoryDatabase()
+    return SQLiteDatabase(path=str(tmp_path / "rollups.db"))
+
+
+def test_rollups_match_the_raw_samples(database):
+    start = math.floor((NOW - 3600) / 3600) * 3600
+    events = [(from_epoch(start + 2 * i), _frame(i)) for i in range(1800)]
+
+    async def run():
+        await database.connect()
+        try:
+            session_id = str(uuid.uuid4())
+            await database.create_session(session_id, "arm_1", {})
+            await database.insert_telemetry_batch(str(uuid.uuid4()), session_id, "arm_1", events)
+            for minute in (3, 3, 40):
+                await database.insert_failure({
+                    "session_id": session_id, "robot_id": "arm_1", "failure_type": "motor", "severity": "high",
+                    "summary": "", "detected_at": from_epoch(start + minute * 60 + 1)})
+            # Another robot's samples stay out of arm_1's rollups
+            await database.insert_telemetry_batch(str(uuid.uuid4()), session_id, "arm_2", events[:10])
+            # SQLite merges rollups into its table about once a second; a restart flushes them
+            await database.disconnect()
+            await database.connect()
+            return (await database.get_rollups(start, start + 3600, 300, robot_id="arm_1"),
+                    await database.get_rollups(start, start + 3600, 3600, robot_id="arm_1"))
+        finally:
+            await database.disconnect()
+
+    (level, five_minutes), (hourly_level, hourly) = asyncio.run(run())
+    assert (level, hourly_level) == (60, 3600)
+    assert len(five_minutes) == 12
+    assert [n for n, row in enumerate(five_minutes) for _ in range(row["failures"])] == [0, 0, 8]
+    for n, row in enumerate(five_minutes):
+        frames = [data for t, data in events if n * 300 <= t.timestamp() - start < (n + 1) * 300]
+        confidences = [f["model"]["action_confidence"] for f in frames]
+        assert row["time"] == from_epoch(start + n * 300) and row["samples"] == len(frames) == 150
+        assert row["confidence_min"] == min(confidences)
+        assert row["confidence_avg"] == pytest.approx(sum(confidences) / len(confidences))
+        assert row["inference_ms_max"] == 16.0 and row["torque_max"][:3] == [12.0, 2.0, None]
+    [hour] = hourly
+    assert hour["samples"] == 1800 and hour["failures"] == 3
+    assert hour["battery_min"] == pytest.approx(100.0 - 1799 / 100)
+    assert hour["time"] == from_epoch(start)
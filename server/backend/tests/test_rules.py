@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+
+from classifier.classifier import FailureClassifier
+from classifier.rules import RuleBook, RuleSpec, watch_rules
+
+OVERLOAD = {"joints": {"positions_rad": [0.0], "torques_nm": [120.0]}}
+
+
+def _book(tmp_path, config) -> RuleBook:
+    path = tmp_path / "rules.json"
+    path.write_text(config if isinstance(config, str) else json.dumps(config))
+    return RuleBook(FailureClassifier, path=str(path))
+
+
+@pytest.mark.parametrize("threshold", ["Infinity", "-Infinity", "NaN"])
+def test_non_finite_threshold_is_rejected(tmp_path, threshold):
+    book = _book(tmp_path, '{"models": {"default": {"rules": [{"name": "motor_overload", "field": '
+                           '"joints.torques_nm", "op": ">", "threshold": %s}]}}}' % threshold)
+    assert book.error and "finite" in book.error
+    # The built-in rules stay in force and still classify
+    result = FailureClassifier(book).classify("s", OVERLOAD)
+    assert result.failure_type == "motor"
+
+
+@pytest.mark.parametrize("config", [
+    [],
+    {"robots": ["arm_*"]},
+    {"robots": {"arm_*": ["default"]}},
+    {"models": ["ur5"]},
+    {"models": {"ur5": ["motor_overload"]}},
+    {"models": {"ur5": {"extends": ["default"]}}},
+    {"models": {"ur5": {"rules": {"name": "motor_overload"}}}},
+    {"models": {"default": {"rules": [{"name": "x", "field": "a.b", "op": "<", "threshold": 1, "evidence": []}]}}},
+    {"models": {"default": {"rules": [{"name": "x", "field": "a.b", "op": "<", "threshold": 1, "window": [2]}]}}},
+    {"models": {"default": {"rules": [{"name": "x", "field": 5, "op": "<", "threshold": 1}]}}},
+])
+def test_wrong_shapes_keep_the_current_rules(tmp_path, config):
+    book = _book(tmp_path, {"models": {"ur5": {"extends": "default"}}, "robots": {"arm_*": "ur5"}})
+    assert book.error is None and book.version == 1
+    (tmp_path / "rules.json").write_text(json.dumps(config))
+    assert book.reload() is False
+    assert book.error
+    assert book.version == 1 and book.model_of("arm_1") == "ur5"
+
+
+def test_watcher_survives_a_failing_reload(tmp_path, monkeypatch):
+    book = _book(tmp_path, {})
+    calls = []
+
+    def changed():
+        calls.append(1)
+        raise RuntimeError("disk went away")
+
+    monkeypatch.setattr(book, "changed", changed)
+
+    async def run():
+        watcher = asyncio.create_task(watch_rules(book, interval=0.01))
+        await asyncio.sleep(0.1)
+        assert not watcher.done()
+        watcher.cancel()
+
+    asyncio.run(run())
+    assert len(calls) > 1
+
+
+def test_finite_thresholds_still_compile():
+    spec = RuleSpec.from_dict({"name": "hot", "field": "joints.temperatures_c", "op": ">=", "threshold": 80.5})
+    assert spec.threshold == 80.5
+
+
+def test_is_null_needs_the_field_present(tmp_path):
+    book = _book(tmp_path, {"robots": {"*": "ur5"}, "models": {"ur5": {"extends": "default", "rules": [
+        {"name": "no_task", "field": "task.phase", "op": "is_null"},
+    ]}}})
+    classifier = FailureClassifier(book)
+    # No joints at all is not a dropout, and no task phase is not a null one
+    assert not classifier.classify("s", {"system": {"battery_percent": 80}}).is_failure
+    assert not classifier.classify("s", {"task": {}}).is_failure
+    assert classifier.classify("s", {"task": {"phase": None}}).rule == "no_task"
+    assert classifier.classify("s", {"joints": {"positions_rad": [0.0, None]}}).rule == "sensor_dropout"
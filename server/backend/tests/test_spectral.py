@@ -0,0 +1,62 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from classifier.spectral import SlidingSpectrum, SpectralDetector
+
+
+@pytest.mark.parametrize("resync", [10_000, 50])
+def test_sliding_dft_matches_rfft_of_the_window(resync):
+    rng = np.random.default_rng(2)
+    window, bins = 32, np.arange(1, 17)
+    spectrum = SlidingSpectrum(3, window, bins, resync=resync)
+    samples = rng.normal(size=(700, 3)) * [1.0, 50.0, 0.01]
+    pushed = 0
+    # Reads after a single push, after a few, and after more than a window of pending deltas
+    for step in [1, 3, 7, 40] * 12:
+        for values in samples[pushed:pushed + step]:
+            spectrum.push(values)
+        pushed += step
+        if not spectrum.full:
+            continue
+        expected = np.fft.rfft(samples[pushed - window:pushed].T, axis=1)[:, bins]
+        np.testing.assert_allclose(spectrum.spectrum(), expected, rtol=1e-9, atol=1e-9 * np.abs(expected).max())
+
+
+def _frame(rng, joints, oscillation=None):
+    torques = [rng.gauss(5.0, 0.3) for _ in range(joints)]
+    velocities = [rng.gauss(0.0, 0.1) for _ in range(joints)]
+    if oscillation is not None:
+        joint, amplitude, phase = oscillation
+        torques[joint] += amplitude * math.sin(phase)
+    return {"joints": {"torques_nm": torques, "velocities_rad_s": velocities}}
+
+
+def test_stationary_noise_raises_nothing():
+    rng = random.Random(5)
+    detector = SpectralDetector()
+    assert not [r for r in (detector.update("arm", _frame(rng, 4)) for _ in range(3000)) if r]
+
+
+def test_injected_oscillation_is_flagged_on_its_joint_and_band():
+    rng = random.Random(6)
+    detector = SpectralDetector()
+    for _ in range(600):
+        assert detector.update("arm", _frame(rng, 4)) is None
+    # Chatter at 0.2 cycles/sample on joint 2 only
+    results = []
+    for n in range(detector.window):
+        result = detector.update("arm", _frame(rng, 4, (2, 2.0, 2 * math.pi * 0.2 * n)))
+        if result is not None:
+            results.append(result)
+    assert results
+    result = results[-1]
+    assert (result.failure_type, result.rule, result.affected_components) == (
+        "vibration", "spectral_oscillation", {"joints": [2]})
+    assert result.classifier_data["channel"] == "torques_nm"
+    assert result.classifier_data["band"] == [0.15, 0.3]
+    assert result.classifier_data["power_ratio"] > detector.sigma
+    # Another robot's baseline is its own, and is untouched
+    assert detector.update("other", _frame(rng, 4)) is None
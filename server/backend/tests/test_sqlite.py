@@ -0,0 +1,65 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from db.sqlite import INSERT_TELEMETRY, SQLiteDatabase, telemetry_row
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _frame(i: int) -> dict:
+    return {"model": {"action_confidence": 0.5 + i / 10000}, "system": {"battery_percent": 90.0},
+            "task": {"phase": "grasp"}, "joints": {"torques_nm": [float(i), 1.0]}}
+
+
+def test_queued_inserts_commit_and_survive_a_restart(tmp_path):
+    path = str(tmp_path / "edge.db")
+
+    async def write():
+        database = SQLiteDatabase(path=path, batch_size=50)
+        await database.connect()
+        await database.create_session("s1", "arm_1", {"site": "a"})
+        # Queued without waiting, so the writer commits them in batches of up to 50
+        for i in range(500):
+            await database.insert_telemetry("s1", "arm_1", T0 + timedelta(milliseconds=10 * i), _frame(i))
+        await database.insert_failure({"session_id": "s1", "robot_id": "arm_1", "detected_at": T0,
+                                       "failure_type": "motor", "severity": "high", "summary": "overload"})
+        await database.end_session("s1")
+        await database.disconnect()
+
+    async def read():
+        database = SQLiteDatabase(path=path)
+        await database.connect()
+        try:
+            rows = await database.get_session_telemetry("s1", channels=("model_confidence", "joint_torques"))
+            return rows, await database.get_sessions("arm_1")
+        finally:
+            await database.disconnect()
+
+    asyncio.run(write())
+    rows, [session] = asyncio.run(read())
+    assert len(rows) == 500
+    assert [row["time"] for row in rows] == sorted(row["time"] for row in rows)
+    assert rows[-1]["joint_torques"] == [499.0, 1.0] and rows[0]["model_confidence"] == 0.5
+    assert (session["metadata"], session["failure_count"], session["summary"]["samples"]) == ({"site": "a"}, 1, 500)
+    assert session["ended_at"] is not None
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_a_failing_statement_does_not_take_its_batch_down(tmp_path):
+    async def run():
+        database = SQLiteDatabase(path=str(tmp_path / "edge.db"))
+        await database.connect()
+        try:
+            for i in range(10):
+                row = telemetry_row("s1", "arm_1", T0 + timedelta(seconds=i), _frame(i))
+                database._writer.submit(INSERT_TELEMETRY, row)
+            with pytest.raises(sqlite3.OperationalError):
+                await database._write("INSERT INTO no_such_table VALUES (?)", (1,))
+            return await database.get_session_telemetry("s1")
+        finally:
+            await database.disconnect()
+
+    assert len(asyncio.run(run())) == 10
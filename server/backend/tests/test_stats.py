@@ -0,0 +1,76 @@
+import json
+import random
+import statistics
+
+import pytest
+
+from classifier.stats import STATS_KINDS, RollingStats, make_stats, stats_from_dict
+
+
+def _check(stats: RollingStats, window: list):
+    assert stats.mean == pytest.approx(statistics.fmean(window), rel=1e-9, abs=1e-12)
+    assert stats.std == pytest.approx(statistics.pstdev(window), rel=1e-6, abs=1e-9)
+
+
+@pytest.mark.parametrize("window", [2, 7, 50])
+def test_matches_pstdev_over_a_sliding_window(window):
+    rng = random.Random(window)
+    stats, values = RollingStats(window, resync=window * 3), []
+    for i in range(2000):
+        # Level shifts and scale changes, the cases windowed updates drift on
+        value = rng.gauss(1000.0 if i % 500 < 250 else -3.0, 0.001 if i % 300 < 100 else 25.0)
+        stats.update(value)
+        values.append(value)
+        if len(values) >= 2:
+            _check(stats, values[-window:])
+
+
+def test_flat_window_after_noise_has_zero_deviation():
+    rng = random.Random(1)
+    stats = RollingStats(60)
+    for _ in range(500):
+        stats.update(40.0 + rng.gauss(0, 5))
+    for _ in range(60):
+        stats.update(40.0)
+    assert stats.std == 0.0
+    assert statistics.pstdev(stats.values) == 0.0
+    assert not stats.is_anomaly(40.01)
+    # It still learns from the next change
+    stats.update(41.0)
+    _check(stats, list(stats.values))
+
+
+def test_flat_zero_window_after_noise():
+    stats = RollingStats(10)
+    for value in (1e-3, -2e-3, 5e-4) * 10:
+        stats.update(value)
+    for _ in range(10):
+        stats.update(0.0)
+    assert (stats.mean, stats.std) == (0.0, 0.0)
+
+
+def test_from_values_round_trip():
+    values = [3.0, 3.0, 1.0, 3.0, 3.0]
+    restored = RollingStats.from_values(5, values)
+    _check(restored, values)
+    for _ in range(3):
+        restored.update(3.0)
+    assert restored.std == 0.0
+
+
+@pytest.mark.parametrize("kind", sorted(STATS_KINDS))
+def test_every_kind_round_trips_through_a_dict(kind):
+    rng = random.Random(kind)
+    stats = make_stats(kind, 20)
+    for _ in range(50):
+        stats.update(rng.gauss(10.0, 2.0))
+    restored = stats_from_dict(json.loads(json.dumps(stats.to_dict())))
+    assert type(restored) is type(stats)
+    for value in (10.0, 14.0, 30.0):
+        assert restored.is_anomaly(value) == stats.is_anomaly(value)
+    assert restored.to_dict() == stats.to_dict()
+
+
+def test_records_without_a_kind_are_rolling_windows():
+    restored = stats_from_dict({"window": 3, "values": [1.0, 2.0, 3.0]})
+    assert isinstance(restored, RollingStats) and restored.mean == 2.0
@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from db.channels import advance_position, decode_telemetry_cursor, encode_telemetry_cursor
+from db.memory import MemoryDatabase
+from db.sqlite import SQLiteDatabase
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _frame(i: int) -> dict:
+    return {"joints": {"positions_rad": [float(i)]}}
+
+
+async def _session(database, times):
+    session_id = str(uuid.uuid4())
+    await database.create_session(session_id, "arm_1", {})
+    # A batch is committed before it returns, unlike single inserts queued to the SQLite writer
+    await database.insert_telemetry_batch(str(uuid.uuid4()), session_id, "arm_1",
+                                          [(t, _frame(i)) for i, t in enumerate(times)])
+    return session_id
+
+
+async def _read_all(database, session_id, **kwargs):
+    rows = []
+    async for chunk in database.iter_session_telemetry(session_id, channels=("joint_positions",), **kwargs):
+        rows.extend(chunk)
+    return [row["joint_positions"][0] for row in rows]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def database(request, tmp_path):
+    if request.param == "memory":
+        return MemoryDatabase()
+    return SQLiteDatabase(path=str(tmp_path / "telemetry.db"))
+
+
+def _run(database, body):
+    async def run():
+        await database.connect()
+        try:
+            return await body()
+        finally:
+            await database.disconnect()
+    return asyncio.run(run())
+
+
+def test_equal_timestamps_span_chunks(database):
+    async def body():
+        session_id = await _session(database, [T0] * 10)
+        return await _read_all(database, session_id, chunk_size=3)
+
+    assert _run(database, body) == [float(i) for i in range(10)]
+
+
+def test_resume_inside_a_run_of_ties(database):
+    times = [T0, T0 + timedelta(seconds=1), T0 + timedelta(seconds=1), T0 + timedelta(seconds=1),
+             T0 + timedelta(seconds=2)]
+
+    async def body():
+        session_id = await _session(database, times)
+        resumed = await _read_all(database, session_id, after=times[1], seen=2, chunk_size=2)
+        strict = await _read_all(database, session_id, after=times[1], chunk_size=2)
+        inclusive = await _read_all(database, session_id, start=times[1], chunk_size=1)
+        return resumed, strict, inclusive
+
+    resumed, strict, inclusive = _run(database, body)
+    assert resumed == [3.0, 4.0]
+    assert strict == [4.0]
+    assert inclusive == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_advance_position_counts_ties_across_pages():
+    assert advance_position(None, 0, [1.0, 2.0, 2.0]) == (2.0, 2)
+    assert advance_position(2.0, 2, [2.0, 2.0]) == (2.0, 4)
+    assert advance_position(2.0, 4, [2.0, 3.0]) == (3.0, 1)
+    assert advance_position(1.0, None, [2.0]) == (2.0, 1)
+
+
+def test_cursor_round_trip():
+    time, seen = decode_telemetry_cursor(encode_telemetry_cursor(T0 + timedelta(microseconds=7), 3))
+    assert (time, seen) == (T0 + timedelta(microseconds=7), 3)
+    assert decode_telemetry_cursor("2026-01-01T00:00:00Z") == (T0, None)
+    with pytest.raises(ValueError):
+        decode_telemetry_cursor("yesterday_3")
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from classifier.classifier import BATCH_MIN_FRAMES, TORQUE_MIN_SAMPLES, FailureClassifier
+
+
+def _frame(torques, confidence=0.9, battery=80.0) -> dict:
+    return {
+        "joints": {"positions_rad": [0.0] * len(torques), "torques_nm": torques},
+        "model": {"action_confidence": confidence},
+        "system": {"battery_percent": battery},
+    }
+
+
+def _baseline(classifier, robot_id="arm", frames=TORQUE_MIN_SAMPLES + 10, seed=0):
+    rng = random.Random(seed)
+    for _ in range(frames):
+        classifier.classify(robot_id, _frame([5.0 + rng.gauss(0, 0.2), 10.0 + rng.gauss(0, 0.2)]))
+
+
+@pytest.mark.parametrize("kind", ["rolling", "ewma", "quantile"])
+def test_adaptive_mode_flags_a_joint_off_its_baseline(kind):
+    classifier = FailureClassifier(mode="adaptive", torque_stats=kind)
+    _baseline(classifier)
+    # 20 Nm is far under the overload limit, so only the baseline catches it
+    result = classifier.classify("arm", _frame([5.0, 20.0]))
+    assert (result.rule, result.affected_components) == ("torque_anomaly", {"joints": [1]})
+    assert classifier._consecutive["arm"] == 1
+    # The anomalous reading was not learned
+    assert classifier.classify("arm", _frame([5.0, 20.0])).rule == "torque_anomaly"
+    assert not classifier.classify("arm", _frame([5.0, 10.0])).is_failure
+
+
+def test_compat_mode_keeps_the_rule_chain_only():
+    classifier = FailureClassifier()
+    _baseline(classifier)
+    assert not classifier.classify("arm", _frame([5.0, 20.0])).is_failure
+
+
+def test_unknown_modes_are_rejected():
+    with pytest.raises(ValueError):
+        FailureClassifier(mode="fast")
+    with pytest.raises(ValueError):
+        FailureClassifier(torque_stats="median")
+
+
+def test_baselines_survive_eviction():
+    classifier = FailureClassifier(mode="adaptive", torque_stats="ewma")
+    _baseline(classifier)
+    classifier.state.evict("arm")
+    assert "arm" not in classifier._torque_stats
+    assert classifier.classify("arm", _frame([5.0, 20.0])).rule == "torque_anomaly"
+
+
+def test_classify_batch_matches_classify_in_adaptive_mode():
+    frames = [("arm", _frame([5.0 + (i % 7) * 0.1, 20.0 if i % 50 == 49 else 10.0])) for i in range(200)]
+    sequential, batched = FailureClassifier(mode="adaptive"), FailureClassifier(mode="adaptive")
+    assert [sequential.classify(r, d) for r, d in frames] == batched.classify_batch(frames)
+
+
+def test_classify_batch_reads_null_joint_readings_like_the_rule_chain():
+    frames = [
+        {"joints": {"positions_rad": None, "torques_nm": [60.0]}},
+        {"joints": {"positions_rad": [0.0, None], "torques_nm": None}},
+        {"joints": {"positions_rad": [0.0], "torques_nm": None}},
+    ] * BATCH_MIN_FRAMES
+    robot_ids = "abc" * BATCH_MIN_FRAMES
+    scalar = FailureClassifier()
+    expected = [scalar.classify(robot_id, data) for robot_id, data in zip(robot_ids, frames)]
+    assert FailureClassifier().classify_batch(list(zip(robot_ids, frames))) == expected
+    assert [r.rule for r in expected[:3]] == ["sensor_dropout", "sensor_dropout", ""]